@@ -0,0 +1,291 @@
+# Module that contains a benchmark and accuracy regression suite for Orbits_module
+# For each orbit regime (LEO, MEO, GEO, HEO, hyperbolic) and batch size it records the per call latency,
+# throughput and peak memory of the propagators, the COE conversions and the time functions, and checks the
+# position and velocity errors of the propagators against a high accuracy reference (DOP853 at tight tolerances,
+# with J2 for J2_Secular_Prop_RV(), which is only run on the elliptic regimes it is defined for).
+# The import time of Orbits_module and of the orbits package is measured in fresh interpreters and checked
+# against a startup budget, along with a check that matplotlib and scipy are not imported with them.
+# Results are written to a JSON file. If a baseline JSON file from an earlier run is given, the run fails when
+# a latency got slower than the baseline by more than the allowed factor, and it always fails when an error is
+# above its accuracy limit.
+
+# Usage:
+#       python Benchmark_Orbits_module.py                                    (full run, batch sizes 1 to 1e5)
+#       python Benchmark_Orbits_module.py --quick                            (batch sizes 1 to 1e3)
+#       python Benchmark_Orbits_module.py --baseline bench_baseline.json     (also check for latency regressions)
+
+
+
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from scipy.integrate import solve_ivp
+
+import Orbits_module as orbits
+
+
+muearth = 398600 # km^3/s^2
+rearth = 6378    # km
+J2 = 1.08263e-3
+
+# Orbit regimes, [perigee radius (km), eccentricity, propagation time (sec)]
+REGIMES = {
+    'LEO': [rearth + 500, 0.001, 5400],
+    'MEO': [rearth + 20200, 0.01, 43200],
+    'GEO': [42164, 0.0002, 86400],
+    'HEO': [rearth + 600, 0.74, 43200],
+    'hyperbolic': [rearth + 1000, 1.5, 20000],
+}
+
+# Accuracy limits, largest position error over |r| and velocity error over |v| against the reference
+ACCURACY_LIMITS = {
+    'Universal_Variable_Prop': 1.0e-9,
+    'Universal_Variable_Prop_Batch': 1.0e-9,
+    'ODE_two_body_motion_multi': 1.0e-6,   # Default rtol=1e-10, atol=1e-8 over the stacked state
+    'RK78_two_body_motion_multi': 1.0e-6,  # Same default tolerances
+    'J2_Secular_Prop_RV': 1.0e-2,          # Against Cowell's method with J2, the short period J2 terms are not modeled
+    'COEs_round_trip': 1.0e-9,
+    'Local_Sidereal_Time_Calc_Array': 1.0e-9,
+}
+
+# Startup budget of a fresh "import <module>" (sec), and modules that must only be imported at first use
+IMPORT_BUDGET = 0.5
+HEAVY_MODULES = ['matplotlib', 'scipy']
+
+REFERENCE_SAMPLES = 8   # Number of states per regime that are checked against the reference
+
+
+def Regime_States(regime, N, seed=0):
+    # This function draws N states of an orbit regime with random orientation and true anomaly
+    # Outputs:
+    #       rvects, vvects - (N,3) arrays of R and V vectors (km, km/s)
+    #       dt - propagation time of the regime (sec)
+
+    [rp, ecc, dt] = REGIMES[regime]
+    # One row of draws per state, so the first states are the same for every N
+    u = np.random.default_rng(seed).uniform(size=(N, 4))
+    h = np.full(N, math.sqrt(muearth*rp*(1 + ecc)))
+    if ecc < 1:
+        trueanomaly = 360*u[:,3]
+    else:
+        trueanomaly = 120*u[:,3] - 60   # Stay well inside the asymptotes
+    [rvects, vvects] = orbits.COEs_to_RV_Batch(h, np.full(N, ecc), 180*u[:,0], 360*u[:,1], 360*u[:,2], trueanomaly)
+    return [rvects, vvects, dt]
+
+
+def Reference_Propagation(rvects, vvects, dt, J2=0):
+    # High accuracy reference propagation of each state on its own with DOP853 at tight tolerances, with the J2
+    # acceleration (Cowell's method) if J2 is given
+    rhs = orbits.two_body_motion_multi(1, muearth, J2)
+    states = np.empty((len(rvects), 6))
+    for i in range(len(rvects)):
+        sol = solve_ivp(rhs, (0, dt), np.concatenate((rvects[i], vvects[i])), method='DOP853', rtol=1e-13, atol=1e-10)
+        states[i] = sol.y[:,-1]
+    return [states[:,0:3], states[:,3:6]]
+
+
+def Relative_Error(r, v, rref, vref):
+    # Largest position and velocity errors relative to the reference magnitudes
+    return max(float(np.max(np.linalg.norm(r - rref, axis=1)/np.linalg.norm(rref, axis=1))),
+               float(np.max(np.linalg.norm(v - vref, axis=1)/np.linalg.norm(vref, axis=1))))
+
+
+def Measure(func, N, repeats=5, min_time=0.02):
+    # This function times func() and measures its peak traced memory
+    # Each of the repeats runs func() enough times in a row to take at least min_time, so that short calls are
+    # not dominated by timer noise, and the fastest repeat gives the latency
+    # Outputs:
+    #       result - Dictionary of latency per call (sec), throughput (elements/sec) and peak memory (bytes)
+    #       output - What func() returned
+
+    start = time.perf_counter()
+    output = func()   # Warm up, also gives the output
+    loops = max(1, math.ceil(min_time/max(time.perf_counter() - start, 1e-9)))
+    latency = math.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        latency = min(latency, (time.perf_counter() - start)/loops)
+
+    tracemalloc.start()
+    func()
+    [_, peak] = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return [{'latency': latency, 'throughput': N/latency, 'peak_memory': peak}, output]
+
+
+def Import_Time(module, runs=5):
+    # This function measures the import time of a module in fresh interpreters
+    # Outputs:
+    #       result - Dictionary of the fastest import time (sec), which heavy modules it pulled in, and the pass/fail flag
+    code = ("import sys, time; start = time.perf_counter(); import {}; end = time.perf_counter(); "
+            "print(end - start); print(' '.join(m for m in {} if m in sys.modules))").format(module, HEAVY_MODULES)
+    latency = math.inf
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             capture_output=True, text=True, check=True).stdout.split('\n')
+        latency = min(latency, float(out[0]))
+    heavy = out[1].split()
+
+    print("{:32s} {:10s} latency={:.3e} s  budget={:.1e} s  heavy modules={}".format('import ' + module, 'import',
+          latency, IMPORT_BUDGET, heavy))
+    return {'function': 'import ' + module, 'regime': 'import', 'N': 1, 'latency': latency, 'throughput': 1/latency,
+            'peak_memory': 0, 'import_budget': IMPORT_BUDGET, 'heavy_modules': heavy,
+            'within_budget': latency <= IMPORT_BUDGET and not heavy}
+
+
+def Run_Benchmarks(sizes, scalar_limit):
+    # This function runs every benchmark and accuracy check
+    # Inputs:
+    #       sizes - Batch sizes to run
+    #       scalar_limit - Largest batch size that the scalar (one state per call) functions are looped over
+    # Outputs:
+    #       results - List of dictionaries, one per function, regime and batch size
+
+    results = [Import_Time('Orbits_module'), Import_Time('orbits')]
+
+    def record(name, regime, N, measured, error=None):
+        entry = {'function': name, 'regime': regime, 'N': N}
+        entry.update(measured)
+        if error is not None:
+            entry['error'] = error
+            entry['error_limit'] = ACCURACY_LIMITS[name]
+            entry['accurate'] = bool(error <= ACCURACY_LIMITS[name])
+        results.append(entry)
+        print("{:32s} {:10s} N={:<7d} latency={:.3e} s  throughput={:.3e}/s  peak={:.2e} B{}".format(
+            name, regime, N, measured['latency'], measured['throughput'], measured['peak_memory'],
+            '' if error is None else '  error={:.2e}'.format(error)))
+
+    for regime in REGIMES:
+        # Reference on a few states, which are the first states of every batch
+        [rref0, vref0, dt] = Regime_States(regime, REFERENCE_SAMPLES)
+        [rref, vref] = Reference_Propagation(rref0, vref0, dt)
+        k = REFERENCE_SAMPLES
+        elliptic = REGIMES[regime][1] < 1   # J2_Secular_Prop_RV() is only defined for elliptic orbits
+        if elliptic:
+            [rrefJ2, vrefJ2] = Reference_Propagation(rref0, vref0, dt, J2)
+
+        for N in sizes:
+            [rvects, vvects, dt] = Regime_States(regime, N)
+            n = min(N, k)
+
+            # Propagators
+            [measured, [r, v, _]] = Measure(lambda: orbits.Universal_Variable_Prop_Batch(muearth, rvects, vvects, dt), N)
+            record('Universal_Variable_Prop_Batch', regime, N, measured, Relative_Error(r[:n], v[:n], rref[:n], vref[:n]))
+
+            if elliptic:
+                [measured, [r, v]] = Measure(lambda: orbits.J2_Secular_Prop_RV(rvects, vvects, dt, muearth, J2), N)
+                record('J2_Secular_Prop_RV', regime, N, measured, Relative_Error(r[:n], v[:n], rrefJ2[:n], vrefJ2[:n]))
+
+            if N <= scalar_limit:
+                loop = lambda: [orbits.Universal_Variable_Prop(muearth, rvects[i], vvects[i], dt) for i in range(N)]
+                [measured, out] = Measure(loop, N)
+                r = np.array([o[0] for o in out[:n]])
+                v = np.array([o[1] for o in out[:n]])
+                record('Universal_Variable_Prop', regime, N, measured, Relative_Error(r, v, rref[:n], vref[:n]))
+
+                [measured, [propstate, _]] = Measure(lambda: orbits.ODE_two_body_motion_multi(rvects, vvects, dt, 2), N,
+                                                     repeats=1, min_time=0)
+                record('ODE_two_body_motion_multi', regime, N, measured,
+                       Relative_Error(propstate[-1,:n,0:3], propstate[-1,:n,3:6], rref[:n], vref[:n]))
+
+                [measured, propstate] = Measure(lambda: orbits.RK78_two_body_motion_multi(rvects, vvects, [dt]), N,
+                                                repeats=1, min_time=0)
+                record('RK78_two_body_motion_multi', regime, N, measured,
+                       Relative_Error(propstate[-1,:n,0:3], propstate[-1,:n,3:6], rref[:n], vref[:n]))
+
+            # Conversions, checked by a round trip back to R and V
+            [measured, coes] = Measure(lambda: orbits.COEsFunction_Batch(rvects, vvects), N)
+            record('COEsFunction_Batch', regime, N, measured)
+            [h, ecc, _, inc, RAAN, argumentofperigee, trueanomaly] = coes
+            [measured, [r, v]] = Measure(lambda: orbits.COEs_to_RV_Batch(h, ecc, inc, RAAN, argumentofperigee, trueanomaly), N)
+            record('COEs_to_RV_Batch', regime, N, measured)
+            results[-1]['error'] = Relative_Error(r, v, rvects, vvects)
+            results[-1]['error_limit'] = ACCURACY_LIMITS['COEs_round_trip']
+            results[-1]['accurate'] = bool(results[-1]['error'] <= ACCURACY_LIMITS['COEs_round_trip'])
+
+    # Time functions, checked against the scalar functions
+    for N in sizes:
+        rng = np.random.default_rng(0)
+        times = np.datetime64('2000-01-01T00:00:00') + rng.integers(0, 30*365*86400, N).astype('timedelta64[s]')
+        [measured, _] = Measure(lambda: orbits.JulianDateCalc_Array(times), N)
+        record('JulianDateCalc_Array', 'time', N, measured)
+        [measured, LST] = Measure(lambda: orbits.Local_Sidereal_Time_Calc_Array(times, 110, 'west'), N)
+        error = 0.0
+        for i in range(min(N, 100)):
+            d = times[i].astype(object)
+            LSTi = orbits.Local_Sidereal_Time_Calc(d.month, d.day, d.year, d.hour, d.minute, d.second, 110, 'west')
+            diff = abs(LSTi - LST[i]) % 360
+            error = max(error, min(diff, 360 - diff)/360)
+        record('Local_Sidereal_Time_Calc_Array', 'time', N, measured, error)
+
+        if N <= scalar_limit:
+            fields = [(d.month, d.day, d.year, d.hour, d.minute, d.second) for d in times.astype(object)]
+            [measured, _] = Measure(lambda: [orbits.Local_Sidereal_Time_Calc(*f, 110, 'west') for f in fields], N)
+            record('Local_Sidereal_Time_Calc', 'time', N, measured)
+
+    return results
+
+
+def Check_Regressions(results, baseline, factor):
+    # This function lists the accuracy failures and the latencies that are slower than the baseline by more than factor
+    failures = []
+    for r in results:
+        if r.get('accurate') is False:
+            failures.append("{} {} N={}: error {:.2e} above limit {:.2e}".format(
+                r['function'], r['regime'], r['N'], r['error'], r['error_limit']))
+        if r.get('within_budget') is False:
+            failures.append("{}: {:.3e} s against a budget of {:.1e} s, heavy modules imported {}".format(
+                r['function'], r['latency'], r['import_budget'], r['heavy_modules']))
+    if baseline is not None:
+        old = {(b['function'], b['regime'], b['N']): b for b in baseline['results']}
+        for r in results:
+            b = old.get((r['function'], r['regime'], r['N']))
+            if b is not None and r['latency'] > factor*b['latency']:
+                failures.append("{} {} N={}: latency {:.3e} s is more than {}x the baseline {:.3e} s".format(
+                    r['function'], r['regime'], r['N'], r['latency'], factor, b['latency']))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark and accuracy regression suite for Orbits_module')
+    parser.add_argument('--quick', action='store_true', help='only run batch sizes up to 1e3')
+    parser.add_argument('--output', default='bench_output.json', help='JSON file to write the results to')
+    parser.add_argument('--baseline', default=None, help='JSON file of an earlier run to check latencies against')
+    parser.add_argument('--factor', type=float, default=2.0, help='allowed slowdown factor against the baseline')
+    parser.add_argument('--scalar-limit', type=int, default=1000, help='largest batch size the scalar functions are looped over')
+    args = parser.parse_args()
+
+    sizes = [1, 10, 100, 1000] if args.quick else [1, 10, 100, 1000, 10000, 100000]
+    results = Run_Benchmarks(sizes, args.scalar_limit)
+
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    failures = Check_Regressions(results, baseline, args.factor)
+
+    with open(args.output, 'w') as file:
+        json.dump({'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+                   'results': results, 'failures': failures}, file, indent=1)
+
+    print(" ")
+    if failures:
+        print("FAILED:")
+        for f in failures:
+            print("  " + f)
+        sys.exit(1)
+    print("All {} benchmarks passed, results written to {}".format(len(results), args.output))
+
+
+if __name__ == '__main__': main()
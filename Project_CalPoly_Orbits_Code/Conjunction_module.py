@@ -0,0 +1,169 @@
+# Module that contains a conjunction screening stage, which finds close approaches between the objects of a
+# propagated catalog without checking all pairs at every time step
+
+# Functions defined in this module:
+#       Apsis_Radii(): Perigee and apogee radii of a set of objects, used for the apogee/perigee pre-filter
+#       Apsis_Filter(): Pre-filter that removes pairs whose perigee-apogee shells can't come within the threshold
+#       Screen_Conjunctions(): Generator that screens a stream of propagated states chunk by chunk for close approaches
+#       Conjunction_Screening(): Propagates a catalog with orbits.ODE_two_body_motion_stream() and screens it
+
+# Screening steps for each interval between two output times:
+#       1. A k-d tree of the positions at each output time gives the pairs within the threshold plus a padding
+#          of (largest speed)*(time step), so an approach between the samples can't be missed
+#       2. The apogee/perigee pre-filter removes pairs whose radial shells are too far apart
+#       3. Pairs whose range rate goes from negative to positive within the interval have a closest approach
+#          there, its time is refined with Brent's method on the range rate of the cubic Hermite interpolant
+#          of the relative state, and the approach is kept if its miss distance is within the threshold
+
+
+
+import numpy as np
+from scipy.optimize import brentq
+from scipy.spatial import cKDTree
+
+import Orbits_module as orbits
+from Ephemeris_module import Hermite_Interpolation
+
+
+def Apsis_Radii(rvects, vvects):
+    # This function calculates the perigee and apogee radii of N objects
+    # Inputs:
+    #       rvects - (N,3) array of position vectors (km)
+    #       vvects - (N,3) array of velocity vectors (km/s)
+    # Outputs:
+    #       rp - (N,) perigee radii (km)
+    #       ra - (N,) apogee radii (km), infinite for parabolic and hyperbolic orbits
+
+    [h, ecc, a, _, _, _, _] = orbits.COEsFunction_Batch(rvects, vvects)
+    muearth = 398600  # km^3/s^2
+    rp = (h**2)/muearth/(1 + ecc)
+    with np.errstate(divide='ignore'):
+        ra = np.where(ecc < 1, a*(1 + ecc), np.inf)
+
+    return [rp, ra]
+
+
+def Apsis_Filter(i, j, rp, ra, threshold):
+    # This function is the apogee/perigee pre-filter, a pair can only come within the threshold if the
+    # radial shells [rp, ra] of the two objects are within the threshold of each other
+    # Inputs:
+    #       i, j - (P,) arrays of object indices of each pair
+    #       rp, ra - (N,) perigee and apogee radii of all objects (km)
+    #       threshold - Screening distance (km)
+    # Outputs:
+    #       keep - (P,) boolean array, True for pairs that pass the filter
+
+    return np.maximum(rp[i], rp[j]) - np.minimum(ra[i], ra[j]) <= threshold
+
+
+def _Close_Pairs(r, radius, N):
+    # Pairs of objects closer than radius at one output time, encoded as i*N + j with i < j
+    pairs = cKDTree(r).query_pairs(radius, output_type='ndarray')
+    return pairs[:,0].astype(np.int64)*N + pairs[:,1]
+
+
+def Screen_Conjunctions(chunks, threshold, rp=None, ra=None):
+    # This function screens a stream of propagated states for close approaches
+    # Only the current chunk and the last output time of the previous chunk are held in memory
+    # Inputs:
+    #       chunks - Iterable of [t, r, v] chunks in increasing time order, (n,) times (sec), (n,N,3) positions (km)
+    #                and (n,N,3) velocities (km/s), such as from orbits.ODE_two_body_motion_stream()
+    #       threshold - Screening distance (km)
+    #       rp, ra - (N,) perigee and apogee radii for the pre-filter, from Apsis_Radii() (optional)
+    # Yields (for each chunk, only the approaches found in it):
+    #       i, j - (E,) object indices of each close approach, i < j
+    #       tca - (E,) times of closest approach (sec)
+    #       miss - (E,) miss distances (km)
+    #       relspeed - (E,) relative speeds at closest approach (km/s)
+
+    prev = None   # [t, r, v, close pairs] of the previous output time
+    for [t, r, v] in chunks:
+        N = r.shape[1]
+        found = [[], [], [], [], []]
+        for k in range(len(t)):
+            if prev is None:
+                prev = [t[k], r[k], v[k], None]
+                continue
+            [t0, r0, v0, pairs0] = prev
+            [t1, r1, v1] = [t[k], r[k], v[k]]
+            h = t1 - t0
+
+            # Candidate pairs within the padded radius at either end of the interval
+            radius = threshold + max(np.linalg.norm(v0, axis=1).max(), np.linalg.norm(v1, axis=1).max())*h
+            if pairs0 is None:
+                pairs0 = _Close_Pairs(r0, radius, N)
+            pairs1 = _Close_Pairs(r1, radius, N)
+            prev = [t1, r1, v1, pairs1]
+            pairs = np.union1d(pairs0, pairs1)
+            i = pairs//N
+            j = pairs % N
+            if rp is not None:
+                keep = Apsis_Filter(i, j, rp, ra, threshold)
+                i = i[keep]
+                j = j[keep]
+
+            # Closest approach inside the interval where the range rate goes from negative to positive
+            dr0 = r0[j] - r0[i]
+            dv0 = v0[j] - v0[i]
+            dr1 = r1[j] - r1[i]
+            dv1 = v1[j] - v1[i]
+            s0 = np.einsum('ij,ij->i', dr0, dv0)
+            s1 = np.einsum('ij,ij->i', dr1, dv1)
+            bracket = (s0 < 0) & (s1 >= 0)
+
+            for p in np.nonzero(bracket)[0]:
+                rangerate = lambda s: np.dot(*Hermite_Interpolation(s, h, dr0[p], dv0[p], dr1[p], dv1[p], 0, 3))
+                s = brentq(rangerate, 0, 1, xtol=1e-10)
+                [dr, dv] = Hermite_Interpolation(s, h, dr0[p], dv0[p], dr1[p], dv1[p], 0, 3)
+                miss = np.linalg.norm(dr)
+                if miss <= threshold:
+                    found[0].append(i[p])
+                    found[1].append(j[p])
+                    found[2].append(t0 + s*h)
+                    found[3].append(miss)
+                    found[4].append(np.linalg.norm(dv))
+
+        yield [np.array(found[0], dtype=np.int64), np.array(found[1], dtype=np.int64),
+               np.array(found[2]), np.array(found[3]), np.array(found[4])]
+
+
+def Conjunction_Screening(rvects, vvects, tf, dt, threshold, chunksize=1000, prefilter=True):
+    # This function propagates a catalog and screens it for close approaches
+    # Inputs:
+    #       rvects - (N,3) array of position vectors (km)
+    #       vvects - (N,3) array of velocity vectors (km/s)
+    #       tf - How long to screen forward (sec)
+    #       dt - Spacing of the screening time steps (sec)
+    #       threshold - Screening distance (km)
+    #       chunksize - Number of time steps propagated per chunk, bounds the memory used (optional)
+    #       prefilter - Whether to use the apogee/perigee pre-filter (optional)
+    # Outputs:
+    #       i, j, tca, miss, relspeed - Close approaches, see Screen_Conjunctions()
+
+    [rp, ra] = Apsis_Radii(rvects, vvects) if prefilter else [None, None]
+    chunks = orbits.ODE_two_body_motion_stream(rvects, vvects, tf, dt, chunksize=chunksize)
+    results = list(Screen_Conjunctions(chunks, threshold, rp, ra))
+
+    return [np.concatenate(x) for x in zip(*results)]
+
+
+def main():
+    # Two objects in circular orbits of the same radius in different planes, which meet at the node line
+    # plus an object in a much higher orbit that the pre-filter removes
+    rearth = 6378 # km
+    muearth = 398600 # km^3/s^2
+    r = rearth + 700
+    vc = np.sqrt(muearth/r)
+    rvects = np.array([[r, 0, 0], [r, 0, 0.5], [42164, 0, 0]])
+    vvects = np.array([[0, vc, 0], [0, vc*np.cos(np.radians(60)), vc*np.sin(np.radians(60))], [0, np.sqrt(muearth/42164), 0]])
+    # Start both half an orbit before the meeting point
+    period = 2*np.pi*np.sqrt(r**3/muearth)
+    [rvects_start, vvects_start, _] = orbits.Universal_Variable_Prop_Batch(muearth, rvects, vvects, -period/2)
+
+    [i, j, tca, miss, relspeed] = Conjunction_Screening(rvects_start, vvects_start, period, 10, 5)
+    for k in range(len(i)):
+        print("Objects {} and {}: TCA = {:.3f} sec, miss distance = {:.4f} km, relative speed = {:.3f} km/s".format(
+            i[k], j[k], tca[k], miss[k], relspeed[k]))
+
+
+if __name__ == '__main__': main()
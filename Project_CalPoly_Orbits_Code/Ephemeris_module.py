@@ -0,0 +1,471 @@
+# Module that contains classes for storing and reusing propagated ephemerides, so that the same objects do not
+# have to be propagated from scratch every time they are needed
+
+# Explanation of the classes that are part of this module
+#       EphemerisCache(): Cache of propagated R and V nodes keyed by initial state and epoch, queried by Hermite interpolation
+#           Constructors:
+#               EphemerisCache(node_step, order, pos_tol, vel_tol, max_nodes, max_level, muearth, propagator)
+#
+#           Member Functions:
+#               getState() - returns the R and V vectors of an object at a given time
+#               getStates() - returns the R and V vectors of an object at an array of times
+#               getHits() - returns the number of queries answered by interpolation only
+#               getMisses() - returns the number of queries that needed at least one real propagation
+#               getNodeCount() - returns the number of stored nodes over all objects
+#               clear() - removes all stored objects and resets the counters
+#
+#       ChebyshevEphemeris(): Reader of a Chebyshev compressed ephemeris file, memory mapped so it is never loaded whole
+#           Constructors:
+#               ChebyshevEphemeris(filename)
+#
+#           Member Functions:
+#               getState() - returns the R and V vectors of an object at a time or an array of times
+#               getObjectCount() - returns the number of objects in the file
+#               getTimeSpan() - returns the first and last time covered by the file
+#               close() - unmaps and closes the file
+#
+# Functions that are part of this module
+#       Hermite_Interpolation(): Cubic or quintic Hermite interpolation of R and V between two nodes
+#       Write_Chebyshev_Ephemeris(): Fits piecewise Chebyshev polynomials to propagated states and writes them to a binary file
+#
+# Chebyshev ephemeris file layout (little endian):
+#       Header (64 bytes) - magic b'CHEBEPH1', version, number of objects N, degree, number of segments,
+#                           start time, nominal segment length, byte offset of the segment index
+#       Coefficients - float64 array of shape (segments, N, 6, degree+1) for x, y, z, vx, vy, vz
+#       Segment index - float64 array of shape (segments, 2) with the start and end time of each segment
+
+
+
+import math
+import mmap
+import struct
+from collections import OrderedDict
+
+import numpy as np
+
+import Orbits_module as orbits
+
+
+# Max over s of |d/ds| of the Hermite error term divided by its value at s = 0.5, for each interpolation order
+_HERMITE_VELOCITY_RATIO = {3: 3.08, 5: 3.44}
+
+# Hermite interpolation between two nodes
+def Hermite_Interpolation(s, h, r0, v0, r1, v1, muearth, order):
+    # This function interpolates R and V between two nodes a time h apart
+    # Inputs:
+    #       s - Fraction of the way from node 0 to node 1 (0 to 1)
+    #       h - Time between the two nodes (sec)
+    #       r0, v0 - R and V vectors at node 0 (km, km/s)
+    #       r1, v1 - R and V vectors at node 1 (km, km/s)
+    #       muearth - Standard Gravitational Parameter (km^3/s^2)
+    #       order - 3 for cubic Hermite (uses R and V), 5 for quintic Hermite (also uses 2 body accelerations)
+    # Outputs:
+    #       r - Interpolated position vector (km)
+    #       v - Interpolated velocity vector (km/s)
+
+    if order == 3:
+        # Cubic basis functions and their derivatives with respect to s
+        H = [2*s**3 - 3*s**2 + 1, s**3 - 2*s**2 + s, -2*s**3 + 3*s**2, s**3 - s**2]
+        dH = [6*s**2 - 6*s, 3*s**2 - 4*s + 1, -6*s**2 + 6*s, 3*s**2 - 2*s]
+        r = H[0]*r0 + H[1]*h*v0 + H[2]*r1 + H[3]*h*v1
+        v = (dH[0]*r0 + dH[1]*h*v0 + dH[2]*r1 + dH[3]*h*v1)/h
+    elif order == 5:
+        # 2 body accelerations at the nodes
+        a0 = -muearth*r0/np.linalg.norm(r0)**3
+        a1 = -muearth*r1/np.linalg.norm(r1)**3
+        # Quintic basis functions and their derivatives with respect to s
+        H = [1 - 10*s**3 + 15*s**4 - 6*s**5,
+             s - 6*s**3 + 8*s**4 - 3*s**5,
+             (s**2 - 3*s**3 + 3*s**4 - s**5)/2,
+             10*s**3 - 15*s**4 + 6*s**5,
+             -4*s**3 + 7*s**4 - 3*s**5,
+             (s**3 - 2*s**4 + s**5)/2]
+        dH = [-30*s**2 + 60*s**3 - 30*s**4,
+              1 - 18*s**2 + 32*s**3 - 15*s**4,
+              (2*s - 9*s**2 + 12*s**3 - 5*s**4)/2,
+              30*s**2 - 60*s**3 + 30*s**4,
+              -12*s**2 + 28*s**3 - 15*s**4,
+              (3*s**2 - 8*s**3 + 5*s**4)/2]
+        r = H[0]*r0 + H[1]*h*v0 + H[2]*h**2*a0 + H[3]*r1 + H[4]*h*v1 + H[5]*h**2*a1
+        v = (dH[0]*r0 + dH[1]*h*v0 + dH[2]*h**2*a0 + dH[3]*r1 + dH[4]*h*v1 + dH[5]*h**2*a1)/h
+    else:
+        raise ValueError('Hermite interpolation order must be 3 or 5, not {}'.format(order))
+
+    return [r, v]
+
+
+class EphemerisCache:
+    # Nodes of each object are placed on a grid of spacing node_step starting at its epoch. When an interval
+    # between two nodes is first used, the interpolated state at its midpoint (where the Hermite error term
+    # peaks) is checked against a real propagation. If the error is above pos_tol/vel_tol the interval is split
+    # in half, down to max_level splits, after which queries in that interval are propagated directly.
+    # Verified intervals are remembered, so later queries there are answered by interpolation only.
+    # The check is an error estimate, not a guaranteed bound: it samples one point and assumes the leading
+    # Hermite error term dominates, which holds once the intervals are short compared to the orbit period.
+    _nodeStep = 60.0
+    _order = 5
+    _posTol = 1.0e-6
+    _velTol = 1.0e-9
+    _maxNodes = 1000000
+    _maxLevel = 10
+    _muearth = 398600
+    _propagator = None
+    _objects = None
+    _nodeCount = 0
+    _hits = 0
+    _misses = 0
+
+    # Constructor
+    def __init__(self, node_step=60.0, order=5, pos_tol=1.0e-6, vel_tol=1.0e-9, max_nodes=1000000, max_level=10,
+                 muearth=398600, propagator=None):
+        # Inputs:
+        #       node_step - Spacing of the coarsest node grid (sec)
+        #       order - 3 for cubic or 5 for quintic Hermite interpolation
+        #       pos_tol - Position error tolerance of interpolated states, checked against the estimated error (km)
+        #       vel_tol - Velocity error tolerance of interpolated states, checked against the estimated error (km/s)
+        #       max_nodes - Memory cap on the number of stored nodes (at least 3, the nodes checking one interval needs),
+        #                   least recently used objects are evicted past it, then the other nodes of the queried object
+        #       max_level - Maximum number of times an interval can be split in half
+        #       muearth - Standard Gravitational Parameter (km^3/s^2)
+        #       propagator - Function propagator(rvect, vvect, dt) returning [rvect_new, vvect_new],
+        #                    defaults to orbits.Universal_Variable_Prop()
+
+        if order not in (3, 5):
+            raise ValueError('Hermite interpolation order must be 3 or 5, not {}'.format(order))
+        if max_nodes < 3:
+            raise ValueError('max_nodes must be at least 3, the nodes needed to check one interval, not {}'.format(max_nodes))
+
+        self._nodeStep = float(node_step)
+        self._order = order
+        self._posTol = pos_tol
+        self._velTol = vel_tol
+        self._maxNodes = max_nodes
+        self._maxLevel = max_level
+        self._muearth = muearth
+        if propagator is None:
+            propagator = lambda rvect, vvect, dt: orbits.Universal_Variable_Prop(muearth, rvect, vvect, dt)
+        self._propagator = propagator
+        self._objects = OrderedDict()   # key -> {'nodes': {m: [r, v]}, 'intervals': {(level, k): True/False}}
+        self._nodeCount = 0
+        self._hits = 0
+        self._misses = 0
+
+    # Getter functions
+    def getHits(self):
+        return self._hits
+
+    def getMisses(self):
+        return self._misses
+
+    def getNodeCount(self):
+        return self._nodeCount
+
+    # clear() function
+    def clear(self):
+        self._objects.clear()
+        self._nodeCount = 0
+        self._hits = 0
+        self._misses = 0
+
+    # getState() function
+    def getState(self, rvect, vvect, epoch, t):
+        # Inputs:
+        #       rvect - Position vector at the epoch (km)
+        #       vvect - Velocity vector at the epoch (km/s)
+        #       epoch - Epoch of rvect and vvect (sec, on any time scale as long as t uses the same one)
+        #       t - Time to get the state at (sec)
+        # Outputs:
+        #       r - Position vector at time t (km)
+        #       v - Velocity vector at time t (km/s)
+
+        rvect = np.asarray(rvect, dtype=float)
+        vvect = np.asarray(vvect, dtype=float)
+        key = (tuple(rvect), tuple(vvect), float(epoch))
+        obj = self._getObject(key)
+        dt = t - epoch
+
+        propagated = False
+        level = 0
+        h = self._nodeStep
+        k = math.floor(dt/h)
+        span = 2**(self._maxLevel + 1)   # Index spacing of the nodes of level 0 intervals on the finest grid
+
+        while True:
+            status = obj['intervals'].get((level, k))
+            if status is None:
+                # First use of this interval, check it at its midpoint
+                propagated = True
+                status = self._verifyInterval(obj, rvect, vvect, k*span, span)
+                obj['intervals'][(level, k)] = status
+            if status:
+                break
+            if level == self._maxLevel:
+                # Interval can't be split any further, propagate directly
+                self._misses += 1
+                self._enforceCap(obj, ())
+                [r, v] = self._propagator(rvect, vvect, dt)
+                return [np.asarray(r, dtype=float), np.asarray(v, dtype=float)]
+            # Go to the half interval that contains dt
+            level += 1
+            h = h/2
+            span = span//2
+            k = 2*k + (1 if dt >= (2*k + 1)*h else 0)
+
+        if propagated:
+            self._misses += 1
+            self._enforceCap(obj, (k*span, (k + 1)*span))
+        else:
+            self._hits += 1
+
+        [r0, v0] = obj['nodes'][k*span]
+        [r1, v1] = obj['nodes'][(k + 1)*span]
+        t0 = self._nodeTime(k*span)
+        h = self._nodeTime((k + 1)*span) - t0
+        return Hermite_Interpolation((dt - t0)/h, h, r0, v0, r1, v1, self._muearth, self._order)
+
+    # getStates() function
+    def getStates(self, rvect, vvect, epoch, times):
+        # Same as getState() but for an array of times, returns (T,3) arrays of R and V vectors
+
+        states = [self.getState(rvect, vvect, epoch, t) for t in np.atleast_1d(times)]
+        return [np.array([s[0] for s in states]), np.array([s[1] for s in states])]
+
+    # Helper functions
+    def _getObject(self, key):
+        # Looks up an object and marks it as most recently used
+        obj = self._objects.get(key)
+        if obj is None:
+            obj = {'nodes': {}, 'intervals': {}}
+            self._objects[key] = obj
+        else:
+            self._objects.move_to_end(key)
+        return obj
+
+    def _nodeTime(self, m):
+        # Time after the epoch of node m, nodes are indexed on the finest grid so that their keys are exact
+        return m*self._nodeStep/2**(self._maxLevel + 1)
+
+    def _getNode(self, obj, rvect, vvect, m):
+        # Returns the R and V node m, propagating it if it is not stored yet
+        node = obj['nodes'].get(m)
+        if node is None:
+            if m == 0:
+                node = [rvect, vvect]
+            else:
+                [r, v] = self._propagator(rvect, vvect, self._nodeTime(m))
+                node = [np.asarray(r, dtype=float), np.asarray(v, dtype=float)]
+            obj['nodes'][m] = node
+            self._nodeCount += 1
+        return node
+
+    def _verifyInterval(self, obj, rvect, vvect, m, span):
+        # Checks the interpolation error at the midpoint of the interval between nodes m and m+span
+        [r0, v0] = self._getNode(obj, rvect, vvect, m)
+        [r1, v1] = self._getNode(obj, rvect, vvect, m + span)
+        h = self._nodeTime(m + span) - self._nodeTime(m)
+        [rm, vm] = self._getNode(obj, rvect, vvect, m + span//2)   # Also a node of both half intervals
+        [ri, vi] = Hermite_Interpolation(0.5, h, r0, v0, r1, v1, self._muearth, self._order)
+        # The position error term, s^3(1-s)^3 for quintic or s^2(1-s)^2 for cubic, peaks at the midpoint but its
+        # derivative (the velocity error) is zero there, so the velocity error is estimated from the position error
+        # using the ratio of the peak of the derivative to the value at the midpoint
+        pos_err = np.linalg.norm(ri - rm)
+        vel_err = pos_err*_HERMITE_VELOCITY_RATIO[self._order]/h + np.linalg.norm(vi - vm)
+        return bool(pos_err <= self._posTol and vel_err <= self._velTol)
+
+    def _enforceCap(self, obj, keep):
+        # Evicts least recently used objects until the node count is under the memory cap. If the object being
+        # queried (the most recently used one) is still over it on its own, all its intervals and every node but
+        # the keep nodes the query interpolates between are dropped, and they are propagated again when next needed
+        while self._nodeCount > self._maxNodes and len(self._objects) > 1:
+            [_, evicted] = self._objects.popitem(last=False)
+            self._nodeCount -= len(evicted['nodes'])
+        if self._nodeCount > self._maxNodes:
+            nodes = obj['nodes']
+            obj['nodes'] = {m: nodes[m] for m in keep}
+            obj['intervals'].clear()
+            self._nodeCount -= len(nodes) - len(keep)
+
+
+#-----------------------------------------------------------------------------
+# CHEBYSHEV COMPRESSED EPHEMERIS FILES
+_CHEB_MAGIC = b'CHEBEPH1'
+_CHEB_VERSION = 1
+_CHEB_HEADER = struct.Struct('<8sIIIIQddQ')   # magic, version, N, degree, padding, segments, t0, segment length, index offset
+_CHEB_HEADER_SIZE = 64
+
+def Write_Chebyshev_Ephemeris(filename, chunks, segment_length, degree=12):
+    # This function fits piecewise Chebyshev polynomials to the propagated states of N objects and writes the
+    # coefficients to a binary file. The states are consumed one chunk at a time, so the output of
+    # orbits.ODE_two_body_motion_stream() can be written without ever holding the whole span in memory
+    # Inputs:
+    #       filename - Name of the file to write
+    #       chunks - Iterable of [t, r, v] chunks in increasing time order, (n,) times (sec), (n,N,3) positions (km)
+    #                and (n,N,3) velocities (km/s). For a propstate from orbits.ODE_two_body_motion_multi() use
+    #                [[t, propstate[:,:,0:3], propstate[:,:,3:6]]]
+    #       segment_length - Time span covered by each polynomial (sec)
+    #       degree - Degree of the Chebyshev polynomials, each segment needs at least degree+1 samples. Samples left after
+    #                the last full segment that are too few for their own segment are merged into the last full segment
+    # Outputs:
+    #       segments - Number of segments written
+    #       pos_residual - Largest position fit residual over all samples (km)
+    #       vel_residual - Largest velocity fit residual over all samples (km/s)
+
+    segments = 0
+    pos_residual = 0.0
+    vel_residual = 0.0
+    index = []
+
+    def fit(tseg, sseg, tstart, tend):
+        # Least squares fit of all objects and components of one segment at once
+        x = 2*(tseg - tstart)/(tend - tstart) - 1
+        A = np.polynomial.chebyshev.chebvander(x, degree)
+        Y = sseg.reshape(len(tseg), -1)
+        coeffs = np.linalg.lstsq(A, Y, rcond=None)[0]
+        resid = np.abs(A @ coeffs - Y).reshape(sseg.shape)
+        coeffs = coeffs.T.reshape(sseg.shape[1], 6, degree + 1)
+        return [coeffs, resid[:,:,0:3].max(), resid[:,:,3:6].max()]
+
+    with open(filename, 'wb') as file:
+        file.write(bytes(_CHEB_HEADER_SIZE))   # Header is filled in once the number of segments is known
+
+        def write(tseg, sseg, tstart, tend):
+            nonlocal pos_residual, vel_residual
+            if len(tseg) < degree + 1:
+                raise ValueError('Segment starting at t = {} sec has fewer than degree+1 = {} samples'.format(tstart, degree + 1))
+            [coeffs, pres, vres] = fit(tseg, sseg, tstart, tend)
+            file.write(np.ascontiguousarray(coeffs, dtype='<f8').tobytes())
+            index.append([tstart, tend])
+            pos_residual = max(pos_residual, float(pres))
+            vel_residual = max(vel_residual, float(vres))
+
+        N = None
+        t0 = None
+        tbuf = np.empty(0)
+        sbuf = None
+        held = None   # Last complete segment, written once it is known whether the remaining samples need merging into it
+        for [t, r, v] in chunks:
+            t = np.asarray(t, dtype=float)
+            states = np.concatenate((r, v), axis=2)
+            if N is None:
+                N = states.shape[1]
+                t0 = t[0]
+                sbuf = np.empty((0, N, 6))
+            tbuf = np.concatenate((tbuf, t))
+            sbuf = np.concatenate((sbuf, states))
+
+            # Fit every segment that is now complete, keeping its end sample for the next segment
+            while tbuf[-1] >= t0 + (segments + 1)*segment_length:
+                tstart = t0 + segments*segment_length
+                tend = tstart + segment_length
+                inseg = tbuf <= tend
+                if inseg.sum() < degree + 1:
+                    raise ValueError('Segment starting at t = {} sec has fewer than degree+1 = {} samples'.format(tstart, degree + 1))
+                if held is not None:
+                    write(*held)
+                held = [tbuf[inseg], sbuf[inseg], tstart, tend]
+                segments += 1
+                keep = tbuf >= tend
+                tbuf = tbuf[keep]
+                sbuf = sbuf[keep]
+
+        if N is None:
+            raise ValueError('No states were given to write')
+
+        # Remaining samples after the last complete segment. With enough of them they get their own shorter segment,
+        # otherwise they are merged into the fit of the last complete segment, which then runs a bit longer
+        if len(tbuf) > 1:
+            tstart = t0 + segments*segment_length
+            if len(tbuf) >= degree + 1 or held is None:
+                if held is not None:
+                    write(*held)
+                write(tbuf, sbuf, tstart, tbuf[-1])
+            else:
+                write(np.concatenate((held[0], tbuf[1:])), np.concatenate((held[1], sbuf[1:])), held[2], tbuf[-1])
+        elif held is not None:
+            write(*held)
+        segments = len(index)
+
+        # Segment index and header
+        index_offset = file.tell()
+        file.write(np.asarray(index, dtype='<f8').tobytes())
+        file.seek(0)
+        file.write(_CHEB_HEADER.pack(_CHEB_MAGIC, _CHEB_VERSION, N, degree, 0, segments, t0, segment_length, index_offset))
+
+    return [segments, pos_residual, vel_residual]
+
+
+class ChebyshevEphemeris:
+    # The file is memory mapped and the coefficient array is a view into the mapping, so opening it costs almost
+    # nothing and only the pages holding the segments that are queried get read. Several processes reading the
+    # same file share those pages through the operating system page cache.
+    _file = None
+    _mmap = None
+    _coeffs = None
+    _index = None
+    _objects = 0
+    _degree = 0
+
+    # Constructor
+    def __init__(self, filename):
+        # Inputs:
+        #       filename - Name of a file written by Write_Chebyshev_Ephemeris()
+
+        self._file = open(filename, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        [magic, version, N, degree, _, segments, _, _, index_offset] = _CHEB_HEADER.unpack_from(self._mmap, 0)
+        if magic != _CHEB_MAGIC or version != _CHEB_VERSION:
+            self.close()
+            raise ValueError('{} is not a version {} Chebyshev ephemeris file'.format(filename, _CHEB_VERSION))
+
+        self._objects = N
+        self._degree = degree
+        self._coeffs = np.frombuffer(self._mmap, dtype='<f8', count=segments*N*6*(degree + 1),
+                                     offset=_CHEB_HEADER_SIZE).reshape(segments, N, 6, degree + 1)
+        self._index = np.frombuffer(self._mmap, dtype='<f8', count=2*segments, offset=index_offset).reshape(segments, 2)
+
+    # Getter functions
+    def getObjectCount(self):
+        return self._objects
+
+    def getTimeSpan(self):
+        return [self._index[0,0], self._index[-1,1]]
+
+    # getState() function
+    def getState(self, obj, t):
+        # Inputs:
+        #       obj - Index of the object in the file (0 to N-1)
+        #       t - Time (sec) or array of times, must be inside getTimeSpan()
+        # Outputs:
+        #       r - Position vector(s) at time t, (3,) or (M,3) (km)
+        #       v - Velocity vector(s) at time t, (3,) or (M,3) (km/s)
+
+        tq = np.atleast_1d(np.asarray(t, dtype=float))
+        [tfirst, tlast] = self.getTimeSpan()
+        if np.any(tq < tfirst) or np.any(tq > tlast):
+            raise ValueError('Query times must be between {} and {} sec'.format(tfirst, tlast))
+
+        # Segment of each query time and its position inside the segment
+        seg = np.clip(np.searchsorted(self._index[:,1], tq), 0, len(self._index) - 1)
+        tstart = self._index[seg,0]
+        tend = self._index[seg,1]
+        x = 2*(tq - tstart)/(tend - tstart) - 1
+
+        T = np.polynomial.chebyshev.chebvander(x, self._degree)           # (M, degree+1)
+        states = np.einsum('mk,mck->mc', T, self._coeffs[seg, obj])         # (M, 6)
+
+        if np.ndim(t) == 0:
+            return [states[0,0:3], states[0,3:6]]
+        return [states[:,0:3], states[:,3:6]]
+
+    # close() function
+    def close(self):
+        # The views into the mapping have to be released before it can be closed
+        self._coeffs = None
+        self._index = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
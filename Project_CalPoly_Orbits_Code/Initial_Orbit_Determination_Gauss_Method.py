@@ -75,7 +75,10 @@ def main():
    # Solving for R2
    S = [1, 0, -((d1**2)+2*C*d1+(np.linalg.norm(Rsite2)**2)), 0, 0, -2*muearth*(C*d2+d1*d2), 0, 0, -(muearth**2)*(d2**2)]   # Coefficients of R2 eqn
    r2 = np.roots(S)   # finds all real and complex roots
-   R2 = (r2[2]).real         # hardcoded to get the real root of r2
+   # The smallest root that is real and positive and gives positive slant ranges, the same choice as Gauss_IOD_Batch()
+   [valid, R2s, _, _, _, _] = orbits.Gauss_Valid_Roots(r2[None,:], M[None,:,:], np.array([a1]), np.array([a1u]),
+                                                      np.array([a3]), np.array([a3u]), muearth)
+   R2 = min(R2s[valid])
    
    # Getting u, c1, c3 based on R2
    u = muearth/(R2**3)
@@ -118,6 +121,16 @@ def main():
    print("True Anomaly = {} deg".format(trueanomaly))
    print("h = {} km^2/s".format(h))
    print(" ")
+   rvect2_gauss = rvect2   # Kept as the starting estimate of the least squares fit below
+   vvect2_gauss = vvect2
+   
+   # Same triplet with the batch Gauss method, which checks every root for physical validity
+   [rvect2_batch, vvect2_batch, coes_batch, status, roots] = orbits.Gauss_IOD_Batch([-33.0588410, 55.0931551, 98.7739537],
+      [-7.2056382, 36.5731946, 31.1314513], [30*60, 50*60, 60*60], [Rsite1, Rsite2, Rsite3])
+   print("Batch Gauss Method status = {} (0 is a unique valid root)".format(status[0]))
+   print("The position vector is {} km".format(rvect2_batch[0]))
+   print("The velocity vector is {} km/s".format(vvect2_batch[0]))
+   print(" ")
    
    
    # Gauss Method Extended----------------------------------------------
@@ -140,11 +153,15 @@ def main():
    
    tol = 1
    i = 1
+   x1 = None        # Universal anomalies from the previous iteration, used as warm starts for the Kepler solver
+   x3 = None
+   kepler_iterations = 0
    
    while tol > 1e-8:
       # Get new f and g values
-      [f1extend,g1extend] = orbits.UniversalVariable_GaussExtended(muearth,rvect2,vvect2,Tau1)
-      [f3extend,g3extend] = orbits.UniversalVariable_GaussExtended(muearth,rvect2,vvect2,Tau3)
+      [f1extend,g1extend,_,_,x1,n1] = orbits.Universal_Variable_Kernel(muearth,rvect2,vvect2,Tau1,x1)
+      [f3extend,g3extend,_,_,x3,n3] = orbits.Universal_Variable_Kernel(muearth,rvect2,vvect2,Tau3,x3)
+      kepler_iterations += n1 + n3
       
       # Calculate average of f and g values
       f1avg.append((f1extend + f1avg[i-1])/2)
@@ -180,6 +197,7 @@ def main():
    [h, ecc, a, inc, RAAN, argumentofperigee, trueanomaly] = orbits.COEsFunction(rvect2, vvect2)
    
    print("Gauss Method Extended--------------------------")
+   print("Converged in {} iterations with {} Kepler solver iterations".format(i-1, kepler_iterations))
    print("The position vector is {} km".format(rvect2))
    print("The velocity vector is {} km/s".format(vvect2))
    print("The Resulting COEs are: ")
@@ -190,7 +208,33 @@ def main():
    print("Argument of Perigee = {} deg".format(argumentofperigee))
    print("True Anomaly = {} deg".format(trueanomaly))
    print("h = {} km^2/s".format(h))
-      
+   print(" ")
+   
+   
+   # Batch Least Squares Differential Correction----------------------------------------------
+   # A pass of 361 synthetic observations (one every 5 seconds from 11:30 to 12:00 with 1 arcsec of noise)
+   # is simulated from the Gauss Extended orbit, then fit starting from the Non-Extended estimate
+   times = np.arange(-20*60, 10*60 + 1, 5.0)   # seconds after the middle observation at 11:50
+   utc = np.datetime64('2010-08-20T11:50:00') + times.astype('timedelta64[s]')
+   Rsites = orbits.R_site_calc_Array(lat, long, 'west', alt, utc)[0]
+   
+   [rtrue, _, _] = orbits.Universal_Variable_Prop_Batch(muearth, np.tile(rvect2, (len(times), 1)), np.tile(vvect2, (len(times), 1)), times)
+   rho = rtrue - Rsites
+   rng = np.random.default_rng(557)
+   sigma = 1/3600   # deg
+   RAobs = np.degrees(np.arctan2(rho[:,1], rho[:,0])) + rng.normal(0, sigma, len(times))
+   DECobs = np.degrees(np.arcsin(rho[:,2]/np.linalg.norm(rho, axis=1))) + rng.normal(0, sigma, len(times))
+   
+   [rvect2_ls, vvect2_ls, P, rms, iterations, converged] = orbits.Batch_Least_Squares_OD(rvect2_gauss, vvect2_gauss,
+      [times, RAobs, DECobs, Rsites], muearth, sigma, chunksize=100)
+   
+   print("Batch Least Squares--------------------------")
+   print("Converged = {} in {} iterations, residual RMS = {} arcsec".format(converged, iterations, rms*3600))
+   print("The position vector is {} km".format(rvect2_ls))
+   print("The velocity vector is {} km/s".format(vvect2_ls))
+   print("Position error = {} km (1 sigma {} km)".format(np.linalg.norm(rvect2_ls - rvect2), math.sqrt(np.trace(P[0:3,0:3]))))
+   print("Velocity error = {} km/s (1 sigma {} km/s)".format(np.linalg.norm(vvect2_ls - vvect2), math.sqrt(np.trace(P[3:6,3:6]))))
+   
    
 
 
@@ -0,0 +1,52 @@
+# Created 10/18/2026
+
+
+# This is an example of solving Lambert's problem and evaluating a porkchop grid of transfers
+# Example 5.2 from Curtis is used to check the Lambert solver, then the delta-v of LEO to GEO transfers
+# is contoured over departure time and time of flight
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+import Orbits_module as orbits
+
+
+def main():
+    muearth = 398600 # km^3/s^2
+
+    # Curtis Example 5.2
+    r1 = np.array([5000, 10000, 2100])    # (km)
+    r2 = np.array([-14600, 2500, 7000])   # (km)
+    [v1, v2, converged] = orbits.Lambert_Batch(r1, r2, 3600)
+    print("Velocity at r1 is {} km/s".format(v1[0]))
+    print("Velocity at r2 is {} km/s".format(v2[0]))
+
+    # Propagating v1 for the time of flight should land on r2
+    [r2_check, _] = orbits.Universal_Variable_Prop(muearth, r1, v1[0], 3600)
+    print("Position error after propagating the transfer is {} km".format(np.linalg.norm(r2_check - r2)))
+
+    # Porkchop grid of transfers from a 300 km LEO to GEO over 1 day of departure times
+    rleo = 6678    # km
+    rgeo = 42164   # km
+    rdep = [rleo, 0, 0]
+    vdep = [0, np.sqrt(muearth/rleo), 0]
+    rarr = [0, rgeo, 0]
+    varr = [-np.sqrt(muearth/rgeo), 0, 0]
+    tdep = np.linspace(0, 86400, 200)     # (sec)
+    tof = np.linspace(3600, 40000, 200)   # (sec)
+
+    [dv1, dv2, C3, _, _] = orbits.Porkchop_Grid(rdep, vdep, rarr, varr, tdep, tof)
+    total = dv1 + dv2
+    k = np.unravel_index(np.nanargmin(total), total.shape)
+    print("Lowest total delta-v is {} km/s, departing at {} hours with a {} hour time of flight".format(
+        total[k], tdep[k[0]]/3600, tof[k[1]]/3600))
+
+    plt.contourf(tdep/3600, tof/3600, total.T, levels=np.linspace(3.8, 10, 32))
+    plt.colorbar(label='Total delta-v (km/s)')
+    plt.xlabel('Departure time (hours)')
+    plt.ylabel('Time of flight (hours)')
+    plt.title('LEO to GEO Porkchop Plot')
+    plt.show()
+
+
+if __name__ == '__main__': main()
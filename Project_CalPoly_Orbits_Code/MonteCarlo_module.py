@@ -0,0 +1,161 @@
+# Module that contains a Monte Carlo driver for covariance/dispersion studies, where samples drawn around a
+# nominal state are propagated in parallel over a process pool
+
+# Functions defined in this module:
+#       Monte_Carlo_Dispersion(): Draws dispersed samples around a nominal state, propagates them in a process pool and
+#                                 returns the mean, covariance and percentile envelopes at each output time
+#       Monte_Carlo_Chunk(): Worker function that draws, propagates and reduces one chunk of samples
+#       Merge_Chunk_Statistics(): Combines the reduced statistics of all chunks into the final results
+
+
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import Orbits_module as orbits
+
+
+# Probability levels (percent) of the quantile sketch each chunk sends back in place of its samples
+_SKETCH_LEVELS = np.linspace(0, 100, 201)
+
+
+def Monte_Carlo_Chunk(seed, n, state, L, times, method):
+    # This function draws one chunk of samples, propagates them and reduces them so that only small arrays of
+    # statistics (instead of full trajectories) have to be sent back through pickling
+    # Inputs:
+    #       seed - numpy SeedSequence of this chunk
+    #       n - Number of samples in this chunk
+    #       state - Nominal state [x, y, z, vx, vy, vz] (km, km/s)
+    #       L - (6,6) matrix with L @ L.T equal to the covariance
+    #       times - (T,) array of output times after the epoch (sec)
+    #       method - 'uv' for orbits.Universal_Variable_Prop_Batch() or 'ode' for orbits.ODE_two_body_motion_multi()
+    # Outputs:
+    #       n - Number of samples
+    #       mean - (T,6) mean state at each output time
+    #       M2 - (T,6,6) sum of outer products of deviations from the mean at each output time
+    #       sketch - (len(_SKETCH_LEVELS),T,6) quantiles at each output time
+
+    muearth = 398600 # km^3/s^2
+
+    rng = np.random.default_rng(seed)
+    samples = state + rng.standard_normal((n, 6)) @ L.T
+
+    # Propagated states, (T,n,6)
+    if method == 'uv':
+        propstates = np.empty((len(times), n, 6))
+        for i in range(len(times)):
+            [r, v, _] = orbits.Universal_Variable_Prop_Batch(muearth, samples[:,0:3], samples[:,3:6], times[i])
+            propstates[i,:,0:3] = r
+            propstates[i,:,3:6] = v
+    elif method == 'ode':
+        [_, dense] = orbits.ODE_two_body_motion_multi(samples[:,0:3], samples[:,3:6], max(times), 2)
+        propstates = dense(times)
+    else:
+        raise ValueError("method must be 'uv' or 'ode', not {}".format(method))
+
+    mean = propstates.mean(axis=1)
+    dev = propstates - mean[:,None,:]
+    M2 = np.einsum('tni,tnj->tij', dev, dev)
+    sketch = np.percentile(propstates, _SKETCH_LEVELS, axis=1)
+
+    return [n, mean, M2, sketch]
+
+
+def Merge_Chunk_Statistics(results, percentiles):
+    # This function combines the statistics of all chunks
+    # Means and covariances are merged exactly with the pairwise update of Chan et al., percentiles are found
+    # by inverting the sample weighted mixture of the per chunk quantile sketches
+    # Inputs:
+    #       results - List of [n, mean, M2, sketch] from Monte_Carlo_Chunk()
+    #       percentiles - Percentiles (0-100) of the envelopes
+    # Outputs:
+    #       mean - (T,6) mean state at each output time
+    #       cov - (T,6,6) sample covariance at each output time
+    #       envelopes - (len(percentiles),T,6) percentile envelopes at each output time
+
+    [n, mean, M2, _] = results[0]
+    mean = mean.copy()
+    M2 = M2.copy()
+    for [nb, meanb, M2b, _] in results[1:]:
+        delta = meanb - mean
+        ntot = n + nb
+        M2 += M2b + np.einsum('ti,tj->tij', delta, delta)*(n*nb/ntot)
+        mean += delta*(nb/ntot)
+        n = ntot
+    cov = M2/max(n - 1, 1)
+
+    # Percentile envelopes from the mixture CDF of the chunk sketches
+    weights = np.array([r[0] for r in results], dtype=float)/n
+    sketches = np.stack([r[3] for r in results])   # (C,Q,T,6)
+    [_, _, T, K] = sketches.shape
+    envelopes = np.empty((len(percentiles), T, K))
+    for t in range(T):
+        for k in range(K):
+            grid = np.sort(sketches[:,:,t,k].ravel())
+            cdf = np.zeros(len(grid))
+            for c in range(len(results)):
+                cdf += weights[c]*np.interp(grid, sketches[c,:,t,k], _SKETCH_LEVELS)
+            envelopes[:,t,k] = np.interp(percentiles, cdf, grid)
+
+    return [mean, cov, envelopes]
+
+
+def Monte_Carlo_Dispersion(rvect, vvect, covariance, samples, times, percentiles=(2.5, 50, 97.5), seed=0,
+                           workers=None, chunksize=1000, method='uv'):
+    # This function propagates a Monte Carlo dispersion of an initial state over a process pool
+    # Samples are drawn in chunks, each from its own RNG stream spawned from the seed, so the results are the
+    # same no matter how many workers are used. The workers reduce their chunk before returning it.
+    # Inputs:
+    #       rvect - Nominal position vector (km)
+    #       vvect - Nominal velocity vector (km/s)
+    #       covariance - (6,6) covariance of the state [x, y, z, vx, vy, vz] (km^2, km^2/s, km^2/s^2)
+    #       samples - Number of samples to draw
+    #       times - Output times after the epoch (sec)
+    #       percentiles - Percentiles (0-100) of the envelopes (optional)
+    #       seed - Seed of the random number generator (optional)
+    #       workers - Number of worker processes, None for one per CPU or 1 to run in this process (optional)
+    #       chunksize - Number of samples per chunk (optional)
+    #       method - 'uv' for Universal Variable or 'ode' for ODE propagation (optional)
+    # Outputs:
+    #       mean - (T,6) mean state at each output time
+    #       cov - (T,6,6) sample covariance at each output time
+    #       envelopes - (len(percentiles),T,6) percentile envelopes at each output time
+
+    state = np.concatenate((np.asarray(rvect, dtype=float), np.asarray(vvect, dtype=float)))
+    times = np.atleast_1d(np.asarray(times, dtype=float))
+
+    # Square root of the covariance, eigendecomposition so that singular covariances also work
+    [w, U] = np.linalg.eigh(np.asarray(covariance, dtype=float))
+    L = U*np.sqrt(np.clip(w, 0, None))
+
+    nchunks = math.ceil(samples/chunksize)
+    seeds = np.random.SeedSequence(seed).spawn(nchunks)
+    sizes = [min(chunksize, samples - i*chunksize) for i in range(nchunks)]
+    args = [(seeds[i], sizes[i], state, L, times, method) for i in range(nchunks)]
+
+    if workers == 1:
+        results = [Monte_Carlo_Chunk(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(Monte_Carlo_Chunk, *zip(*args)))
+
+    return Merge_Chunk_Statistics(results, np.asarray(percentiles, dtype=float))
+
+
+def main():
+    # Dispersion of the Curtis Problem 3.20 initial state with 1 km and 1 m/s standard deviations
+    rvect = [20000, -105000, -19000]  # (km)
+    vvect = [.9000, -3.4000, -1.5000] # (km/s)
+    covariance = np.diag([1, 1, 1, 1e-6, 1e-6, 1e-6])
+    times = np.array([0, 1, 2])*3600  # hours converted to seconds
+
+    [mean, cov, envelopes] = Monte_Carlo_Dispersion(rvect, vvect, covariance, 20000, times, workers=4)
+
+    print("Mean position vector 2 hours later is {} km".format(mean[2,0:3]))
+    print("Position standard deviations 2 hours later are {} km".format(np.sqrt(np.diag(cov[2])[0:3])))
+    print("2.5% and 97.5% envelope of x 2 hours later is {} to {} km".format(envelopes[0,2,0], envelopes[2,2,0]))
+
+
+if __name__ == '__main__': main()
@@ -0,0 +1,394 @@
+# Module that contains a streaming reader of angles-only observation files and a pipeline that feeds them through
+# the batch Gauss method of Initial Orbit Determination, without ever loading a whole file into memory
+
+# Explanation of the classes that are part of this module
+#       IODResultWriter(): Writer of a columnar IOD result file, one row group per call to write()
+#           Constructors:
+#               IODResultWriter(filename)
+#
+#           Member Functions:
+#               write() - appends a row group of results to the file
+#               getRowCount() - returns the number of rows written so far
+#               close() - writes the row group index and the header and closes the file
+#
+# Functions that are part of this module
+#       Write_Observation_File(): Writes chunks of observations to a CSV (.csv) or binary observation file
+#       Read_Observation_File(): Reads an observation file one chunk at a time as numpy structured arrays
+#       Observation_Site_Vectors(): Site vectors in ECI of every observation from its station coordinates and time
+#       Tracklet_Triplets(): Picks time spaced observation triplets out of sorted tracklets
+#       Read_IOD_Results(): Reads some or all columns of a columnar IOD result file
+#       Stream_Gauss_IOD(): Reads an observation file, groups it into tracklets and triplets and writes their Gauss IOD results
+#
+# Observation files hold one record per observation, in increasing time order (objects may be interleaved):
+#       object - Integer id of the observed object
+#       jd - Julian Date of the observation (UTC)
+#       ra, dec - Right ascension and declination [deg]
+#       lat, lon, alt - Geodetic latitude [deg], east longitude [deg] and altitude [m] of the station
+# CSV files have a header line with these names. Binary files are a 16 byte header (magic b'ANGOBS01', version,
+# record size) followed by little endian records of _OBS_DTYPE
+#
+# IOD result file layout (little endian):
+#       Header (32 bytes) - magic b'IODCOL01', version, number of columns, number of row groups, byte offset of the index
+#       Row groups - each one holds the rows of one write() call, stored column after column in _RESULT_COLUMNS order
+#       Row group index - int64 array of shape (row groups, 2) with the byte offset and number of rows of each row group
+
+
+
+import itertools
+import struct
+import time
+
+import numpy as np
+
+import Orbits_module as orbits
+
+
+_OBS_DTYPE = np.dtype([('object', '<i8'), ('jd', '<f8'), ('ra', '<f8'), ('dec', '<f8'),
+                       ('lat', '<f8'), ('lon', '<f8'), ('alt', '<f8')])
+_OBS_MAGIC = b'ANGOBS01'
+_OBS_VERSION = 1
+_OBS_HEADER = struct.Struct('<8sII')   # magic, version, record size
+
+_RESULT_COLUMNS = (('object', '<i8'), ('jd', '<f8'),
+                   ('rx', '<f8'), ('ry', '<f8'), ('rz', '<f8'), ('vx', '<f8'), ('vy', '<f8'), ('vz', '<f8'),
+                   ('h', '<f8'), ('ecc', '<f8'), ('a', '<f8'), ('inc', '<f8'), ('RAAN', '<f8'),
+                   ('argumentofperigee', '<f8'), ('trueanomaly', '<f8'), ('status', '<i8'))
+_RESULT_MAGIC = b'IODCOL01'
+_RESULT_VERSION = 1
+_RESULT_HEADER = struct.Struct('<8sIIQQ')   # magic, version, number of columns, row groups, index offset
+
+
+def Write_Observation_File(filename, chunks):
+    # This function writes observations to a file, as CSV text if the filename ends with .csv or as binary records if not
+    # Inputs:
+    #       filename - Name of the file to write
+    #       chunks - Iterable of structured arrays with the fields of _OBS_DTYPE, in increasing time order
+    # Outputs:
+    #       count - Number of observations written
+
+    count = 0
+    if filename.endswith('.csv'):
+        with open(filename, 'w') as file:
+            file.write(','.join(_OBS_DTYPE.names) + '\n')
+            for chunk in chunks:
+                np.savetxt(file, chunk, fmt=['%d', '%.10f', '%.9f', '%.9f', '%.6f', '%.6f', '%.3f'], delimiter=',')
+                count += len(chunk)
+    else:
+        with open(filename, 'wb') as file:
+            file.write(_OBS_HEADER.pack(_OBS_MAGIC, _OBS_VERSION, _OBS_DTYPE.itemsize))
+            for chunk in chunks:
+                file.write(np.ascontiguousarray(chunk, dtype=_OBS_DTYPE).tobytes())
+                count += len(chunk)
+
+    return count
+
+
+def Read_Observation_File(filename, chunksize=100000):
+    # This generator reads an observation file written by Write_Observation_File() (or by a sensor in the same format)
+    # chunksize records at a time, so files much larger than memory can be read
+    # Inputs:
+    #       filename - Name of a CSV (.csv) or binary observation file
+    #       chunksize - Number of observations per chunk (optional)
+    # Outputs (yielded):
+    #       chunk - Structured array of up to chunksize observations with the fields of _OBS_DTYPE
+
+    if filename.endswith('.csv'):
+        with open(filename, 'r') as file:
+            file.readline()   # Header line
+            while True:
+                lines = list(itertools.islice(file, chunksize))
+                if not lines:
+                    break
+                yield np.loadtxt(lines, dtype=_OBS_DTYPE, delimiter=',', ndmin=1)
+    else:
+        with open(filename, 'rb') as file:
+            [magic, version, size] = _OBS_HEADER.unpack(file.read(_OBS_HEADER.size))
+            if magic != _OBS_MAGIC or version != _OBS_VERSION or size != _OBS_DTYPE.itemsize:
+                raise ValueError('{} is not a version {} observation file'.format(filename, _OBS_VERSION))
+            while True:
+                chunk = np.fromfile(file, dtype=_OBS_DTYPE, count=chunksize)
+                if len(chunk) == 0:
+                    break
+                yield chunk
+
+
+def Observation_Site_Vectors(obs, cache=None, gst_cache=None):
+    # This function calculates the site vector in ECI of every observation, with the geodetic terms calculated once
+    # per distinct station (like orbits.R_site_calc_Array()) but paired elementwise with the observation times
+    # Inputs:
+    #       obs - Structured array of M observations with the fields of _OBS_DTYPE
+    #       cache - Optional dictionary of station constants passed on to orbits.Site_Constants()
+    #       gst_cache - Optional dictionary passed on to orbits.Greenwich_Sidereal_Time_Array()
+    # Outputs:
+    #       Rsites - (M,3) array of R site vectors in ECI frame [km]
+
+    stations = np.stack((obs['lat'], obs['lon'], obs['alt']), axis=1)
+    [unique, inverse] = np.unique(stations, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    [Rxy, Rz, lam] = orbits.Site_Constants(unique[:,0], unique[:,1], 'east', unique[:,2], cache)
+
+    GST = orbits.Greenwich_Sidereal_Time_Array(obs['jd'], gst_cache)
+    theta = np.radians(np.mod(GST + lam[inverse], 360))   # Local Sidereal Time of each observation
+
+    return np.stack((Rxy[inverse]*np.cos(theta), Rxy[inverse]*np.sin(theta), Rz[inverse]), axis=1)
+
+
+def Tracklet_Triplets(jd, starts, ends, spacing):
+    # This function picks triplets out of tracklets, each observation at least spacing after the previous one.
+    # Triplets of the same tracklet follow each other, with the last observation of one triplet the first of the next,
+    # so a tracklet that is still growing only needs its observations from the returned next index on to continue
+    # Inputs:
+    #       jd - (M,) Julian Dates of the observations, sorted within each tracklet
+    #       starts, ends - Index of the first observation and one past the last observation of each tracklet
+    #       spacing - Smallest time between the observations of a triplet (sec)
+    # Outputs:
+    #       triplets - (K,3) array of observation indices
+    #       nexts - Index of the first observation of the next triplet of each tracklet
+
+    step = spacing/86400
+    triplets = []
+    nexts = np.empty(len(starts), dtype=np.int64)
+    for [m, [s, e]] in enumerate(zip(starts, ends)):
+        t = jd[s:e]
+        i = 0
+        while True:
+            j = np.searchsorted(t, t[i] + step)
+            if j >= len(t):
+                break
+            k = np.searchsorted(t, t[j] + step)
+            if k >= len(t):
+                break
+            triplets.append((s + i, s + j, s + k))
+            i = k
+        nexts[m] = s + i
+
+    return [np.array(triplets, dtype=np.int64).reshape(-1, 3), nexts]
+
+
+class IODResultWriter:
+    # Rows are appended one row group at a time and every column of a row group is stored contiguously, so a reader
+    # can load single columns without touching the others. Only the small row group index is kept in memory.
+    _file = None
+    _index = None
+    _rows = 0
+
+    # Constructor
+    def __init__(self, filename):
+        # Inputs:
+        #       filename - Name of the file to write
+
+        self._file = open(filename, 'wb')
+        self._file.write(bytes(_RESULT_HEADER.size))   # Header is filled in by close() once the index is written
+        self._index = []
+        self._rows = 0
+
+    # Getter functions
+    def getRowCount(self):
+        return self._rows
+
+    # write() function
+    def write(self, columns):
+        # Inputs:
+        #       columns - Dictionary of column name -> (n,) array, with every column of _RESULT_COLUMNS
+
+        n = len(columns[_RESULT_COLUMNS[0][0]])
+        if n == 0:
+            return
+        self._index.append([self._file.tell(), n])
+        for [name, dtype] in _RESULT_COLUMNS:
+            values = np.ascontiguousarray(columns[name], dtype=dtype)
+            if values.shape != (n,):
+                raise ValueError('Column {} has shape {}, expected ({},)'.format(name, values.shape, n))
+            self._file.write(values.tobytes())
+        self._rows += n
+
+    # close() function
+    def close(self):
+        if self._file is None:
+            return
+        index_offset = self._file.tell()
+        self._file.write(np.asarray(self._index, dtype='<i8').reshape(-1, 2).tobytes())
+        self._file.seek(0)
+        self._file.write(_RESULT_HEADER.pack(_RESULT_MAGIC, _RESULT_VERSION, len(_RESULT_COLUMNS), len(self._index), index_offset))
+        self._file.close()
+        self._file = None
+
+
+def Read_IOD_Results(filename, columns=None):
+    # This function reads columns of a file written by IODResultWriter(), reading only the bytes of those columns
+    # Inputs:
+    #       filename - Name of the result file
+    #       columns - List of column names to read, all columns if None (optional)
+    # Outputs:
+    #       results - Dictionary of column name -> (rows,) array
+
+    names = [name for [name, _] in _RESULT_COLUMNS]
+    if columns is None:
+        columns = names
+    for name in columns:
+        if name not in names:
+            raise ValueError('{} is not a column of the IOD result file'.format(name))
+
+    with open(filename, 'rb') as file:
+        [magic, version, ncolumns, groups, index_offset] = _RESULT_HEADER.unpack(file.read(_RESULT_HEADER.size))
+        if magic != _RESULT_MAGIC or version != _RESULT_VERSION or ncolumns != len(_RESULT_COLUMNS):
+            raise ValueError('{} is not a version {} IOD result file'.format(filename, _RESULT_VERSION))
+        file.seek(index_offset)
+        index = np.fromfile(file, dtype='<i8', count=2*groups).reshape(groups, 2)
+
+        # Byte offset of each column inside a row group, per row
+        itemsizes = np.array([np.dtype(dtype).itemsize for [_, dtype] in _RESULT_COLUMNS])
+        before = np.concatenate(([0], np.cumsum(itemsizes)[:-1]))
+
+        results = {}
+        for name in columns:
+            c = names.index(name)
+            parts = []
+            for [offset, rows] in index:
+                file.seek(int(offset + before[c]*rows))
+                parts.append(np.fromfile(file, dtype=_RESULT_COLUMNS[c][1], count=int(rows)))
+            results[name] = np.concatenate(parts) if parts else np.empty(0, dtype=_RESULT_COLUMNS[c][1])
+
+    return results
+
+
+def Stream_Gauss_IOD(infile, outfile, chunksize=100000, max_gap=600.0, spacing=60.0, muearth=398600, workers=1):
+    # This function runs the Gauss method of Initial Orbit Determination over a whole observation file one chunk at
+    # a time. Each chunk is sorted by object and time and split into tracklets wherever the object changes or two
+    # observations are more than max_gap apart. Every tracklet is cut into as many triplets as its observations allow,
+    # which are solved with orbits.Gauss_IOD_Batch() and appended to the output file. Since the file is in time order,
+    # a tracklet that has not been added to within max_gap of the newest observation read is complete and dropped.
+    # Only the observations from the start of the next triplet on are carried over for tracklets that may still
+    # continue, so memory stays bounded even when objects are tracked without any gaps
+    # Inputs:
+    #       infile - Name of a CSV (.csv) or binary observation file
+    #       outfile - Name of the columnar result file to write, see Read_IOD_Results()
+    #       chunksize - Number of observations read at a time (optional)
+    #       max_gap - Largest time between two observations of the same tracklet (sec) (optional)
+    #       spacing - Smallest time between the observations of a triplet (sec) (optional)
+    #       muearth - Standard Gravitational Parameter (km^3/s^2) (optional)
+    #       workers - Number of worker processes of orbits.Gauss_IOD_Batch() (optional)
+    # Outputs:
+    #       observations - Number of observations read
+    #       triplets - Number of triplets solved (rows written)
+    #       elapsed - Wall clock time (sec)
+    #       rate - Throughput in observations per second
+    #       max_pending - Largest number of observations carried over from one chunk to the next
+
+    start = time.perf_counter()
+    gap = max_gap/86400
+    site_cache = {}
+    gst_cache = {}
+    pending = np.empty(0, dtype=_OBS_DTYPE)
+    observations = 0
+    max_pending = 0
+
+    def solve(obs, starts, ends, writer):
+        [idx, nexts] = Tracklet_Triplets(obs['jd'], starts, ends, spacing)
+        if len(idx) == 0:
+            return nexts
+        trip = obs[idx]
+        Rsites = Observation_Site_Vectors(trip.ravel(), site_cache, gst_cache).reshape(-1, 3, 3)
+        times = (trip['jd'] - trip['jd'][:,1:2])*86400   # seconds from the middle observation
+        [rvect2, vvect2, coes, status, _] = orbits.Gauss_IOD_Batch(trip['ra'], trip['dec'], times, Rsites, muearth, workers)
+        columns = {'object': trip['object'][:,1], 'jd': trip['jd'][:,1], 'status': status}
+        for [i, name] in enumerate(['rx', 'ry', 'rz']):
+            columns[name] = rvect2[:,i]
+        for [i, name] in enumerate(['vx', 'vy', 'vz']):
+            columns[name] = vvect2[:,i]
+        for [name, value] in zip(['h', 'ecc', 'a', 'inc', 'RAAN', 'argumentofperigee', 'trueanomaly'], coes):
+            columns[name] = value
+        writer.write(columns)
+        return nexts
+
+    writer = IODResultWriter(outfile)
+    try:
+        for chunk in itertools.chain(Read_Observation_File(infile, chunksize), [None]):
+            if chunk is None:
+                latest = np.inf   # End of file, every tracklet is complete
+            else:
+                observations += len(chunk)
+                latest = chunk['jd'].max()
+                pending = np.concatenate((pending, chunk))
+            if len(pending) == 0:
+                continue
+
+            # Tracklets of the pending observations
+            obs = pending[np.lexsort((pending['jd'], pending['object']))]
+            new = np.ones(len(obs), dtype=bool)
+            new[1:] = (obs['object'][1:] != obs['object'][:-1]) | (np.diff(obs['jd']) > gap)
+            starts = np.flatnonzero(new)
+            ends = np.append(starts[1:], len(obs))
+            complete = obs['jd'][ends - 1] < latest - gap
+
+            # Triplets of every tracklet, keeping what the next triplet of the open tracklets starts from
+            nexts = solve(obs, starts, ends, writer)
+            keep = np.zeros(len(obs) + 1, dtype=int)
+            np.add.at(keep, nexts[~complete], 1)
+            np.add.at(keep, ends[~complete], -1)
+            pending = obs[np.cumsum(keep[:-1]) > 0]
+            max_pending = max(max_pending, len(pending))
+        triplets = writer.getRowCount()
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    return [observations, triplets, elapsed, observations/elapsed, max_pending]
+
+
+def main():
+    # Synthetic observation file of 1000 objects, each seen in 2 tracklets of 30 observations 20 sec apart from one of
+    # 3 stations, written as CSV and binary and run through the streaming Gauss IOD pipeline
+    import os
+    import tempfile
+
+    muearth = 398600 # km^3/s^2
+    rng = np.random.default_rng(23)
+    N = 1000
+    epoch = 2455428.5   # Julian Date of August 20, 2010 at 0h
+
+    # Orbits between 600 km and 20000 km altitude
+    rp = 6378 + rng.uniform(600, 20000, N)
+    ecc = rng.uniform(0, 0.1, N)
+    [rvects, vvects] = orbits.COEs_to_RV_Batch(np.sqrt(muearth*rp*(1 + ecc)), ecc, rng.uniform(0, 180, N),
+                                               rng.uniform(0, 360, N), rng.uniform(0, 360, N), rng.uniform(0, 360, N))
+
+    # Observation times after the epoch (sec) and stations
+    stations = np.array([[35.3, 239.3, 100], [78.2, 15.4, 500], [-31.0, 149.1, 1100]])   # lat, east long, alt
+    first = rng.uniform(0, 80000, (N, 2))
+    t = (first[:,:,None] + 20.0*np.arange(30)).reshape(N, -1)
+    sat = np.repeat(np.arange(N), t.shape[1])
+    t = t.ravel()
+    obs = np.empty(len(t), dtype=_OBS_DTYPE)
+    obs['object'] = sat
+    obs['jd'] = epoch + t/86400
+    obs[['lat', 'lon', 'alt']] = list(map(tuple, stations[rng.integers(0, len(stations), N)][sat]))
+
+    # Angles from the slant range vectors, with 1 arcsec of noise
+    [r, _, _] = orbits.Universal_Variable_Prop_Batch(muearth, rvects[sat], vvects[sat], t)
+    rho = r - Observation_Site_Vectors(obs)
+    obs['ra'] = np.degrees(np.arctan2(rho[:,1], rho[:,0])) + rng.normal(0, 1/3600, len(t))
+    obs['dec'] = np.degrees(np.arcsin(rho[:,2]/np.linalg.norm(rho, axis=1))) + rng.normal(0, 1/3600, len(t))
+    obs = obs[np.argsort(obs['jd'], kind='stable')]
+
+    with tempfile.TemporaryDirectory() as folder:
+        for name in ['observations.csv', 'observations.bin']:
+            infile = os.path.join(folder, name)
+            outfile = os.path.join(folder, name + '.iod')
+            Write_Observation_File(infile, [obs[i:i+10000] for i in range(0, len(obs), 10000)])
+
+            [count, triplets, elapsed, rate, _] = Stream_Gauss_IOD(infile, outfile, chunksize=10000, spacing=240.0)
+            print("{}: {} observations into {} triplets in {:.2f} sec ({:.0f} observations/sec)".format(
+                name, count, triplets, elapsed, rate))
+
+        # Position errors of the triplets with a unique valid root
+        results = Read_IOD_Results(outfile, ['object', 'jd', 'rx', 'ry', 'rz', 'status'])
+        ok = results['status'] == orbits.GAUSS_OK
+        print("{} of {} triplets have a unique valid root".format(ok.sum(), len(ok)))
+        sat = results['object'][ok]
+        [r, _, _] = orbits.Universal_Variable_Prop_Batch(muearth, rvects[sat], vvects[sat], (results['jd'][ok] - epoch)*86400)
+        error = np.linalg.norm(np.stack((results['rx'][ok], results['ry'][ok], results['rz'][ok]), axis=1) - r, axis=1)
+        print("Median position error of the Gauss estimates is {:.2f} km".format(np.median(error)))
+
+
+if __name__ == '__main__': main()
@@ -0,0 +1,453 @@
+# Module that contains a local asyncio service for propagation, COE conversion and Gauss IOD, so that other tools can
+# send requests to one long running process instead of each importing Orbits_module and making scalar calls.
+# Requests of the same kind that arrive within a short window are coalesced into a single call of the batch
+# functions of Orbits_module, and each response is sent as soon as the batch it was part of completes.
+# Only the standard library and numpy are used. The service speaks plain HTTP/1.1 with JSON bodies over TCP or a
+# Unix socket, so it can also be reached with e.g. curl --unix-socket
+
+# Explanation of the classes that are part of this module
+#       MicroBatcher(): Queue that coalesces submitted requests into batch calls of one function
+#           Constructors:
+#               MicroBatcher(func, window, max_batch)
+#
+#           Member Functions:
+#               submit() - (coroutine) queues one request and returns its result once its batch completes
+#               getMetrics() - returns the queue depth, request and batch counts and latency percentiles
+#               close() - cancels the batching task
+#
+#       OrbitService(): The HTTP service, with one MicroBatcher per kind of request
+#           Constructors:
+#               OrbitService(window, max_batch, muearth)
+#
+#           Member Functions:
+#               start() - (coroutine) starts listening on a TCP port or a Unix socket
+#               getAddress() - returns the (host, port) or path the service is listening on
+#               getMetrics() - returns the metrics of every endpoint
+#               close() - (coroutine) stops listening and cancels the batching tasks
+#
+# Functions that are part of this module
+#       Service_Request(): Blocking client call of a service listening on a TCP port
+#
+# Endpoints (request bodies are JSON objects, vectors can be single (3,) vectors or (n,3) arrays of n requests):
+#       POST /propagate - {"r", "v", "dt"} -> {"r", "v", "converged"}, Universal_Variable_Prop_Batch()
+#       POST /convert   - {"r", "v"} -> {"h", "ecc", "a", "inc", "RAAN", "argumentofperigee", "trueanomaly"}, COEsFunction_Batch()
+#                         {"h", "ecc", "inc", "RAAN", "argumentofperigee", "trueanomaly"} -> {"r", "v"}, COEs_to_RV_Batch()
+#       POST /iod       - {"ra", "dec", "times", "rsites"} (3 observations each) -> {"r", "v", "status"}, Gauss_IOD_Batch()
+#       GET /metrics    - Queue depth, request and batch counts and latencies of every endpoint
+# Values that can't be computed (e.g. failed IOD) are returned as null
+
+# Usage:
+#       python Orbit_Service_module.py                        (demo of concurrent clients against a service)
+#       python Orbit_Service_module.py --serve --port 8765     (run the service on a TCP port until interrupted)
+#       python Orbit_Service_module.py --serve --unix /tmp/orbits.sock
+
+
+
+import argparse
+import asyncio
+import collections
+import http.client
+import json
+import time
+
+import numpy as np
+
+import Orbits_module as orbits
+
+
+_COE_NAMES = ['h', 'ecc', 'a', 'inc', 'RAAN', 'argumentofperigee', 'trueanomaly']
+_HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class MicroBatcher:
+    # Requests are queued with the number of rows they hold. The batching task waits for the first request, then
+    # for the rest of the window (or until max_batch rows are queued) and runs func on everything queued in a
+    # worker thread, so the event loop keeps accepting requests while a batch is computed. Those requests form
+    # the next batch.
+    _func = None
+    _window = 0.0
+    _max_batch = 0
+    _queue = None
+    _rows = 0
+    _wakeup = None
+    _full = None
+    _task = None
+    _latencies = None
+    _requests = 0
+    _batches = 0
+    _batch_rows = 0
+
+    # Constructor
+    def __init__(self, func, window=0.002, max_batch=100000):
+        # Inputs:
+        #       func - Function of a list of requests that returns the list of their results, in the same order
+        #       window - Time to wait for more requests after the first one of a batch arrives (sec)
+        #       max_batch - Number of rows after which a batch is started without waiting for the window to end
+
+        self._func = func
+        self._window = window
+        self._max_batch = max_batch
+        self._queue = collections.deque()
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._latencies = collections.deque(maxlen=10000)   # Latencies of the most recent requests (sec)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    # Getter functions
+    def getMetrics(self):
+        latencies = np.array(self._latencies)
+        metrics = {'queue_depth': len(self._queue), 'queued_rows': self._rows, 'requests': self._requests,
+                   'batches': self._batches, 'mean_batch_rows': self._batch_rows/self._batches if self._batches else 0.0}
+        if len(latencies) > 0:
+            [p50, p95, p99] = np.percentile(latencies, [50, 95, 99])*1000
+            metrics.update({'latency_ms_p50': p50, 'latency_ms_p95': p95, 'latency_ms_p99': p99,
+                            'latency_ms_max': latencies.max()*1000})
+        return metrics
+
+    # submit() function
+    async def submit(self, request, rows=1):
+        # Inputs:
+        #       request - One request, passed on to func in a list with the others of its batch
+        #       rows - Number of rows the request holds, counted against max_batch
+        # Outputs:
+        #       result - The result func returned for this request
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((request, rows, future, time.perf_counter()))
+        self._rows += rows
+        self._wakeup.set()
+        if self._rows >= self._max_batch:
+            self._full.set()
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), self._window)
+            except asyncio.TimeoutError:
+                pass
+
+            # Everything queued up to max_batch rows, with at least one request
+            batch = [self._queue.popleft()]
+            rows = batch[0][1]
+            while self._queue and rows + self._queue[0][1] <= self._max_batch:
+                batch.append(self._queue.popleft())
+                rows += batch[-1][1]
+            self._rows -= rows
+            if not self._queue:
+                self._wakeup.clear()
+            if self._rows < self._max_batch:
+                self._full.clear()
+
+            try:
+                results = await loop.run_in_executor(None, self._func, [b[0] for b in batch])
+            except Exception as error:
+                results = [error]*len(batch)
+
+            now = time.perf_counter()
+            for [[_, _, future, start], result] in zip(batch, results):
+                if future.done():   # Client went away
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+                self._latencies.append(now - start)
+            self._requests += len(batch)
+            self._batches += 1
+            self._batch_rows += rows
+
+    # close() function
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def _Rows(value, name, width=None):
+    # Converts a JSON value to a float array of rows, returns the array and whether a single row was given
+    tail = () if width is None else width
+    array = np.asarray(value, dtype=float)
+    single = array.shape == tail
+    if not single and array.shape[1:] != tail:
+        if width is None:
+            raise ValueError('{} must be a number or an (n,) array of numbers'.format(name))
+        shape = ','.join(str(w) for w in width)
+        raise ValueError('{} must be a ({}) array or an (n,{}) array of them'.format(name, shape, shape))
+    array = array.reshape((-1,) + tail)
+    if not np.all(np.isfinite(array)):
+        raise ValueError('{} must be finite'.format(name))
+    return [array, single]
+
+
+def _Broadcast_Rows(fields):
+    # Broadcasts the fields of one request to a common number of rows, fields is a dictionary of name -> [array, single]
+    # from _Rows(). Single values and one row arrays are repeated, any other lengths have to agree. The request only
+    # counts as single (and gets unwrapped results) when every field was a single value
+    lengths = {name: len(array) for [name, [array, _]] in fields.items()}
+    rows = max(lengths.values())
+    if rows == 0:
+        raise ValueError('the request holds no rows')
+    wrong = ['{} has {}'.format(name, n) for [name, n] in lengths.items() if n not in (1, rows)]
+    if wrong:
+        raise ValueError('fields have different numbers of rows, expected 1 or {}: {}'.format(rows, ', '.join(wrong)))
+    request = {name: np.broadcast_to(array, (rows,) + array.shape[1:]) for [name, [array, _]] in fields.items()}
+    return [request, rows, all(single for [_, single] in fields.values())]
+
+
+def _Jsonable(array, single):
+    # Converts an array of rows to nested lists, with NaN as null and a single row unwrapped
+    array = np.asarray(array)
+    if array.dtype.kind == 'f':
+        values = np.where(np.isfinite(array), array, None).tolist()
+    else:
+        values = array.tolist()
+    return values[0] if single else values
+
+
+def _Split(arrays, requests):
+    # Splits the stacked outputs of a batch call back into one dictionary per request
+    counts = np.cumsum([r['rows'] for r in requests])[:-1]
+    parts = {name: np.split(value, counts) for [name, value] in arrays.items()}
+    return [{name: _Jsonable(parts[name][i], r['single']) for name in arrays} for [i, r] in enumerate(requests)]
+
+
+class OrbitService:
+    # One MicroBatcher per kind of request, so requests of different kinds never wait on each other's batches
+    _batchers = None
+    _server = None
+    _address = None
+    _window = 0.0
+    _max_batch = 0
+    _muearth = 398600
+
+    # Constructor
+    def __init__(self, window=0.002, max_batch=100000, muearth=398600):
+        # Inputs:
+        #       window - Time requests are collected for before a batch is run (sec)
+        #       max_batch - Largest number of rows in one batch
+        #       muearth - Standard Gravitational Parameter of /propagate and /iod (km^3/s^2), the COE conversions always use Earth's
+
+        self._muearth = muearth
+        self._window = window
+        self._max_batch = max_batch
+
+    # Getter functions
+    def getAddress(self):
+        return self._address
+
+    def getMetrics(self):
+        return {name: batcher.getMetrics() for [name, batcher] in self._batchers.items()}
+
+    # start() function
+    async def start(self, host='127.0.0.1', port=8765, path=None):
+        # Inputs:
+        #       host, port - TCP address to listen on, port 0 picks a free port
+        #       path - Unix socket path to listen on instead of TCP (optional)
+
+        self._batchers = {name: MicroBatcher(func, self._window, self._max_batch) for [name, func] in
+                          [('propagate', self._Propagate), ('rv_to_coes', self._RV_to_COEs),
+                           ('coes_to_rv', self._COEs_to_RV), ('iod', self._IOD)]}
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._Handle, path=path)
+            self._address = path
+        else:
+            self._server = await asyncio.start_server(self._Handle, host, port)
+            self._address = self._server.sockets[0].getsockname()[0:2]
+
+    # close() function
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for batcher in self._batchers.values():
+            batcher.close()
+
+    # Batch functions, run in a worker thread on the requests of one batch
+    def _Propagate(self, requests):
+        r = np.concatenate([q['r'] for q in requests])
+        v = np.concatenate([q['v'] for q in requests])
+        dt = np.concatenate([q['dt'] for q in requests])
+        [rnew, vnew, converged] = orbits.Universal_Variable_Prop_Batch(self._muearth, r, v, dt)
+        return _Split({'r': rnew, 'v': vnew, 'converged': converged}, requests)
+
+    def _RV_to_COEs(self, requests):
+        r = np.concatenate([q['r'] for q in requests])
+        v = np.concatenate([q['v'] for q in requests])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            coes = orbits.COEsFunction_Batch(r, v)
+        return _Split(dict(zip(_COE_NAMES, coes)), requests)
+
+    def _COEs_to_RV(self, requests):
+        coes = [np.concatenate([q[name] for q in requests]) for name in _COE_NAMES if name != 'a']
+        [r, v] = orbits.COEs_to_RV_Batch(*coes)
+        return _Split({'r': r, 'v': v}, requests)
+
+    def _IOD(self, requests):
+        [RA, DEC, times, Rsites] = [np.concatenate([q[name] for q in requests]) for name in ['ra', 'dec', 'times', 'rsites']]
+        [r, v, _, status, _] = orbits.Gauss_IOD_Batch(RA, DEC, times, Rsites, self._muearth)
+        return _Split({'r': r, 'v': v, 'status': status}, requests)
+
+    async def _Dispatch(self, method, target, body):
+        # Returns the HTTP status and JSON response of one request
+        if target == '/metrics':
+            if method != 'GET':
+                return [405, {'error': 'use GET for /metrics'}]
+            return [200, self.getMetrics()]
+        if target not in ('/propagate', '/convert', '/iod'):
+            return [404, {'error': 'no endpoint {}'.format(target)}]
+        if method != 'POST':
+            return [405, {'error': 'use POST for {}'.format(target)}]
+
+        # Parse and check the request here so that one bad request can't fail the batch it would be part of
+        try:
+            body = json.loads(body)
+            if target == '/propagate':
+                fields = {'r': _Rows(body['r'], 'r', (3,)), 'v': _Rows(body['v'], 'v', (3,)), 'dt': _Rows(body['dt'], 'dt')}
+                name = 'propagate'
+            elif target == '/convert' and 'r' in body:
+                fields = {'r': _Rows(body['r'], 'r', (3,)), 'v': _Rows(body['v'], 'v', (3,))}
+                name = 'rv_to_coes'
+            elif target == '/convert':
+                fields = {coe: _Rows(body[coe], coe) for coe in _COE_NAMES if coe != 'a'}
+                name = 'coes_to_rv'
+            else:
+                fields = {'ra': _Rows(body['ra'], 'ra', (3,)), 'dec': _Rows(body['dec'], 'dec', (3,)),
+                          'times': _Rows(body['times'], 'times', (3,)), 'rsites': _Rows(body['rsites'], 'rsites', (3, 3))}
+                name = 'iod'
+            [request, rows, single] = _Broadcast_Rows(fields)
+        except KeyError as error:
+            return [400, {'error': 'missing {}'.format(error.args[0])}]
+        except (ValueError, TypeError) as error:
+            return [400, {'error': str(error)}]
+
+        request.update({'rows': rows, 'single': single})
+        try:
+            return [200, await self._batchers[name].submit(request, rows)]
+        except Exception as error:
+            return [500, {'error': str(error)}]
+
+    async def _Handle(self, reader, writer):
+        # Serves the HTTP/1.1 requests of one connection, which is kept open until the client closes it
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                [method, target, version] = line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    [key, value] = line.decode('latin-1').split(':', 1)
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                [status, response] = await self._Dispatch(method, target, body)
+                payload = json.dumps(response).encode()
+                close = version == 'HTTP/1.0' or headers.get('connection', '').lower() == 'close'
+                writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\nConnection: {}\r\n\r\n'.format(
+                    status, _HTTP_REASONS[status], len(payload), 'close' if close else 'keep-alive').encode('latin-1') + payload)
+                await writer.drain()
+                if close:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def Service_Request(path, body=None, host='127.0.0.1', port=8765, timeout=60):
+    # This function sends one request to a service on a TCP port and waits for the response
+    # Inputs:
+    #       path - Endpoint, e.g. '/propagate'
+    #       body - Dictionary sent as the JSON request body, None for a GET request (optional)
+    #       host, port - Address of the service (optional)
+    #       timeout - Socket timeout (sec) (optional)
+    # Outputs:
+    #       status - HTTP status code
+    #       response - Dictionary of the JSON response
+
+    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        if body is None:
+            connection.request('GET', path)
+        else:
+            connection.request('POST', path, json.dumps(body), {'Content-Type': 'application/json'})
+        reply = connection.getresponse()
+        return [reply.status, json.loads(reply.read())]
+    finally:
+        connection.close()
+
+
+async def _Demo(clients):
+    # Starts a service and sends it requests from many concurrent clients
+    muearth = 398600 # km^3/s^2
+    service = OrbitService()
+    await service.start(port=0)
+    [host, port] = service.getAddress()
+
+    async def request(path, body):
+        [reader, writer] = await asyncio.open_connection(host, port)
+        payload = json.dumps(body).encode()
+        writer.write('POST {} HTTP/1.1\r\nHost: {}\r\nContent-Length: {}\r\nConnection: close\r\n\r\n'.format(
+            path, host, len(payload)).encode('latin-1') + payload)
+        reply = await reader.read()
+        writer.close()
+        return json.loads(reply.split(b'\r\n\r\n', 1)[1])
+
+    # Curtis Problem 3.20 state propagated for different times, and its COEs, by concurrent clients
+    rvect = [20000, -105000, -19000]  # (km)
+    vvect = [.9000, -3.4000, -1.5000] # (km/s)
+    dts = np.linspace(0, 7200, clients)
+    start = time.perf_counter()
+    replies = await asyncio.gather(*[request('/propagate', {'r': rvect, 'v': vvect, 'dt': dt}) for dt in dts],
+                                   *[request('/convert', {'r': rvect, 'v': vvect}) for _ in range(clients//10)])
+    elapsed = time.perf_counter() - start
+
+    [rcheck, _] = orbits.Universal_Variable_Prop(muearth, np.array(rvect), np.array(vvect), 7200)
+    print("{} requests answered in {:.3f} sec".format(len(replies), elapsed))
+    print("Position 2 hours later from the service is {} km".format(replies[clients - 1]['r']))
+    print("Position 2 hours later from Universal_Variable_Prop is {} km".format(rcheck))
+    print("Eccentricity from the service is {}".format(replies[-1]['ecc']))
+    for [name, metrics] in service.getMetrics().items():
+        if metrics['requests']:
+            print("{}: {} requests in {} batches, p50 latency {:.1f} ms, p99 latency {:.1f} ms".format(
+                name, metrics['requests'], metrics['batches'], metrics['latency_ms_p50'], metrics['latency_ms_p99']))
+
+    await service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local propagation, COE conversion and Gauss IOD service')
+    parser.add_argument('--serve', action='store_true', help='run the service until interrupted instead of the demo')
+    parser.add_argument('--host', default='127.0.0.1', help='TCP address to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='TCP port to listen on')
+    parser.add_argument('--unix', default=None, help='Unix socket path to listen on instead of TCP')
+    parser.add_argument('--window', type=float, default=0.002, help='time requests are collected for before a batch is run (sec)')
+    args = parser.parse_args()
+
+    if not args.serve:
+        asyncio.run(_Demo(500))
+        return
+
+    async def serve():
+        service = OrbitService(window=args.window)
+        await service.start(args.host, args.port, args.unix)
+        print("Serving on {}".format(service.getAddress()))
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await service.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__': main()
@@ -0,0 +1,262 @@
+# Module that contains a ground station pass predictor, which finds when satellites rise above, culminate and
+# set below a minimum elevation at a set of stations
+
+# Functions defined in this module:
+#       Topocentric_Elevation(): Elevation and elevation rate of satellites above the local horizon of stations, elementwise over arrays
+#       Illinois_Root_Batch(): Vectorized Illinois (safeguarded secant) root finding over many brackets at once
+#       Pass_Prediction(): Finds the AOS/TCA/LOS table of all passes of N satellites over S stations
+#       Pass_Prediction_Chunk(): Worker function of Pass_Prediction() that finds the passes of one chunk of satellites
+
+# Pass prediction steps, done for one chunk of satellites at a time so the coarse grid arrays stay a bounded size:
+#       1. Elevation and its rate are evaluated on a coarse time grid, vectorized over satellites, stations and times.
+#          The rate is analytic, from the slant range vector and its rate, so it costs no extra propagations
+#       2. Culminations are bracketed where the elevation rate goes from positive to negative, and refined as the
+#          root of the elevation rate. Passes whose culmination is below the minimum elevation are dropped
+#       3. AOS and LOS are bracketed between the culmination and the nearest coarse sample below the minimum
+#          elevation on either side, and refined as roots of (elevation - minimum elevation)
+# Since culminations are found from the elevation rate, a pass that is shorter than the coarse step is still
+# found as long as the elevation rate changes sign only once between two samples
+
+
+
+import numpy as np
+
+import Orbits_module as orbits
+
+
+def Topocentric_Elevation(rvects, vvects, sat, Rxy, Rz, lam, lat, station, epoch, t, gst_cache=None):
+    # This function calculates the elevation of satellites as seen from stations and its rate, elementwise over
+    # arrays of (satellite, station, time) triplets. Satellite states come from the Universal Variable propagator
+    # Inputs:
+    #       rvects, vvects - (N,3) arrays of R and V vectors of all satellites at the epoch (km, km/s)
+    #       sat - Array of satellite indices
+    #       Rxy, Rz, lam - (S,) station constants from orbits.Site_Constants()
+    #       lat - (S,) station geodetic latitudes [deg]
+    #       station - Array of station indices, same shape as sat
+    #       epoch - numpy datetime64 of t = 0
+    #       t - Array of times after the epoch (sec), same shape as sat
+    #       gst_cache - Optional dictionary passed on to orbits.Greenwich_Sidereal_Time_Array()
+    # Outputs:
+    #       el - Array of elevations [deg]
+    #       eldot - Array of elevation rates [deg/s]
+
+    muearth = 398600 # km^3/s^2
+    wearth = np.radians(360.98564724)/86400 # Earth rotation rate (rad/s), the rate of the Greenwich Sidereal Time
+
+    shape = np.shape(t)
+    sat = np.ravel(sat)
+    station = np.ravel(station)
+    t = np.ravel(t)
+
+    [r, v, _] = orbits.Universal_Variable_Prop_Batch(muearth, rvects[sat], vvects[sat], t)
+
+    # Site vector and local up direction (geodetic normal) in ECI at each time
+    times = epoch + np.round(t*1e6).astype('timedelta64[us]')
+    theta = np.radians(np.mod(orbits.Greenwich_Sidereal_Time_Array(times, gst_cache) + lam[station], 360))
+    phi = np.radians(lat[station])
+    Rsite = np.stack((Rxy[station]*np.cos(theta), Rxy[station]*np.sin(theta), Rz[station]), axis=1)
+    up = np.stack((np.cos(phi)*np.cos(theta), np.cos(phi)*np.sin(theta), np.sin(phi)), axis=1)
+
+    rho = r - Rsite   # Slant range vector
+    rhonorm = np.linalg.norm(rho, axis=1)
+    q = np.einsum('ij,ij->i', rho, up)/rhonorm   # Sine of the elevation
+    el = np.degrees(np.arcsin(q))
+
+    # Site and up direction turn with the Earth, d/dt = wearth*z cross
+    rhodot = v - wearth*np.stack((-Rsite[:,1], Rsite[:,0], np.zeros(len(t))), axis=1)
+    updot = wearth*np.stack((-up[:,1], up[:,0], np.zeros(len(t))), axis=1)
+    qdot = (np.einsum('ij,ij->i', rhodot, up) + np.einsum('ij,ij->i', rho, updot))/rhonorm \
+           - q*np.einsum('ij,ij->i', rho, rhodot)/rhonorm**2
+    eldot = np.degrees(qdot/np.sqrt(1 - q**2))
+
+    return [el.reshape(shape), eldot.reshape(shape)]
+
+
+def Illinois_Root_Batch(func, a, b, fa, fb, tol=1.0e-3, n_max=100):
+    # This function finds roots of func in many brackets [a, b] at once with the Illinois method, a secant
+    # method that keeps the root bracketed (fa and fb must have opposite signs)
+    # Inputs:
+    #       func - Function func(x, idx) returning the values at an array of points x, where idx are the
+    #              indices of the brackets the points belong to
+    #       a, b - Arrays of bracket ends
+    #       fa, fb - func(a) and func(b)
+    #       tol - Stop once each bracket is narrower than this (optional)
+    #       n_max - Limit on the number of iterations (optional)
+    # Outputs:
+    #       x - Array of roots
+
+    a = np.array(a, dtype=float)
+    b = np.array(b, dtype=float)
+    fa = np.array(fa, dtype=float)
+    fb = np.array(fb, dtype=float)
+    side = np.zeros(len(a), dtype=int)   # Which end was kept last time, -1 for a and 1 for b
+    active = np.nonzero(np.abs(b - a) > tol)[0]
+
+    n = 0
+    while active.size > 0 and n < n_max:
+        [aa, bb, faa, fbb] = [a[active], b[active], fa[active], fb[active]]
+        c = bb - fbb*(bb - aa)/(fbb - faa)   # Secant point
+        fc = func(c, active)
+
+        # Replace the end with the same sign as fc, and halve the other end's value if it was kept twice in a row
+        left = np.sign(fc) == np.sign(faa)
+        a[active[left]] = c[left]
+        fa[active[left]] = fc[left]
+        halve_b = left & (side[active] == 1)
+        fb[active[halve_b]] /= 2
+        b[active[~left]] = c[~left]
+        fb[active[~left]] = fc[~left]
+        halve_a = ~left & (side[active] == -1)
+        fa[active[halve_a]] /= 2
+        side[active] = np.where(left, 1, -1)
+
+        done = (np.abs(b[active] - a[active]) <= tol) | (fc == 0)
+        a[active[fc == 0]] = c[fc == 0]
+        b[active[fc == 0]] = c[fc == 0]
+        active = active[~done]
+        n += 1
+
+    # Final secant point of each bracket
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = b - fb*(b - a)/(fb - fa)
+    return np.where(fb != fa, x, (a + b)/2)
+
+
+def Pass_Prediction(rvects, vvects, lat, long, direction, alt, epoch, tf, step=60.0, min_el=10.0, tol=1.0e-3, chunksize=1000000):
+    # This function predicts the passes of N satellites over S ground stations
+    # Inputs:
+    #       rvects - (N,3) array of position vectors at the epoch (km)
+    #       vvects - (N,3) array of velocity vectors at the epoch (km/s)
+    #       lat - latitude of the stations [deg], (S,) array
+    #       long - longitude of the stations [deg], (S,) array
+    #       direction - string value of either east or west for longitude direction, one for all stations or a list of S
+    #       alt - Altitude of the stations [m], (S,) array
+    #       epoch - numpy datetime64 (UTC) of the R and V vectors
+    #       tf - How long to predict passes for (sec)
+    #       step - Coarse grid spacing (sec) (optional)
+    #       min_el - Minimum elevation of a pass [deg] (optional)
+    #       tol - Time accuracy of the refined AOS, TCA and LOS (sec) (optional)
+    #       chunksize - Number of coarse grid points (stations x satellites x times) evaluated at once, the
+    #                   satellites are split into chunks of at least one satellite to stay under it (optional)
+    # Outputs (one entry per pass, sorted by AOS):
+    #       station - Station index
+    #       sat - Satellite index
+    #       AOS - Acquisition of signal (sec after epoch), clipped to 0 for passes already in progress at the epoch
+    #       TCA - Time of culmination (sec after epoch)
+    #       LOS - Loss of signal (sec after epoch), clipped to tf for passes still in progress at the end
+    #       max_el - Elevation at culmination [deg]
+
+    rvects = np.atleast_2d(np.asarray(rvects, dtype=float))
+    vvects = np.atleast_2d(np.asarray(vvects, dtype=float))
+    lat = np.atleast_1d(np.asarray(lat, dtype=float))
+    [Rxy, Rz, lam] = orbits.Site_Constants(lat, long, direction, alt)
+    N = len(rvects)
+    S = len(lat)
+    gst_cache = {}
+
+    tgrid = np.append(np.arange(0, tf, step), tf)
+    T = len(tgrid)
+    nchunk = max(1, chunksize//(S*T))   # Satellites per chunk
+
+    passes = [Pass_Prediction_Chunk(rvects, vvects, np.arange(i, min(i + nchunk, N)), Rxy, Rz, lam, lat, epoch, tgrid,
+                                    min_el, tol, gst_cache) for i in range(0, N, nchunk)]
+    [cs, cn, AOS, TCA, LOS, max_el] = [np.concatenate([p[j] for p in passes]) for j in range(6)]
+
+    order = np.lexsort((cn, cs, AOS))
+    return [cs[order], cn[order], AOS[order], TCA[order], LOS[order], max_el[order]]
+
+
+def Pass_Prediction_Chunk(rvects, vvects, sats, Rxy, Rz, lam, lat, epoch, tgrid, min_el, tol, gst_cache):
+    # Worker function of Pass_Prediction() that finds the passes of one chunk of satellites over all stations
+    # Inputs:
+    #       rvects, vvects - (N,3) arrays of R and V vectors of all satellites at the epoch (km, km/s)
+    #       sats - Indices of the satellites of the chunk
+    #       Rxy, Rz, lam - (S,) station constants from orbits.Site_Constants()
+    #       lat - (S,) station geodetic latitudes [deg]
+    #       epoch - numpy datetime64 (UTC) of the R and V vectors
+    #       tgrid - (T,) coarse time grid (sec after epoch), ending at tf
+    #       min_el, tol - Same as Pass_Prediction()
+    #       gst_cache - Dictionary passed on to orbits.Greenwich_Sidereal_Time_Array()
+    # Outputs:
+    #       station, sat, AOS, TCA, LOS, max_el - Same as Pass_Prediction(), in no particular order
+
+    S = len(lat)
+    T = len(tgrid)
+    tf = tgrid[-1]
+
+    def elevation(s, n, t):
+        return Topocentric_Elevation(rvects, vvects, sats[n], Rxy, Rz, lam, lat, s, epoch, t, gst_cache)
+
+    # Coarse grid of elevations and rates, (S,n,T)
+    [s, n, t] = np.meshgrid(np.arange(S), np.arange(len(sats)), tgrid, indexing='ij')
+    [el, rate] = elevation(s, n, t)
+    del s, n, t
+
+    # Culminations, bracketed by a sign change of the elevation rate from positive to negative
+    [cs, cn, ck] = np.nonzero((rate[:,:,:-1] > 0) & (rate[:,:,1:] <= 0))
+    TCA = Illinois_Root_Batch(lambda x, idx: elevation(cs[idx], cn[idx], x)[1],
+                              tgrid[ck], tgrid[ck + 1], rate[cs, cn, ck], rate[cs, cn, ck + 1], tol)
+    max_el = elevation(cs, cn, TCA)[0]
+
+    # Passes that start or end in progress have their culmination at the ends of the span
+    start = (el[:,:,0] >= min_el) & (rate[:,:,0] <= 0)
+    end = (el[:,:,-1] >= min_el) & (rate[:,:,-1] > 0)
+    [ss, sn] = np.nonzero(start)
+    [es, en] = np.nonzero(end)
+    cs = np.concatenate((cs, ss, es))
+    cn = np.concatenate((cn, sn, en))
+    ck = np.concatenate((ck, np.zeros(len(ss), dtype=int), np.full(len(es), T - 1)))
+    TCA = np.concatenate((TCA, np.zeros(len(ss)), np.full(len(es), float(tf))))
+    max_el = np.concatenate((max_el, el[ss, sn, 0], el[es, en, -1]))
+
+    keep = max_el >= min_el
+    [cs, cn, ck, TCA, max_el] = [x[keep] for x in (cs, cn, ck, TCA, max_el)]
+
+    # Nearest coarse samples below the minimum elevation before and after each culmination
+    below = el < min_el
+    idx = np.arange(T)
+    last_below = np.maximum.accumulate(np.where(below, idx, -1), axis=2)
+    next_below = np.minimum.accumulate(np.where(below, idx, T)[:,:,::-1], axis=2)[:,:,::-1]
+    kb = last_below[cs, cn, ck]
+    ka = next_below[cs, cn, np.minimum(ck + 1, T - 1)]
+
+    # AOS between the last sample below and the culmination
+    AOS = np.zeros(len(cs))
+    rising = kb >= 0
+    fa = el[cs, cn, np.maximum(kb, 0)] - min_el
+    AOS[rising] = Illinois_Root_Batch(lambda x, i: elevation(cs[rising][i], cn[rising][i], x)[0] - min_el,
+                                      tgrid[kb[rising]], TCA[rising], fa[rising], max_el[rising] - min_el, tol)
+
+    # LOS between the culmination and the next sample below
+    LOS = np.full(len(cs), float(tf))
+    setting = ka < T
+    fb = el[cs, cn, np.minimum(ka, T - 1)] - min_el
+    LOS[setting] = Illinois_Root_Batch(lambda x, i: elevation(cs[setting][i], cn[setting][i], x)[0] - min_el,
+                                       TCA[setting], tgrid[ka[setting]], max_el[setting] - min_el, fb[setting], tol)
+
+    # A pass with more than one culmination is only reported once
+    [_, unique] = np.unique(np.stack((cs, cn, np.round(AOS/tol))), axis=1, return_index=True)
+
+    return [cs[unique], sats[cn[unique]], AOS[unique], TCA[unique], LOS[unique], max_el[unique]]
+
+
+def main():
+    # Passes of 2 LEO satellites over the Cal Poly ground station and a station in Svalbard over 1 day
+    epoch = np.datetime64('2010-08-20T00:00:00')
+    rearth = 6378 # km
+    muearth = 398600 # km^3/s^2
+    r = rearth + 700
+    vc = np.sqrt(muearth/r)
+    [rvects, vvects] = orbits.COEs_to_RV_Batch(np.sqrt(muearth*r)*np.ones(2), [0, 0], [98, 51.6], [40, 200], [0, 0], [0, 90])
+
+    [station, sat, AOS, TCA, LOS, max_el] = Pass_Prediction(rvects, vvects, [35.3, 78.2], [120.7, 15.4], ['west', 'east'],
+                                                            [100, 500], epoch, 86400)
+
+    names = ['Cal Poly', 'Svalbard']
+    for i in range(len(station)):
+        print("{:9s} sat {}: AOS {}  TCA {}  LOS {}  max elevation {:5.1f} deg".format(names[station[i]], sat[i],
+              epoch + np.timedelta64(int(AOS[i]), 's'), epoch + np.timedelta64(int(TCA[i]), 's'),
+              epoch + np.timedelta64(int(LOS[i]), 's'), max_el[i]))
+
+
+if __name__ == '__main__': main()
@@ -8,6 +8,8 @@ import numpy as np
 from scipy.integrate import odeint
 import matplotlib.pyplot as plt
 
+import Orbits_module as orbits
+
 
 # 2 Body Motion Orbit Equation ODE
 def two_body_motion(state, t, muearth):
@@ -66,16 +68,9 @@ def main():
 
 
     # Plotting of Orbit
-    positionXarray = []
-    positionYarray = []
-    positionZarray = []
-    for i in range(len(propstate)):
-        statevect = propstate[i]
-        positionvect = statevect[0:3]
-        
-        positionXarray.append(positionvect[0])
-        positionYarray.append(positionvect[1])
-        positionZarray.append(positionvect[2])
+    positionXarray = propstate[:,0]
+    positionYarray = propstate[:,1]
+    positionZarray = propstate[:,2]
     
     
     # From https://www.geeksforgeeks.org/three-dimensional-plotting-in-python-using-matplotlib/
@@ -92,6 +87,18 @@ def main():
     plt.ylabel('km')
     plt.title('24 Hour Orbit')
     plt.show()
+    
+    
+    # Ground track, with the initial state taken at 0h UTC on 8/25/2021 since the problem does not give a date
+    [lat, long, _] = orbits.Ground_Track(r, v, np.datetime64('2021-08-25T00:00:00'), t)
+    long = np.where(np.abs(np.diff(long[0], append=long[0,-1])) > 180, np.nan, long[0])   # Break the line where it wraps around
+    plt.plot(long, lat[0])
+    plt.xlim(-180, 180)
+    plt.ylim(-90, 90)
+    plt.xlabel('Longitude (deg)')
+    plt.ylabel('Latitude (deg)')
+    plt.title('24 Hour Ground Track')
+    plt.show()
 
 
 if __name__ == '__main__': main()
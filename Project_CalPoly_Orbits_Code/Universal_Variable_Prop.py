@@ -11,25 +11,6 @@ import math
 
 import Orbits_module as orbits
 
-# Stumpff Functions
-def StumC(Z):
-    if (Z > 0):
-        C = (1-math.cos(math.sqrt(Z)))/Z     # cos calculated in radians
-    elif (Z < 0):
-        C = (math.cosh(math.sqrt(-Z))-1)/(-Z)
-    elif(Z == 0):
-        C = 1/2
-    return C
-
-def StumS(Z):
-    if (Z > 0):
-        S = (math.sqrt(Z) - math.sin(math.sqrt(Z)))/(Z**1.5)     # sin calculated in radians
-    elif (Z < 0):
-        S = (math.sinh(math.sqrt(-Z))-math.sqrt(-Z))/((-Z)**1.5)
-    elif(Z == 0):
-        S = 1/6
-    return S
-
 
 def Universal_Variable_Prop(muearth, rvect, vvect, initialdt):
     # This is the function for the Universal Variable Method that can be used to
@@ -66,8 +47,8 @@ def Universal_Variable_Prop(muearth, rvect, vvect, initialdt):
         z = alpha * (x**2)
         
         # Stumpff Functions
-        C = StumC(z)
-        S = StumS(z)
+        C = orbits.StumC(z)
+        S = orbits.StumS(z)
         
         F = R*Vr/math.sqrt(muearth)*x**2*C + (1-alpha*R)*(x**3)*S + R*x - math.sqrt(muearth)*dt
         dFdx = R*Vr/math.sqrt(muearth)*x*(1-alpha*(x**2)*S) + (1-alpha*R)*(x**2)*C + R
@@ -78,8 +59,8 @@ def Universal_Variable_Prop(muearth, rvect, vvect, initialdt):
     
     # Recalculate with finalized value
     z = alpha * (x**2)
-    C = StumC(z)
-    S = StumS(z)
+    C = orbits.StumC(z)
+    S = orbits.StumS(z)
     
     # Converting inputted r and v vectors into numpy arrays so that they can be multiplied by float values
     rvect_array = np.array(rvect)
@@ -139,6 +120,20 @@ def main():
     print("The velocity after 2 hours is: {} (km/s)".format(velocity))
     print("The speed is after 2 hours is {} km/s".format(speed))
 
+    
+    
+    print(" ")
+    print("Check with Batch Universal Variable Propagation")
+    # Same initial state propagated in a batch of 3 with different time steps ~~~~~~~~~~
+    rvects = np.tile(rvect_initial, (3, 1))
+    vvects = np.tile(vvect_initial, (3, 1))
+    dts = np.array([0.5, 1, 2])*3600    # hours converted to seconds
+    [rvects_new, vvects_new, converged] = orbits.Universal_Variable_Prop_Batch(muearth, rvects, vvects, dts)
+    
+    print("The position vector 2 hours later is {} km".format(rvects_new[2]))
+    print("The velocity vector 2 hours later is {} km/s".format(vvects_new[2]))
+    print("All elements converged: {}".format(converged.all()))
+
 
 
 if __name__ == '__main__': main()
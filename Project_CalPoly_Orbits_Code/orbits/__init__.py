@@ -0,0 +1,34 @@
+# Package that contains relevant functions that can be used for orbital mechanics problems
+# The functions are split into submodules so that a script only pays the import time of what it uses.
+# Submodules are loaded the first time they (or one of their functions) are accessed, and scipy is only
+# imported when an ODE propagation function is first called
+
+# Submodules:
+#       time: Julian Date and sidereal time calculations
+#       conversions: Converting between R and V vectors and their COEs
+#       propagation: 2 body ODE propagation and Universal Variable propagation
+#       iod: Site vectors and Initial Orbit Determination
+#       lambert: Lambert's problem and porkchop grids of transfers
+#       frames: ECI to Earth fixed rotation, geodetic coordinates and ground tracks
+
+# Usage:
+#       import orbits                          (functions are loaded on first use, e.g. orbits.COEsFunction)
+#       from orbits.time import JulianDateCalc
+#       import Orbits_module as orbits         (older scripts, loads all submodules)
+
+
+
+import importlib
+
+_SUBMODULES = ('time', 'conversions', 'propagation', 'iod', 'lambert', 'frames')
+
+
+def __getattr__(name):
+    # Submodules and their functions are imported the first time they are accessed
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    for submodule in _SUBMODULES:
+        module = importlib.import_module('.' + submodule, __name__)
+        if hasattr(module, name):
+            return getattr(module, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -0,0 +1,305 @@
+# Conversions between R and V vectors and Classical Orbital Elements of the orbits package
+
+# Functions defined in this module:
+#       COEsFunction(): This function converts R and V vectors into their Classical Orbital Elements
+#       COEs_to_RV(): This function converts a given set of Classical Orbital Elements into the respective R and V vectors
+#       COEs_to_RV_Batch(): Vectorized COEs_to_RV() for arrays of COEs using a stack of rotation matrices
+#       COEsFunction_Batch(): Vectorized COEsFunction() for (N,3) arrays of R and V vectors, handles circular and equatorial orbits
+#       True_to_Mean_Anomaly_Batch(): True anomaly to mean anomaly of elliptic orbits, elementwise over arrays
+#       Mean_to_True_Anomaly_Batch(): Mean anomaly to true anomaly of elliptic orbits, solving Kepler's equation elementwise over arrays
+
+
+
+# Importing additional modules
+import numpy as np
+import math
+
+# CONVERTING BETWEEN R and V VECTORS and COEs
+# R and V Vectors to COEs
+def COEsFunction(rvect, vvect):
+    # This function is used to convert the R and V vectors into the respective COEs
+    # Inputs:
+    #       rvect - Position vector (km)
+    #       vvect - Velocity vector (km/s)
+    # Outputs:
+    #       h - angular momentum [km^2/s]
+    #       ecc - eccentricity
+    #       a - semi-major axis [km]
+    #       inc - inclination [degrees]
+    #       RAAN - Right Ascension of Acending Node [degrees]
+    #       argumentofperigee - Argument of Perigee [degrees]
+    #       trueanomaly - True Anomaly [degrees]
+    
+    muearth = 398600  # km^3/s^2
+    
+    # Normalize R and V vectors
+    r = np.linalg.norm(rvect)
+    v = np.linalg.norm(vvect)
+    
+    # Angular momentum, km^2/s
+    hvect = np.cross(rvect,vvect) 
+    h = np.linalg.norm(hvect)
+    
+    # Eccentricity
+    eccvect = (1/muearth)*(np.cross(vvect,hvect)-muearth*(rvect/r))
+    ecc = np.linalg.norm(eccvect)
+    
+    # Semi-major Axis
+    a = ((h**2)/muearth)*(1/(1-ecc**2))
+    
+    # Inclination (degrees)
+    inc = np.degrees(np.arccos(hvect[2]/np.linalg.norm(hvect)))
+    
+    # RAAN
+    k = [0, 0, 1]  # k vector
+    nodeline = np.cross(k,hvect)
+    N = np.linalg.norm(nodeline)
+    # Using nodeline to calculate RAAN
+    if (nodeline[1] > 0):
+        RAAN = np.degrees(np.arccos(nodeline[0]/N))
+    else:
+        RAAN = 360 - np.degrees(np.arccos(nodeline[0]/N)) 
+    
+    # Argument of Perigee
+    if (eccvect[2] < 0):
+    # if (np.dot(nodeline, eccvect) > 0):
+        argumentofperigee = 360 - np.degrees(np.arccos(np.dot(nodeline,eccvect)/(N*ecc)))
+    else:
+        argumentofperigee = np.degrees(np.arccos(np.dot(nodeline,eccvect)/(N*ecc)))
+    
+    # True Anomaly
+    radvelc = (np.dot(rvect,vvect)/np.linalg.norm(rvect)) # Radial velocity
+    if (radvelc < 0):
+        trueanomaly = 360 - np.degrees(np.arccos(np.dot(eccvect,rvect)/(ecc*np.linalg.norm(rvect))))
+    else:
+        trueanomaly = np.degrees(np.arccos(np.dot(eccvect,rvect)/(ecc*np.linalg.norm(rvect))))
+    
+    
+    return [h, ecc, a, inc, RAAN, argumentofperigee, trueanomaly]
+
+
+def COEs_to_RV(h, ecc, inc, RAAN, argumentofperigee, trueanomaly):
+    # This function is used to convert COEs into the respective R and V vectors in the ECI frame
+    # Inputs:
+    #       h - angular momentum [km^2/s]
+    #       ecc - eccentricity
+    #       a - semi-major axis [km]
+    #       inc - inclination [degrees]
+    #       RAAN - Right Ascension of Acending Node [degrees]
+    #       argumentofperigee - Argument of Perigee [degrees]
+    #       trueanomaly - True Anomaly [degrees]
+    # Outputs:
+    #       r_eci - Position vector (km)
+    #       v_eci - Velocity vector (km/s)
+    
+    muearth = 398600  # km^3/s^2
+    
+    # Initial Vectors in Perifocal Frame (h*h rather than h**2 since pow() is not always correctly rounded)
+    r = ((h*h)/muearth)*(1/(1 + ecc*math.cos(math.radians(trueanomaly))))*(np.array([math.cos(math.radians(trueanomaly)), math.sin(math.radians(trueanomaly)), 0]))
+    v = (muearth/h)*(np.array([-math.sin(math.radians(trueanomaly)), ecc + math.cos(math.radians(trueanomaly)), 0]))
+    
+    # Perifocal Frame to ECI Frame Rotation Matrix
+    # Principal Rotation about x-axis
+    R1 = np.array([[1, 0, 0],
+        [0, math.cos(math.radians(inc)), math.sin(math.radians(inc))],
+        [0, -math.sin(math.radians(inc)), math.cos(math.radians(inc))]])
+    # Principal Rotation about z-axis
+    R3 = np.array([[math.cos(math.radians(argumentofperigee)), math.sin(math.radians(argumentofperigee)), 0],
+        [-math.sin(math.radians(argumentofperigee)), math.cos(math.radians(argumentofperigee)), 0],
+        [0, 0, 1]])
+    # Principal Rotation about z-axis
+    R3_2 = np.array([[math.cos(math.radians(RAAN)), math.sin(math.radians(RAAN)), 0],
+        [-math.sin(math.radians(RAAN)), math.cos(math.radians(RAAN)), 0],
+        [0, 0, 1]])
+    # 3-1-3 Rotation Matrix
+    Qperi2eci= np.transpose(R3 @ R1 @ R3_2) # matrix multiplication performed using @ operator instead of using np.matmul()
+    
+    # R and V vectors in ECI Frame
+    r_eci = Qperi2eci @ r # matrix multiplication performed using @ operator instead of using np.matmul()
+    v_eci = Qperi2eci @ v # matrix multiplication performed using @ operator instead of using np.matmul()
+    
+    return [r_eci, v_eci]
+
+def COEs_to_RV_Batch(h, ecc, inc, RAAN, argumentofperigee, trueanomaly):
+    # Vectorized version of COEs_to_RV() that converts N sets of COEs at once
+    # An (N,3,3) stack of the same principal rotation matrices is built from the trig of the angle arrays
+    # (each angle converted to radians once) and applied with batched matrix multiplication. The operations
+    # are done in the same order as COEs_to_RV() so the results match it bit for bit
+    # Inputs (each a scalar or an (N,) array):
+    #       h - angular momentum [km^2/s]
+    #       ecc - eccentricity
+    #       inc - inclination [degrees]
+    #       RAAN - Right Ascension of Acending Node [degrees]
+    #       argumentofperigee - Argument of Perigee [degrees]
+    #       trueanomaly - True Anomaly [degrees]
+    # Outputs:
+    #       r_eci - (N,3) array of position vectors (km)
+    #       v_eci - (N,3) array of velocity vectors (km/s)
+    
+    muearth = 398600  # km^3/s^2
+    
+    [h, ecc, inc, RAAN, argumentofperigee, trueanomaly] = np.broadcast_arrays(
+        *[np.atleast_1d(np.asarray(x, dtype=float)) for x in (h, ecc, inc, RAAN, argumentofperigee, trueanomaly)])
+    N = h.shape[0]
+    zeros = np.zeros(N)
+    ones = np.ones(N)
+    
+    # Trig of each angle only evaluated once
+    theta = np.radians(trueanomaly)
+    ctheta = np.cos(theta)
+    stheta = np.sin(theta)
+    i = np.radians(inc)
+    ci = np.cos(i)
+    si = np.sin(i)
+    w = np.radians(argumentofperigee)
+    cw = np.cos(w)
+    sw = np.sin(w)
+    Om = np.radians(RAAN)
+    cOm = np.cos(Om)
+    sOm = np.sin(Om)
+    
+    # Initial Vectors in Perifocal Frame, (N,3,1) so they can be used with the matrix stack
+    r = (((h*h)/muearth)*(1/(1 + ecc*ctheta)))[:,None]*np.stack((ctheta, stheta, zeros), axis=1)
+    v = (muearth/h)[:,None]*np.stack((-stheta, ecc + ctheta, zeros), axis=1)
+    
+    # Perifocal Frame to ECI Frame Rotation Matrix stacks
+    # Principal Rotation about x-axis
+    R1 = np.stack((np.stack((ones, zeros, zeros), axis=1),
+                   np.stack((zeros, ci, si), axis=1),
+                   np.stack((zeros, -si, ci), axis=1)), axis=1)
+    # Principal Rotation about z-axis
+    R3 = np.stack((np.stack((cw, sw, zeros), axis=1),
+                   np.stack((-sw, cw, zeros), axis=1),
+                   np.stack((zeros, zeros, ones), axis=1)), axis=1)
+    # Principal Rotation about z-axis
+    R3_2 = np.stack((np.stack((cOm, sOm, zeros), axis=1),
+                     np.stack((-sOm, cOm, zeros), axis=1),
+                     np.stack((zeros, zeros, ones), axis=1)), axis=1)
+    # 3-1-3 Rotation Matrix stack, (N,3,3)
+    Qperi2eci = np.swapaxes(R3 @ R1 @ R3_2, 1, 2)
+    
+    # R and V vectors in ECI Frame
+    r_eci = (Qperi2eci @ r[:,:,None])[:,:,0]
+    v_eci = (Qperi2eci @ v[:,:,None])[:,:,0]
+    
+    return [r_eci, v_eci]
+
+
+def COEsFunction_Batch(rvects, vvects, ecc_tol=1.0e-10, node_tol=1.0e-10):
+    # Vectorized version of COEsFunction() that converts N sets of R and V vectors at once
+    # Quadrants are resolved with arctan2 instead of if statements, and the special cases are handled explicitly:
+    #       Equatorial orbits (no node line) - RAAN is set to 0 and the x axis is used as the node line, so the
+    #                                          argument of perigee becomes the longitude of perigee
+    #       Circular orbits (no eccentricity vector) - Argument of perigee is set to 0 and the node line is used
+    #                                                  as perigee, so the true anomaly becomes the argument of latitude
+    #                                                  (or the true longitude if the orbit is also equatorial)
+    # Inputs:
+    #       rvects - (N,3) array of position vectors (km)
+    #       vvects - (N,3) array of velocity vectors (km/s)
+    #       ecc_tol - Eccentricity below which an orbit is treated as circular (optional)
+    #       node_tol - Node line to angular momentum ratio below which an orbit is treated as equatorial (optional)
+    # Outputs (each an (N,) array, angles in [0, 360) degrees):
+    #       h - angular momentum [km^2/s]
+    #       ecc - eccentricity
+    #       a - semi-major axis [km]
+    #       inc - inclination [degrees]
+    #       RAAN - Right Ascension of Acending Node [degrees]
+    #       argumentofperigee - Argument of Perigee [degrees]
+    #       trueanomaly - True Anomaly [degrees]
+    
+    muearth = 398600  # km^3/s^2
+    
+    rvects = np.atleast_2d(np.asarray(rvects, dtype=float))
+    vvects = np.atleast_2d(np.asarray(vvects, dtype=float))
+    r = np.linalg.norm(rvects, axis=1)
+    
+    # Angular momentum, km^2/s
+    hvects = np.cross(rvects, vvects)
+    h = np.linalg.norm(hvects, axis=1)
+    hhat = hvects/h[:,None]
+    
+    # Eccentricity
+    eccvects = (1/muearth)*(np.cross(vvects, hvects) - muearth*(rvects/r[:,None]))
+    ecc = np.linalg.norm(eccvects, axis=1)
+    
+    # Semi-major Axis (infinite for parabolic orbits)
+    with np.errstate(divide='ignore'):
+        a = ((h**2)/muearth)*(1/(1-ecc**2))
+    
+    # Inclination (degrees)
+    inc = np.degrees(np.arccos(np.clip(hhat[:,2], -1, 1)))
+    
+    # Node line, k x h
+    nodelines = np.stack((-hvects[:,1], hvects[:,0], np.zeros(len(h))), axis=1)
+    N = np.linalg.norm(nodelines, axis=1)
+    equatorial = N <= node_tol*h
+    circular = ecc <= ecc_tol
+    
+    # RAAN
+    RAAN = np.where(equatorial, 0.0, np.degrees(np.arctan2(nodelines[:,1], nodelines[:,0])))
+    
+    # Unit vectors used as angle references, with the special cases substituted in
+    with np.errstate(divide='ignore', invalid='ignore'):
+        nhat = np.where(equatorial[:,None], [1.0, 0.0, 0.0], nodelines/N[:,None])
+        ehat = np.where(circular[:,None], nhat, eccvects/ecc[:,None])
+    
+    # Argument of Perigee, measured from the node line in the direction of motion
+    nperp = np.cross(hhat, nhat)
+    argumentofperigee = np.degrees(np.arctan2(np.einsum('ij,ij->i', ehat, nperp), np.einsum('ij,ij->i', ehat, nhat)))
+    
+    # True Anomaly, measured from perigee in the direction of motion
+    eperp = np.cross(hhat, ehat)
+    trueanomaly = np.degrees(np.arctan2(np.einsum('ij,ij->i', rvects, eperp), np.einsum('ij,ij->i', rvects, ehat)))
+    
+    return [h, ecc, a, inc, np.mod(RAAN, 360), np.mod(argumentofperigee, 360), np.mod(trueanomaly, 360)]
+
+
+def True_to_Mean_Anomaly_Batch(ecc, trueanomaly):
+    # This function converts true anomalies of elliptic orbits into mean anomalies, elementwise over arrays
+    # Inputs:
+    #       ecc - eccentricity (< 1)
+    #       trueanomaly - True Anomaly [degrees]
+    # Outputs:
+    #       M - Mean Anomaly [degrees], in [0, 360)
+    
+    ecc = np.asarray(ecc, dtype=float)
+    half = np.radians(trueanomaly)/2
+    E = 2*np.arctan2(np.sqrt(1 - ecc)*np.sin(half), np.sqrt(1 + ecc)*np.cos(half))   # Eccentric Anomaly
+    
+    return np.mod(np.degrees(E - ecc*np.sin(E)), 360)
+
+
+def Mean_to_True_Anomaly_Batch(ecc, M, e_tol=1.0e-12, n_max=50):
+    # This function converts mean anomalies of elliptic orbits into true anomalies, elementwise over arrays
+    # Kepler's equation E - e*sin(E) = M is solved with Newton's method, and elements that have
+    # converged are masked off so that only the remaining ones keep being iterated
+    # Inputs:
+    #       ecc - eccentricity (< 1)
+    #       M - Mean Anomaly [degrees]
+    #       e_tol - Error tolerance on the Newton step [rad] (optional)
+    #       n_max - Limit on the number of iterations (optional)
+    # Outputs:
+    #       trueanomaly - True Anomaly [degrees], in [0, 360)
+    
+    [ecc, M] = np.broadcast_arrays(np.asarray(ecc, dtype=float), np.asarray(M, dtype=float))
+    shape = M.shape
+    ecc = ecc.ravel()
+    M = np.radians(np.mod(M.ravel() + 180, 360) - 180)   # In [-pi, pi)
+    
+    # Initial guess, pi works better than M for high eccentricities
+    E = np.where(ecc < 0.8, M + ecc*np.sin(M), np.pi*np.sign(M))
+    
+    n = 0
+    active = np.arange(M.size)
+    while active.size > 0 and n < n_max:
+        Ea = E[active]
+        ea = ecc[active]
+        ratio = (Ea - ea*np.sin(Ea) - M[active])/(1 - ea*np.cos(Ea))
+        E[active] = Ea - ratio
+        active = active[np.abs(ratio) > e_tol]
+        n += 1
+    
+    half = E/2
+    trueanomaly = 2*np.arctan2(np.sqrt(1 + ecc)*np.sin(half), np.sqrt(1 - ecc)*np.cos(half))
+    
+    return np.mod(np.degrees(trueanomaly), 360).reshape(shape)
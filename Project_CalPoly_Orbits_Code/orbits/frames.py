@@ -0,0 +1,112 @@
+# Earth fixed frame and geodetic coordinate functions of the orbits package, used to find ground tracks
+
+# Functions defined in this module:
+#       ECI_to_ECEF_Array(): Rotates ECI vectors into the Earth fixed frame with the Greenwich Sidereal Time of their times
+#       ECEF_to_Geodetic_Array(): Closed form (Heikkinen) geodetic latitude, longitude and altitude of ECEF position vectors
+#       Ground_Track(): Sub-satellite latitude, longitude and altitude of N satellites at T times
+
+# The Earth fixed frame is the ECI frame turned about z by the Greenwich Sidereal Time, the same angle that
+# R_site_calc() and R_site_calc_Array() use to place sites in ECI, so sites and ground tracks line up exactly.
+# The geodetic inversion uses the same ellipsoid as R_site_calc() (Re = 6378 km, f = 0.003353)
+
+
+
+# Importing additional modules
+import numpy as np
+
+from .time import Greenwich_Sidereal_Time_Array
+from .propagation import Universal_Variable_Prop_Batch
+
+
+def ECI_to_ECEF_Array(rvects, times, gst_cache=None):
+    # This function rotates position vectors from the ECI frame into the Earth fixed (ECEF) frame
+    # Inputs:
+    #       rvects - (...,T,3) array of ECI position vectors (km), e.g. (N,T,3) for N satellites at T times
+    #       times - (T,) numpy datetime64 array of UTC times, or float array of Julian Dates
+    #       gst_cache - Optional dictionary passed on to Greenwich_Sidereal_Time_Array()
+    # Outputs:
+    #       recef - (...,T,3) array of ECEF position vectors (km)
+
+    rvects = np.asarray(rvects, dtype=float)
+    theta = np.radians(Greenwich_Sidereal_Time_Array(np.atleast_1d(times), gst_cache))
+    c = np.cos(theta)
+    s = np.sin(theta)
+
+    recef = np.empty(rvects.shape)
+    recef[...,0] = c*rvects[...,0] + s*rvects[...,1]
+    recef[...,1] = -s*rvects[...,0] + c*rvects[...,1]
+    recef[...,2] = rvects[...,2]
+
+    return recef
+
+
+def ECEF_to_Geodetic_Array(recef, Re=6378, f=0.003353):
+    # This function finds the geodetic coordinates of ECEF position vectors with Heikkinen's closed form solution,
+    # so there is no iteration and every element takes the same operations
+    # Inputs:
+    #       recef - (...,3) array of ECEF position vectors (km)
+    #       Re - Equatorial radius of the Earth (km) (optional)
+    #       f - Oblateness factor (optional)
+    # Outputs:
+    #       lat - Geodetic latitude [deg], (...) array
+    #       long - East longitude [deg] in (-180, 180], (...) array
+    #       alt - Altitude above the ellipsoid [m], (...) array, the same units R_site_calc() takes
+
+    recef = np.asarray(recef, dtype=float)
+    x = recef[...,0]
+    y = recef[...,1]
+    z = recef[...,2]
+
+    a = Re
+    b = Re*(1 - f)
+    e2 = 2*f - f**2             # First eccentricity squared
+    ep2 = (a**2 - b**2)/b**2    # Second eccentricity squared
+
+    p = np.sqrt(x**2 + y**2)   # Distance from the spin axis
+    F = 54*(b**2)*(z**2)
+    G = p**2 + (1 - e2)*(z**2) - e2*(a**2 - b**2)
+    c = (e2**2)*F*(p**2)/(G**3)
+    s = np.cbrt(1 + c + np.sqrt(c**2 + 2*c))
+    k = s + 1 + 1/s
+    P = F/(3*(k**2)*(G**2))
+    Q = np.sqrt(1 + 2*(e2**2)*P)
+    r0 = -(P*e2*p)/(1 + Q) + np.sqrt(np.maximum((a**2/2)*(1 + 1/Q) - (P*(1 - e2)*(z**2))/(Q*(1 + Q)) - P*(p**2)/2, 0))
+    U = np.sqrt((p - e2*r0)**2 + z**2)
+    V = np.sqrt((p - e2*r0)**2 + (1 - e2)*(z**2))
+    z0 = (b**2)*z/(a*V)
+
+    lat = np.degrees(np.arctan2(z + ep2*z0, p))
+    long = np.degrees(np.arctan2(y, x))
+    alt = U*(1 - (b**2)/(a*V))*1000
+
+    return [lat, long, alt]
+
+
+def Ground_Track(rvects, vvects, epoch, t, muearth=398600, gst_cache=None):
+    # This function propagates N satellites to T times with Universal_Variable_Prop_Batch() and finds the latitude,
+    # longitude and altitude of the point below each of them, all as (N,T) arrays without looping over satellites or times
+    # Inputs:
+    #       rvects, vvects - (N,3) arrays of ECI R and V vectors of all satellites at the epoch (km, km/s)
+    #       epoch - numpy datetime64 (UTC) or Julian Date of the R and V vectors
+    #       t - (T,) array of times after the epoch (sec)
+    #       muearth - Standard Gravitational Parameter (km^3/s^2) (optional)
+    #       gst_cache - Optional dictionary passed on to Greenwich_Sidereal_Time_Array()
+    # Outputs:
+    #       lat - (N,T) geodetic latitudes [deg]
+    #       long - (N,T) east longitudes [deg] in (-180, 180]
+    #       alt - (N,T) altitudes above the ellipsoid [m]
+
+    rvects = np.atleast_2d(np.asarray(rvects, dtype=float))
+    vvects = np.atleast_2d(np.asarray(vvects, dtype=float))
+    t = np.atleast_1d(np.asarray(t, dtype=float))
+    [N, T] = [rvects.shape[0], len(t)]
+
+    [r, _, _] = Universal_Variable_Prop_Batch(muearth, np.repeat(rvects, T, axis=0), np.repeat(vvects, T, axis=0), np.tile(t, N))
+
+    if np.issubdtype(np.asarray(epoch).dtype, np.datetime64):
+        times = np.datetime64(epoch, 'us') + np.round(t*1e6).astype('timedelta64[us]')
+    else:
+        times = epoch + t/86400
+    recef = ECI_to_ECEF_Array(r.reshape(N, T, 3), times, gst_cache)
+
+    return ECEF_to_Geodetic_Array(recef)
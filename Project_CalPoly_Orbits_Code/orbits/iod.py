@@ -0,0 +1,438 @@
+# Orbit determination functions of the orbits package
+
+# Functions defined in this module:
+#       R_site_calc(): This function calculates the site vector in ECI as it uses Local Sidereal Time
+#       Site_Constants(): Geodetic constants of a set of stations that do not change with time
+#       R_site_calc_Array(): Site vectors in ECI for S stations at T times as an (S,T,3) array
+#       UniversalVariable_GaussExtended(): Variation of the Universal Variable method, just returns Lagrange coefficients to be used with Gauss method
+#       Polynomial_Roots_Batch(): Roots of many polynomials of the same degree at once from their companion matrices
+#       Gauss_Valid_Roots(): Checks which roots of the Gauss range polynomial are physically valid
+#       Gauss_IOD_Batch(): Gauss method of Initial Orbit Determination for many observation triplets at once
+#       Angles_Normal_Equations_Chunk(): Weighted normal equations of one chunk of angles-only observations
+#       Batch_Least_Squares_OD(): Batch weighted least squares differential correction of a state from angles-only observations
+
+
+
+# Importing additional modules
+import numpy as np
+import math
+
+from .time import Local_Sidereal_Time_Calc, Greenwich_Sidereal_Time_Array
+from .conversions import COEsFunction_Batch
+from .propagation import Universal_Variable_Kernel, Universal_Variable_STM_Batch
+
+# R site vector calculation   
+def R_site_calc(lat, long, direction, alt, month, day, year, hour, minute, second):
+   # This function calculates the site vector in ECI as it uses local sidereal time
+   # Inputs:
+   #       lat - latitude [deg]
+   #       long - longitude [deg]
+   #       direction - string value of either east or west for longitude direction
+   #       alt - Altitude [m]
+   #       month - Month (1-12)
+   #       day - Day
+   #       year - Year
+   #       hour - Hour (24 hour clock) and in UTC
+   #       minute - Minutes and in UTC
+   #       second - Seconds and in UTC
+   # Outputs:
+   #       Rsite - R site vector in ECI frame [km]
+   
+   
+   H = alt/1000        # Convert altitude to km
+   phi = np.radians(lat)  # Latitude converted to radians
+   
+   lam = long
+   LST = Local_Sidereal_Time_Calc(month, day, year, hour, minute, second, lam, direction) # Local Sidereal Time calc
+   theta = np.radians(LST)  # Converts LST to radians
+   
+   Re = 6378     # radius of Earth [km]
+   f = 0.003353  # Oblateness factor
+   
+   # If use local sidereal time then Rsite is in ECI
+   Rsite = np.array((((Re/math.sqrt(1-(2*f-(f**2))*(math.sin(phi))**2))+H)*math.cos(phi))*np.array([math.cos(theta), math.sin(theta), 0])+
+      (((Re*(1-f)**2)/(math.sqrt(1-(2*f-(f**2))*(math.sin(phi))**2)))+H)*np.array([0, 0, math.sin(phi)]))
+   
+   return Rsite
+
+# Station geodetic constants
+def Site_Constants(lat, long, direction, alt, cache=None):
+   # This function calculates the time independent terms of R_site_calc() for S stations
+   # Inputs:
+   #       lat - latitude [deg], (S,) array
+   #       long - longitude [deg], (S,) array
+   #       direction - string value of either east or west for longitude direction, one for all stations or a list of S
+   #       alt - Altitude [m], (S,) array
+   #       cache - Optional dictionary of (lat, east longitude, alt) -> constants, filled in as new stations are seen
+   # Outputs:
+   #       Rxy - Distance of each station from the Earth's spin axis [km], (S,) array
+   #       Rz - Height of each station above the equatorial plane [km], (S,) array
+   #       lam - East longitude of each station [deg], (S,) array
+   
+   Re = 6378     # radius of Earth [km]
+   f = 0.003353  # Oblateness factor
+   
+   lat = np.atleast_1d(np.asarray(lat, dtype=float))
+   long = np.atleast_1d(np.asarray(long, dtype=float))
+   alt = np.atleast_1d(np.asarray(alt, dtype=float))
+   if isinstance(direction, str):
+      direction = [direction]*len(lat)
+   lam = np.where(np.array(direction) == 'east', long, 360-long)
+   
+   Rxy = np.empty(len(lat))
+   Rz = np.empty(len(lat))
+   for i in range(len(lat)):
+      key = (lat[i], lam[i], alt[i])
+      if cache is not None and key in cache:
+         [Rxy[i], Rz[i]] = cache[key]
+         continue
+      H = alt[i]/1000        # Convert altitude to km
+      phi = math.radians(lat[i])  # Latitude converted to radians
+      denom = math.sqrt(1-(2*f-(f**2))*(math.sin(phi))**2)
+      Rxy[i] = ((Re/denom)+H)*math.cos(phi)
+      Rz[i] = (((Re*(1-f)**2)/denom)+H)*math.sin(phi)
+      if cache is not None:
+         cache[key] = (Rxy[i], Rz[i])
+   
+   return [Rxy, Rz, lam]
+
+# R site vector calculation for many stations and times
+def R_site_calc_Array(lat, long, direction, alt, times, cache=None, gst_cache=None):
+   # Batched version of R_site_calc() that calculates the site vectors of S stations at T times in one shot
+   # The geodetic terms are calculated once per station and the sidereal time once per time
+   # Inputs:
+   #       lat - latitude [deg], (S,) array
+   #       long - longitude [deg], (S,) array
+   #       direction - string value of either east or west for longitude direction, one for all stations or a list of S
+   #       alt - Altitude [m], (S,) array
+   #       times - (T,) numpy datetime64 array of UTC times, or float array of Julian Dates
+   #       cache - Optional dictionary of station constants passed on to Site_Constants()
+   #       gst_cache - Optional dictionary passed on to Greenwich_Sidereal_Time_Array()
+   # Outputs:
+   #       Rsite - (S,T,3) array of R site vectors in ECI frame [km]
+   
+   [Rxy, Rz, lam] = Site_Constants(lat, long, direction, alt, cache)
+   GST = Greenwich_Sidereal_Time_Array(np.atleast_1d(times), gst_cache)
+   theta = np.radians(np.mod(GST[None,:] + lam[:,None], 360))   # Local Sidereal Time of each station and time
+   
+   Rsite = np.empty(theta.shape + (3,))
+   Rsite[:,:,0] = Rxy[:,None]*np.cos(theta)
+   Rsite[:,:,1] = Rxy[:,None]*np.sin(theta)
+   Rsite[:,:,2] = Rz[:,None]
+   
+   return Rsite
+
+# Universal Variable Function to be used with the Gauss Extended Method of Orbit Determination
+def UniversalVariable_GaussExtended(muearth,rvect,vvect,initialdt):
+   # Universal Variable method to get new Lagrange coefficients for Gauss Extended method
+   # (Universal_Variable_Kernel() also returns fdot, gdot and the universal anomaly for warm starts)
+   # Inputs:
+   #       muearth - Standard Gravitational Parameter (km^3/s^2)
+   #       rvect - Position vector (km)
+   #       vvect - Velocity vector (km/s)
+   #       initialdt - Time step that will be used for the calculations, in units of seconds
+   # Outputs:
+   #       f - Lagrange coefficients
+   #       g - Lagrange coefficients
+   
+   [f, g, _, _, _, _] = Universal_Variable_Kernel(muearth, rvect, vvect, initialdt)
+   
+   return [f,g]
+
+
+# Status codes of Gauss_IOD_Batch()
+GAUSS_OK = 0           # Exactly one physically valid root
+GAUSS_AMBIGUOUS = 1    # More than one physically valid root, the smallest one is used
+GAUSS_NO_ROOT = 2      # No physically valid root, outputs are NaN
+GAUSS_SINGULAR = 3     # Lines of sight are (nearly) coplanar so the geometry can't be solved, outputs are NaN
+
+# Roots of many polynomials
+def Polynomial_Roots_Batch(coeffs):
+   # This function finds the roots of K polynomials of degree n at once, as the eigenvalues of a stack of
+   # companion matrices (the same way np.roots() does it for one polynomial)
+   # Inputs:
+   #       coeffs - (K,n+1) array of coefficients, highest power first, with non zero leading coefficients
+   # Outputs:
+   #       roots - (K,n) complex array of roots
+   
+   coeffs = np.asarray(coeffs, dtype=float)
+   [K, n1] = coeffs.shape
+   n = n1 - 1
+   companion = np.zeros((K, n, n))
+   companion[:,0,:] = -coeffs[:,1:]/coeffs[:,0:1]
+   companion[:,np.arange(1, n),np.arange(n - 1)] = 1
+   
+   return np.linalg.eigvals(companion)
+
+def Gauss_Valid_Roots(roots, M, a1, a1u, a3, a3u, muearth=398600, imag_tol=1.0e-8):
+   # This function checks the candidate roots of the Gauss range polynomial of K triplets. Physically valid roots are
+   # real and positive and give positive slant ranges for all 3 observations. Gauss_IOD_Batch() uses the smallest valid root
+   # Inputs:
+   #       roots - (K,8) complex array of candidate roots of the range polynomial [km]
+   #       M - (K,3,3) inverse of the line of sight matrix times the transposed site vectors [km]
+   #       a1, a1u, a3, a3u - (K,) a values of the Vallado method
+   #       muearth - Standard Gravitational Parameter (km^3/s^2) (optional)
+   #       imag_tol - Relative size of the imaginary part below which a root counts as real (optional)
+   # Outputs:
+   #       valid - (K,8) boolean array, True for physically valid roots
+   #       R2 - (K,8) real parts of the roots [km]
+   #       u - (K,8) muearth/R2^3
+   #       rho1, rho2, rho3 - (K,8) slant ranges of the 3 observations for each root [km]
+   
+   d1 = M[:,1,0]*a1-M[:,1,1]+M[:,1,2]*a3
+   d2 = M[:,1,0]*a1u+M[:,1,2]*a3u
+   with np.errstate(divide='ignore', invalid='ignore'):
+      R2 = roots.real
+      u = muearth/(R2**3)
+      c1 = a1[:,None]+a1u[:,None]*u
+      c3 = a3[:,None]+a3u[:,None]*u
+      rho1 = (-M[:,0,0,None]*c1 + M[:,0,1,None] - M[:,0,2,None]*c3)/c1
+      rho2 = d1[:,None]+d2[:,None]*u
+      rho3 = (-M[:,2,0,None]*c1 + M[:,2,1,None] - M[:,2,2,None]*c3)/c3
+      valid = ((np.abs(roots.imag) <= imag_tol*np.abs(roots)) & (R2 > 0) &
+               (rho1 > 0) & (rho2 > 0) & (rho3 > 0))
+   
+   return [valid, R2, u, rho1, rho2, rho3]
+
+def Gauss_IOD_Chunk(RA, DEC, times, Rsites, muearth, imag_tol):
+   # Worker function of Gauss_IOD_Batch() that solves one chunk of triplets, see Gauss_IOD_Batch() for the inputs and outputs
+   
+   K = RA.shape[0]
+   
+   # Slant range directions, (K,3,3) with the observation index second
+   ra = np.radians(RA)
+   dec = np.radians(DEC)
+   rhohat = np.stack((np.cos(dec)*np.cos(ra), np.cos(dec)*np.sin(ra), np.sin(dec)), axis=2)
+   
+   # Tau
+   Tau1 = times[:,0] - times[:,1]   # Time1-Time2 in seconds
+   Tau3 = times[:,2] - times[:,1]   # Time3-Time2 in seconds
+   Tau = Tau3 - Tau1
+   
+   # a values
+   a1 = Tau3/Tau
+   a1u = (Tau3*((Tau**2) - (Tau3**2)))/(Tau*6)
+   a3 = -Tau1/Tau
+   a3u = (-Tau1*((Tau**2) - (Tau1**2)))/(Tau*6)
+   
+   # Vallado Method to set up eqn to solve for r2, skipping triplets with singular line of sight matrices
+   L = np.swapaxes(rhohat, 1, 2)
+   singular = np.abs(np.linalg.det(L)) < 1e-10
+   L[singular] = np.eye(3)
+   M = np.linalg.solve(L, np.swapaxes(Rsites, 1, 2))   # inverse of L matrix times transpose of Rsite vectors
+   d1 = M[:,1,0]*a1-M[:,1,1]+M[:,1,2]*a3
+   d2 = M[:,1,0]*a1u+M[:,1,2]*a3u
+   C = np.einsum('ij,ij->i', rhohat[:,1], Rsites[:,1])
+   
+   # All 8 candidate roots of the R2 eqn
+   zeros = np.zeros(K)
+   S = np.stack((np.ones(K), zeros, -((d1**2)+2*C*d1+(np.einsum('ij,ij->i', Rsites[:,1], Rsites[:,1]))), zeros, zeros,
+                 -2*muearth*(C*d2+d1*d2), zeros, zeros, -(muearth**2)*(d2**2)), axis=1)   # Coefficients of R2 eqn
+   roots = Polynomial_Roots_Batch(S)
+   
+   # Physically valid roots, never on singular geometry
+   [valid, R2, u, rho1, rho2, rho3] = Gauss_Valid_Roots(roots, M, a1, a1u, a3, a3u, muearth, imag_tol)
+   valid &= ~singular[:,None]
+   
+   nvalid = valid.sum(axis=1)
+   status = np.where(nvalid == 1, GAUSS_OK, np.where(nvalid > 1, GAUSS_AMBIGUOUS, GAUSS_NO_ROOT))
+   status[singular] = GAUSS_SINGULAR
+   
+   # Smallest valid root of each triplet
+   pick = np.argmin(np.where(valid, R2, np.inf), axis=1)
+   rows = np.arange(K)
+   u = u[rows,pick]
+   rho1 = rho1[rows,pick]
+   rho2 = rho2[rows,pick]
+   rho3 = rho3[rows,pick]
+   
+   # Solving for r vectors [km]
+   rvect1 = rho1[:,None]*rhohat[:,0] + Rsites[:,0]
+   rvect2 = rho2[:,None]*rhohat[:,1] + Rsites[:,1]
+   rvect3 = rho3[:,None]*rhohat[:,2] + Rsites[:,2]
+   
+   # Getting Lagrange coefficients (to solve for V2)
+   f1 = 1-(u/2)*(Tau1**2)
+   g1 = Tau1-(u/6)*(Tau1**3)
+   f3 = 1-(u/2)*(Tau3**2)
+   g3 = Tau3-(u/6)*(Tau3**3)
+   
+   # Solving for V2 [km/s]
+   vvect2 = (1/(f1*g3-f3*g1))[:,None]*(-f3[:,None]*rvect1+f1[:,None]*rvect3)
+   
+   failed = status >= GAUSS_NO_ROOT
+   rvect2[failed] = np.nan
+   vvect2[failed] = np.nan
+   
+   return [rvect2, vvect2, status, roots]
+
+def Gauss_IOD_Batch(RA, DEC, times, Rsites, muearth=398600, workers=1, chunksize=10000, imag_tol=1.0e-8):
+   # This function runs the (non-extended) Gauss method of Initial Orbit Determination on K observation triplets
+   # The 8th degree range polynomials of all triplets are solved together, all 8 candidate roots are reported,
+   # and the physically valid root is picked automatically (real, positive, and positive slant ranges)
+   # Inputs:
+   #       RA - (K,3) right ascensions of the observations [deg]
+   #       DEC - (K,3) declinations of the observations [deg]
+   #       times - (K,3) observation times [sec], any origin
+   #       Rsites - (K,3,3) site vectors in ECI of the observations [km], e.g. from R_site_calc_Array()
+   #       muearth - Standard Gravitational Parameter (km^3/s^2) (optional)
+   #       workers - Number of worker processes, 1 to run in this process or None for one per CPU (optional)
+   #       chunksize - Number of triplets per worker task (optional)
+   #       imag_tol - Relative size of the imaginary part below which a root counts as real (optional)
+   # Outputs:
+   #       rvect2 - (K,3) position vectors at the middle observation [km]
+   #       vvect2 - (K,3) velocity vectors at the middle observation [km/s]
+   #       coes - List of the 7 (K,) COE arrays [h, ecc, a, inc, RAAN, argumentofperigee, trueanomaly] from COEsFunction_Batch()
+   #       status - (K,) status codes, GAUSS_OK, GAUSS_AMBIGUOUS, GAUSS_NO_ROOT or GAUSS_SINGULAR
+   #       roots - (K,8) complex array of all candidate roots of the range polynomial [km]
+   
+   RA = np.atleast_2d(np.asarray(RA, dtype=float))
+   DEC = np.atleast_2d(np.asarray(DEC, dtype=float))
+   times = np.atleast_2d(np.asarray(times, dtype=float))
+   Rsites = np.asarray(Rsites, dtype=float).reshape(-1, 3, 3)
+   K = RA.shape[0]
+   
+   starts = range(0, K, chunksize)
+   args = [(RA[i:i+chunksize], DEC[i:i+chunksize], times[i:i+chunksize], Rsites[i:i+chunksize], muearth, imag_tol) for i in starts]
+   if workers == 1:
+      results = [Gauss_IOD_Chunk(*a) for a in args]
+   else:
+      from concurrent.futures import ProcessPoolExecutor   # Imported at first use, only needed with workers
+      with ProcessPoolExecutor(max_workers=workers) as pool:
+         results = list(pool.map(Gauss_IOD_Chunk, *zip(*args)))
+   
+   [rvect2, vvect2, status, roots] = [np.concatenate(x) for x in zip(*results)]
+   with np.errstate(invalid='ignore', divide='ignore'):
+      coes = COEsFunction_Batch(rvect2, vvect2)
+   
+   return [rvect2, vvect2, coes, status, roots]
+
+def Angles_Normal_Equations_Chunk(rvect, vvect, times, RA, DEC, Rsites, muearth, weights=1.0):
+   # Worker function of Batch_Least_Squares_OD() that adds up the normal equations of one chunk of observations
+   # The residuals are [dRA*cos(DEC), dDEC] [rad], and their partials with respect to the state at epoch are the
+   # partials with respect to the slant range vector times the position rows of the 2 body STM
+   # Inputs:
+   #       rvect, vvect - Position [km] and velocity [km/s] vectors at epoch
+   #       times - (m,) observation times [sec] after epoch
+   #       RA, DEC - (m,) right ascensions and declinations of the observations [deg]
+   #       Rsites - (m,3) site vectors in ECI of the observations [km]
+   #       muearth - Standard Gravitational Parameter (km^3/s^2)
+   #       weights - Weight of each observation, 1/sigma^2 [1/rad^2], a scalar or an (m,) array (optional)
+   # Outputs:
+   #       HtH - (6,6) sum of H^T*W*H over the chunk
+   #       Hty - (6,) sum of H^T*W*y over the chunk
+   #       yty - Sum of the squared residuals [rad^2], unweighted
+   #       m - Number of observations used, observations where the propagation did not converge are skipped
+   
+   m = len(times)
+   [r, _, Phi, converged] = Universal_Variable_STM_Batch(muearth, np.tile(rvect, (m, 1)), np.tile(vvect, (m, 1)), times)
+   
+   # Computed angles from the slant range vectors
+   rho = r - Rsites
+   rhoxy2 = rho[:,0]**2 + rho[:,1]**2
+   rhoxy = np.sqrt(rhoxy2)
+   rho2 = rhoxy2 + rho[:,2]**2
+   RAc = np.arctan2(rho[:,1], rho[:,0])
+   DECc = np.arctan2(rho[:,2], rhoxy)
+   
+   # Residuals, with the right ascension difference wrapped to (-pi, pi]
+   dec = np.radians(DEC)
+   dRA = np.mod(np.radians(RA) - RAc + np.pi, 2*np.pi) - np.pi
+   y = np.stack((dRA*np.cos(dec), dec - DECc), axis=1)
+   
+   # Partials of the residual angles with respect to the slant range vector, (m,2,3)
+   A = np.zeros((m, 2, 3))
+   A[:,0,0] = -rho[:,1]/(rhoxy*np.sqrt(rho2))
+   A[:,0,1] = rho[:,0]/(rhoxy*np.sqrt(rho2))
+   A[:,1,0] = -rho[:,0]*rho[:,2]/(rho2*rhoxy)
+   A[:,1,1] = -rho[:,1]*rho[:,2]/(rho2*rhoxy)
+   A[:,1,2] = rhoxy/rho2
+   H = np.matmul(A, Phi[:,0:3,:])
+   
+   w = np.broadcast_to(np.asarray(weights, dtype=float), (m,))[converged]
+   H = H[converged]
+   y = y[converged]
+   HtH = np.einsum('m,mki,mkj->ij', w, H, H)
+   Hty = np.einsum('m,mki,mk->i', w, H, y)
+   
+   return [HtH, Hty, np.sum(y**2), int(np.count_nonzero(converged))]
+
+def Batch_Least_Squares_OD(rvect, vvect, observations, muearth=398600, sigma=1/3600, max_iter=20, tol=1.0e-3, chunksize=10000):
+   # This function refines a state (e.g. from Gauss_IOD_Batch()) against any number of angles-only observations with
+   # batch weighted least squares differential correction. The partials come from the analytic 2 body state transition
+   # matrices of Universal_Variable_STM_Batch(), and the 6x6 normal equations are added up one chunk of observations
+   # at a time, so the memory used doesn't grow with the number of observations
+   # Inputs:
+   #       rvect, vvect - Initial estimate of the position [km] and velocity [km/s] vectors at epoch
+   #       observations - Either a list [times, RA, DEC, Rsites] of (M,) times after epoch [sec], (M,) right ascensions
+   #                      [deg], (M,) declinations [deg] and (M,3) site vectors in ECI [km], or a function that
+   #                      returns a new iterable of such lists (chunks) every time it is called, to stream
+   #                      observations that don't fit in memory. A list or chunk can hold a fifth (M,) array of the
+   #                      standard deviation of each observation [deg], which then replaces sigma
+   #       muearth - Standard Gravitational Parameter (km^3/s^2) (optional)
+   #       sigma - Standard deviation of the angle measurements [deg], a scalar or an (M,) array when observations
+   #               is a list of arrays (optional)
+   #       max_iter - Limit on the number of iterations (optional)
+   #       tol - Stops once every state correction is smaller than tol times its standard deviation (optional)
+   #       chunksize - Number of observations per chunk when observations is a list of arrays (optional)
+   # Outputs:
+   #       rvect, vvect - Refined position [km] and velocity [km/s] vectors at epoch
+   #       P - (6,6) covariance of the refined state [km, km/s]
+   #       rms - RMS of the residuals of the last iteration [deg]
+   #       iterations - Number of iterations done
+   #       converged - True if the corrections got below tol within max_iter iterations
+   # Raises ValueError if no observation can be used on an iteration, if fewer than 3 observations (6 equations)
+   # can be used or if the observations don't determine all 6 elements of the state (singular normal matrix)
+   
+   if callable(observations):
+      chunks = observations
+   else:
+      [times, RA, DEC, Rsites] = [np.asarray(x, dtype=float) for x in observations[0:4]]
+      Rsites = Rsites.reshape(-1, 3)
+      sigmas = np.broadcast_to(np.asarray(observations[4] if len(observations) > 4 else sigma, dtype=float), times.shape)
+      def chunks():
+         for i in range(0, len(times), chunksize):
+            yield [times[i:i+chunksize], RA[i:i+chunksize], DEC[i:i+chunksize], Rsites[i:i+chunksize], sigmas[i:i+chunksize]]
+   
+   x = np.concatenate((np.asarray(rvect, dtype=float), np.asarray(vvect, dtype=float)))
+   converged = False
+   
+   for iterations in range(1, max_iter + 1):
+      # Normal equations of all observations, one chunk at a time
+      HtH = np.zeros((6, 6))
+      Hty = np.zeros(6)
+      yty = 0.0
+      m = 0
+      for chunk in chunks():
+         [times_c, RA_c, DEC_c, Rsites_c] = [np.asarray(c, dtype=float) for c in chunk[0:4]]
+         sigma_c = np.asarray(chunk[4] if len(chunk) > 4 else sigma, dtype=float)
+         [HtH_c, Hty_c, yty_c, m_c] = Angles_Normal_Equations_Chunk(x[0:3], x[3:6], times_c, RA_c, DEC_c,
+                                                                    Rsites_c.reshape(-1, 3), muearth, 1/np.radians(sigma_c)**2)
+         HtH += HtH_c
+         Hty += Hty_c
+         yty += yty_c
+         m += m_c
+      if m == 0:
+         raise ValueError('No observations could be used on iteration {}, either none were given or none of the '
+                          'propagations to their times converged'.format(iterations))
+      if 2*m < 6:
+         raise ValueError('Only {} observations could be used on iteration {}, at least 3 (6 equations) are needed to '
+                          'determine the 6 elements of the state'.format(m, iterations))
+      
+      # Solve with the normal matrix scaled to a unit diagonal, since the position and velocity columns differ by orders of magnitude
+      D = np.sqrt(np.diag(HtH))
+      rank = np.linalg.matrix_rank(HtH/np.outer(D, D)) if np.all(D > 0) else np.count_nonzero(D > 0)
+      if rank < 6:
+         raise ValueError('The normal matrix of iteration {} has rank {}, the {} observations do not determine all 6 '
+                          'elements of the state'.format(iterations, rank, m))
+      Pscaled = np.linalg.inv(HtH/np.outer(D, D))
+      dx = np.dot(Pscaled, Hty/D)/D
+      P = Pscaled/np.outer(D, D)
+      x = x + dx
+      rms = math.degrees(math.sqrt(yty/(2*m)))
+      
+      if np.all(np.abs(dx) <= tol*np.sqrt(np.diag(P))):
+         converged = True
+         break
+   
+   return [x[0:3], x[3:6], P, rms, iterations, converged]
@@ -0,0 +1,188 @@
+# Lambert's problem of the orbits package, solved with the universal variable formulation (Curtis Algorithm 5.2)
+# built on the same Stumpff functions as the Universal Variable propagator
+
+# Functions defined in this module:
+#       Lambert_Time_of_Flight(): Time of flight of the universal variable Lambert formulation as a function of z
+#       Lambert_Batch(): Solves Lambert's problem for many (r1, r2, time of flight) sets at once, with multi-revolution branches
+#       Porkchop_Grid(): Departure and arrival delta-v and C3 over a (departure time x time of flight) grid
+
+# Solution of the universal variable z:
+#       Zero revolutions - The time of flight increases with z on (-inf, 4*pi^2), so z is found by bisection
+#       n revolutions - z is in (4*pi^2*n^2, 4*pi^2*(n+1)^2) where the time of flight goes to infinity at both
+#                       ends, with one minimum in between. There are two solutions (the left branch below the
+#                       minimum and the right branch above it) if the time of flight is above the minimum, none if not
+# Bisection is used in place of Newton's method so that every element of a batch converges the same way,
+# no matter how poor its starting guess would have been
+
+
+
+# Importing additional modules
+import numpy as np
+import math
+
+from .propagation import Stumpff_Functions, Universal_Variable_Prop_Batch
+
+
+def Lambert_Time_of_Flight(z, R1, R2, A, muearth):
+    # This function calculates the time of flight of the universal variable Lambert formulation, elementwise
+    # Inputs:
+    #       z - Universal variable, alpha*x^2
+    #       R1, R2 - Magnitudes of the position vectors (km)
+    #       A - Geometry constant sin(dtheta)*sqrt(R1*R2/(1 - cos(dtheta))) (km)
+    #       muearth - Standard Gravitational Parameter (km^3/s^2)
+    # Outputs:
+    #       t - Time of flight (sec), NaN where y(z) is negative and there is no solution
+    #       y - Auxiliary function y(z) (km)
+
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        [C, S, _, _] = Stumpff_Functions(z)
+        y = R1 + R2 + A*(z*S - 1)/np.sqrt(C)
+        t = (((y/C)**1.5)*S + A*np.sqrt(y))/math.sqrt(muearth)
+
+    return [np.where(y >= 0, t, np.nan), y]
+
+
+def Lambert_Batch(r1s, r2s, tofs, muearth=398600, nrev=0, branch='left', prograde=True, z_tol=1.0e-12, n_max=200):
+    # This function solves Lambert's problem for M sets of position vectors and times of flight at once
+    # Inputs:
+    #       r1s - (M,3) array of initial position vectors (km)
+    #       r2s - (M,3) array of final position vectors (km)
+    #       tofs - Times of flight (sec), a single value or an (M,) array
+    #       muearth - Standard Gravitational Parameter (km^3/s^2) (optional)
+    #       nrev - Number of complete revolutions (optional)
+    #       branch - 'left' or 'right' solution of a multi-revolution transfer, unused for nrev = 0 (optional)
+    #       prograde - True for prograde (counterclockwise seen from +z) or False for retrograde transfers (optional)
+    #       z_tol - Bisection stops once each bracket is narrower than z_tol*(1 + |z|) (optional)
+    #       n_max - Limit on the number of bisection iterations (optional)
+    # Outputs:
+    #       v1s - (M,3) array of initial velocity vectors (km/s), NaN where there is no solution
+    #       v2s - (M,3) array of final velocity vectors (km/s), NaN where there is no solution
+    #       converged - (M,) boolean array, True where a solution was found
+
+    if branch not in ('left', 'right'):
+        raise ValueError("branch must be 'left' or 'right', not {}".format(branch))
+
+    r1s = np.atleast_2d(np.asarray(r1s, dtype=float))
+    r2s = np.atleast_2d(np.asarray(r2s, dtype=float))
+    M = r1s.shape[0]
+    tof = np.broadcast_to(np.asarray(tofs, dtype=float), (M,))
+
+    R1 = np.linalg.norm(r1s, axis=1)
+    R2 = np.linalg.norm(r2s, axis=1)
+
+    # Change in true anomaly, from the z component of r1 x r2 and the direction of motion
+    cosdtheta = np.clip(np.einsum('ij,ij->i', r1s, r2s)/(R1*R2), -1, 1)
+    crossz = r1s[:,0]*r2s[:,1] - r1s[:,1]*r2s[:,0]
+    shortway = (crossz >= 0) if prograde else (crossz < 0)
+    dtheta = np.where(shortway, np.arccos(cosdtheta), 2*np.pi - np.arccos(cosdtheta))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        A = np.sin(dtheta)*np.sqrt(R1*R2/(1 - cosdtheta))
+
+    def tof_of(z):
+        return Lambert_Time_of_Flight(z, R1, R2, A, muearth)[0]
+
+    def bisect(lo, hi, increasing):
+        # Bisection of tof_of(z) = tof on brackets where it is monotonic, NaN times count as below tof
+        for _ in range(n_max):
+            mid = (lo + hi)/2
+            t = tof_of(mid)
+            below = ~(t >= tof) if increasing else (t > tof)
+            lo = np.where(below, mid, lo)
+            hi = np.where(below, hi, mid)
+            if np.all(hi - lo <= z_tol*(1 + np.abs(mid))):
+                break
+        return (lo + hi)/2
+
+    if nrev == 0:
+        # Lower end of the bracket, pushed down until the time of flight there is short enough
+        lo = np.full(M, -4*np.pi**2)
+        for _ in range(20):
+            high = tof_of(lo) >= tof
+            if not np.any(high):
+                break
+            lo[high] *= 4
+        z = bisect(lo, np.full(M, 4*np.pi**2), True)
+    else:
+        lo = np.full(M, (2*np.pi*nrev)**2)
+        hi = np.full(M, (2*np.pi*(nrev + 1))**2)
+
+        # Minimum time of flight of the n revolution transfers, by golden section search
+        ratio = (math.sqrt(5) - 1)/2
+        [a, b] = [lo.copy(), hi.copy()]
+        for _ in range(n_max):
+            c = b - ratio*(b - a)
+            d = a + ratio*(b - a)
+            left = tof_of(c) < tof_of(d)
+            b = np.where(left, d, b)
+            a = np.where(left, a, c)
+            if np.all(b - a <= z_tol*(1 + np.abs(a))):
+                break
+        zmin = (a + b)/2
+
+        if branch == 'left':
+            z = bisect(lo, zmin, False)
+        else:
+            z = bisect(zmin, hi, True)
+
+    # Lagrange coefficients and velocities
+    [t, y] = Lambert_Time_of_Flight(z, R1, R2, A, muearth)
+    converged = np.abs(t - tof) <= 1.0e-8*np.maximum(tof, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f = 1 - y/R1
+        g = A*np.sqrt(y/muearth)
+        gdot = 1 - y/R2
+        v1s = (r2s - f[:,None]*r1s)/g[:,None]
+        v2s = (gdot[:,None]*r2s - r1s)/g[:,None]
+    converged &= np.all(np.isfinite(v1s), axis=1) & np.all(np.isfinite(v2s), axis=1)
+    v1s[~converged] = np.nan
+    v2s[~converged] = np.nan
+
+    return [v1s, v2s, converged]
+
+
+def Porkchop_Grid(rdep, vdep, rarr, varr, tdep, tof, muearth=398600, nrev=0, branch='left', prograde=True,
+                  workers=1, chunksize=10000):
+    # This function evaluates Lambert transfers over a (departure time x time of flight) grid in one call
+    # The departure and arrival bodies are propagated with Universal_Variable_Prop_Batch() from their states at t = 0,
+    # and all transfers of the grid are solved together with Lambert_Batch(), optionally split over a process pool
+    # Inputs:
+    #       rdep, vdep - Position (km) and velocity (km/s) vectors of the departure body at t = 0
+    #       rarr, varr - Position (km) and velocity (km/s) vectors of the arrival body at t = 0
+    #       tdep - (D,) departure times (sec)
+    #       tof - (F,) times of flight (sec)
+    #       muearth - Standard Gravitational Parameter of the central body (km^3/s^2) (optional)
+    #       nrev, branch, prograde - See Lambert_Batch() (optional)
+    #       workers - Number of worker processes, 1 to run in this process or None for one per CPU (optional)
+    #       chunksize - Number of transfers per worker task (optional)
+    # Outputs (each a (D,F) array, NaN where there is no solution):
+    #       dv1 - Departure delta-v, |v1 - vdep| (km/s)
+    #       dv2 - Arrival delta-v, |varr - v2| (km/s)
+    #       C3 - Departure characteristic energy, dv1^2 (km^2/s^2)
+    #       v1s, v2s - (D,F,3) transfer velocities at departure and arrival (km/s)
+
+    tdep = np.atleast_1d(np.asarray(tdep, dtype=float))
+    tof = np.atleast_1d(np.asarray(tof, dtype=float))
+    [D, F] = [len(tdep), len(tof)]
+
+    # States of the bodies at departure and arrival
+    [r1, vbody1, _] = Universal_Variable_Prop_Batch(muearth, np.tile(rdep, (D, 1)), np.tile(vdep, (D, 1)), tdep)
+    tarr = (tdep[:,None] + tof[None,:]).ravel()
+    [r2, vbody2, _] = Universal_Variable_Prop_Batch(muearth, np.tile(rarr, (D*F, 1)), np.tile(varr, (D*F, 1)), tarr)
+    r1 = np.repeat(r1, F, axis=0)
+    vbody1 = np.repeat(vbody1, F, axis=0)
+    tofs = np.tile(tof, D)
+
+    starts = range(0, D*F, chunksize)
+    args = [(r1[i:i+chunksize], r2[i:i+chunksize], tofs[i:i+chunksize], muearth, nrev, branch, prograde) for i in starts]
+    if workers == 1:
+        results = [Lambert_Batch(*a) for a in args]
+    else:
+        from concurrent.futures import ProcessPoolExecutor   # Imported at first use, only needed with workers
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(Lambert_Batch, *zip(*args)))
+    [v1s, v2s, _] = [np.concatenate(x) for x in zip(*results)]
+
+    dv1 = np.linalg.norm(v1s - vbody1, axis=1)
+    dv2 = np.linalg.norm(vbody2 - v2s, axis=1)
+
+    return [dv1.reshape(D, F), dv2.reshape(D, F), (dv1**2).reshape(D, F), v1s.reshape(D, F, 3), v2s.reshape(D, F, 3)]
@@ -0,0 +1,930 @@
+# Orbit propagation of the orbits package, 2 body ODE propagation and Universal Variable propagation
+# scipy is only imported when one of the ODE functions is first called
+
+# Functions defined in this module:
+#  2 Body Orbit Propagation:
+#       two_body_motion(): This function is 2 body equations of motion which can then be used in the ODE calculator
+#       ODE_two_body_motion():
+#       two_body_motion_multi(): Builds vectorized 2 body equations of motion for N satellites stacked into one (6N,) state
+#       ODE_two_body_motion_multi(): Propagates N satellites at once in a single ODE solver call with dense output
+#       ODE_two_body_motion_stream(): Generator that yields the propagated states in fixed size chunks as the integration proceeds
+#       RK78Integrator: Runge-Kutta-Fehlberg 7(8) integrator class stepping an (N,6) state array with reused work buffers, fixed or adaptive steps
+#       RK78_two_body_motion_multi(): Propagates N satellites to a set of output times with RK78Integrator
+#       J2_Acceleration(): Perturbing acceleration of the Earth's oblateness (J2) on N satellites, used by two_body_motion_multi() with J2
+
+#  Universal Variable Orbit Propagation
+#       StumC(): Stumpff function used for Universal Variable Calculations
+#       StumS(): Stumpff function used for Universal Variable Calculations
+#       Kepler_Initial_Guess(): Starting guess of the universal anomaly for elliptic, parabolic and hyperbolic orbits
+#       Universal_Variable_Kernel(): Kepler solver (Newton or Laguerre-Conway) returning f, g, fdot, gdot together, with an optional warm start
+#       Universal_Variable_Prop(): Universal Variable Function
+#       Stumpff_Functions(): Stumpff C and S functions and their derivatives for numpy arrays, with a series expansion near zero
+#       StumC_Array(): Stumpff C function evaluated elementwise over a numpy array
+#       StumS_Array(): Stumpff S function evaluated elementwise over a numpy array
+#       Universal_Anomaly_Batch(): Newton solution of the universal Kepler equation for N states at once
+#       Universal_Variable_Prop_Batch(): Universal Variable Function for N states at once using numpy arrays
+#       Universal_Variable_STM_Batch(): Universal_Variable_Prop_Batch() that also returns the analytic 2 body state transition matrices
+
+#  J2 Secular Orbit Propagation
+#       J2_Secular_Prop(): Closed form propagation of COEs with the secular J2 rates of RAAN, argument of perigee and mean anomaly
+#       J2_Secular_Prop_RV(): J2_Secular_Prop() for (N,3) arrays of R and V vectors
+
+
+
+# Importing additional modules
+import numpy as np
+import math
+
+from .conversions import COEs_to_RV_Batch, COEsFunction_Batch, True_to_Mean_Anomaly_Batch, Mean_to_True_Anomaly_Batch
+
+# 2 Body Motion Orbit Equation ODE
+def two_body_motion(state, t, muearth):
+    
+    x = state[0]     # x position
+    y = state[1]     # y position
+    z = state[2]     # z position
+    
+    dx = state[3]     # x velocity
+    dy = state[4]     # y velocity
+    dz = state[5]     # z velocity
+    
+    # Norm of position vector
+    r = np.linalg.norm([x, y, z])
+    
+    # Acceleration and direction
+    ddx = (-muearth*x)/(r**3);  # x acceleration
+    ddy = (-muearth*y)/(r**3);  # y acceleration
+    ddz = (-muearth*z)/(r**3);  # z acceleration
+    
+    return [dx, dy, dz, ddx, ddy, ddz]
+
+
+def ODE_two_body_motion(rvect, vvect, tf, timestep):
+    # This function is used to propagate forward the R and V vectors in the specified amount of time
+    # Inputs:
+    #       rvect - Position vector (km)
+    #       vvect - Velocity vector (km/s)
+    #       tf - How long to propagte forward (sec)
+    #       timestep - How many steps ODE solver will take in that timespan
+    # Outputs:
+    #       propstate - Entire array of propagated R and V vectors
+   
+    
+    # constants
+    muearth = 398600 # km^3/s^2
+    
+    state = np.concatenate((rvect, vvect))   # Combining state into 1 big array
+    
+    # time steps
+    t = np.linspace(0, tf, timestep)   # With specified number of steps
+    
+    # solve ode
+    from scipy.integrate import odeint   # Imported at first use, scipy is slow to import
+    propstate = odeint(two_body_motion, state, t, args = (muearth,))
+    
+    return propstate
+
+
+# 2 Body Motion Orbit Equation ODE for multiple satellites
+def two_body_motion_multi(N, muearth, J2=0, Re=6378):
+    # This function builds the 2 body equations of motion for N satellites stacked into one (6N,) state
+    # ordered [x1, y1, z1, dx1, dy1, dz1, x2, ...]. The returned function is fully vectorized and reuses
+    # work buffers, so the only array allocated per call is the output (none if an out array is passed)
+    # With J2 given the acceleration of the Earth's oblateness is added (Cowell's method), see J2_Acceleration()
+    # Inputs:
+    #       N - Number of satellites
+    #       muearth - Standard Gravitational Parameter (km^3/s^2)
+    #       J2 - Second zonal harmonic of the Earth, 0 for pure 2 body motion or 1.08263e-3 for the Earth (optional)
+    #       Re - Equatorial radius of the Earth (km) (optional)
+    # Outputs:
+    #       rhs - Function rhs(t, state, out=None) returning the (6N,) state derivative, written into out if given
+    
+    rbuf = np.empty(N)   # Work buffer for -mu/r^3 of each satellite
+    
+    def rhs(t, state, out=None):
+        states = state.reshape(N, 6)
+        dstate = np.empty_like(state) if out is None else out
+        dstates = dstate.reshape(N, 6)
+        
+        dstates[:,0:3] = states[:,3:6]   # velocities
+        
+        # -mu/r^3 from the squared norm of each position vector
+        np.einsum('ij,ij->i', states[:,0:3], states[:,0:3], out=rbuf)
+        np.power(rbuf, -1.5, out=rbuf)
+        np.multiply(rbuf, -muearth, out=rbuf)
+        np.multiply(states[:,0:3], rbuf[:,None], out=dstates[:,3:6])   # accelerations
+        
+        return dstate
+    
+    if J2 == 0:
+        return rhs
+    
+    r2buf = np.empty(N)   # Work buffer for r^2
+    kbuf = np.empty(N)    # Work buffer for 1.5*J2*(Re/r)^2
+    zbuf = np.empty(N)    # Work buffer for -5*z^2/r^2
+    fbuf = np.empty(N)    # Work buffer for the factors multiplying -mu/r^3
+    
+    def rhs_J2(t, state, out=None):
+        states = state.reshape(N, 6)
+        dstate = np.empty_like(state) if out is None else out
+        dstates = dstate.reshape(N, 6)
+        
+        dstates[:,0:3] = states[:,3:6]   # velocities
+        
+        # -mu/r^3 and the J2 terms from the squared norm of each position vector
+        np.einsum('ij,ij->i', states[:,0:3], states[:,0:3], out=r2buf)
+        np.power(r2buf, -1.5, out=rbuf)
+        np.multiply(rbuf, -muearth, out=rbuf)
+        np.divide(1.5*J2*Re*Re, r2buf, out=kbuf)
+        np.square(states[:,2], out=zbuf)
+        np.divide(zbuf, r2buf, out=zbuf)
+        np.multiply(zbuf, -5, out=zbuf)
+        
+        # x and y accelerations, -mu/r^3*(1 + k*(1 - 5*z^2/r^2))
+        np.add(zbuf, 1, out=fbuf)
+        np.multiply(fbuf, kbuf, out=fbuf)
+        np.add(fbuf, 1, out=fbuf)
+        np.multiply(fbuf, rbuf, out=fbuf)
+        np.multiply(states[:,0:2], fbuf[:,None], out=dstates[:,3:5])
+        
+        # z acceleration, -mu/r^3*(1 + k*(3 - 5*z^2/r^2))
+        np.add(zbuf, 3, out=fbuf)
+        np.multiply(fbuf, kbuf, out=fbuf)
+        np.add(fbuf, 1, out=fbuf)
+        np.multiply(fbuf, rbuf, out=fbuf)
+        np.multiply(states[:,2], fbuf, out=dstates[:,5])
+        
+        return dstate
+    
+    return rhs_J2
+
+
+# J2 perturbing acceleration
+def J2_Acceleration(rvects, muearth=398600, J2=1.08263e-3, Re=6378):
+    # This function calculates the perturbing acceleration of the Earth's oblateness (J2) on N satellites
+    # Inputs:
+    #       rvects - (N,3) array of position vectors in ECI (km)
+    #       muearth - Standard Gravitational Parameter (km^3/s^2) (optional)
+    #       J2 - Second zonal harmonic of the Earth (optional)
+    #       Re - Equatorial radius of the Earth (km) (optional)
+    # Outputs:
+    #       accel - (N,3) array of accelerations (km/s^2), not including the 2 body acceleration
+    
+    rvects = np.atleast_2d(np.asarray(rvects, dtype=float))
+    r2 = np.einsum('ij,ij->i', rvects, rvects)
+    k = -1.5*J2*muearth*Re*Re/(r2*r2*np.sqrt(r2))   # -1.5*J2*mu*Re^2/r^5
+    z2 = 5*rvects[:,2]**2/r2
+    
+    return k[:,None]*rvects*np.stack((1 - z2, 1 - z2, 3 - z2), axis=1)
+
+
+def ODE_two_body_motion_multi(rvects, vvects, tf, timestep, rtol=1.0e-10, atol=1.0e-8, J2=0):
+    # This function is used to propagate forward N sets of R and V vectors in one ODE solver call
+    # Inputs:
+    #       rvects - (N,3) array of position vectors (km)
+    #       vvects - (N,3) array of velocity vectors (km/s)
+    #       tf - How long to propagte forward (sec)
+    #       timestep - How many evenly spaced output steps in that timespan
+    #       rtol, atol - Relative and absolute tolerances of the solver (optional)
+    #       J2 - Second zonal harmonic of the Earth, 0 for pure 2 body motion or 1.08263e-3 for the Earth (optional)
+    # Outputs:
+    #       propstate - (timestep, N, 6) array of propagated R and V vectors
+    #       dense - Function dense(t) giving the (N,6) states at time t, or (len(t), N, 6) states for an array of times
+    
+    # constants
+    muearth = 398600 # km^3/s^2
+    
+    rvects = np.atleast_2d(np.asarray(rvects, dtype=float))
+    vvects = np.atleast_2d(np.asarray(vvects, dtype=float))
+    N = rvects.shape[0]
+    state = np.concatenate((rvects, vvects), axis=1).ravel()   # Combining all states into 1 big array
+    
+    # time steps
+    t = np.linspace(0, tf, timestep)   # With specified number of steps
+    
+    # solve ode
+    from scipy.integrate import solve_ivp   # Imported at first use, scipy is slow to import
+    sol = solve_ivp(two_body_motion_multi(N, muearth, J2), (0, tf), state, method='DOP853', t_eval=t,
+                    dense_output=True, rtol=rtol, atol=atol)
+    propstate = sol.y.T.reshape(len(t), N, 6)
+    
+    def dense(tq):
+        y = sol.sol(tq)
+        if y.ndim == 1:
+            return y.reshape(N, 6)
+        return y.T.reshape(y.shape[1], N, 6)
+    
+    return [propstate, dense]
+
+
+def ODE_two_body_motion_stream(rvects, vvects, tf, dt, chunksize=10000, rtol=1.0e-10, atol=1.0e-8, J2=0):
+    # Generator version of ODE_two_body_motion_multi() for long propagation spans
+    # The solver is stepped one step at a time and its dense output is sampled on the output grid, so the
+    # solver state carries across chunk boundaries and memory stays flat no matter how long the span is
+    # Inputs:
+    #       rvects - (N,3) array of position vectors (km)
+    #       vvects - (N,3) array of velocity vectors (km/s)
+    #       tf - How long to propagte forward (sec)
+    #       dt - Spacing of the output times (sec), outputs are at 0, dt, 2*dt, ... up to tf
+    #       chunksize - Number of output times in each yielded chunk (the last chunk may be shorter)
+    #       rtol, atol - Relative and absolute tolerances of the solver (optional)
+    #       J2 - Second zonal harmonic of the Earth, 0 for pure 2 body motion or 1.08263e-3 for the Earth (optional)
+    # Yields:
+    #       [t, r, v] - (n,) array of times (sec), (n,N,3) positions (km) and (n,N,3) velocities (km/s)
+    
+    # constants
+    muearth = 398600 # km^3/s^2
+    
+    rvects = np.atleast_2d(np.asarray(rvects, dtype=float))
+    vvects = np.atleast_2d(np.asarray(vvects, dtype=float))
+    N = rvects.shape[0]
+    state = np.concatenate((rvects, vvects), axis=1).ravel()   # Combining all states into 1 big array
+    
+    from scipy.integrate import DOP853   # Imported at first use, scipy is slow to import
+    n_out = int(math.floor(tf/dt*(1 + 1e-12))) + 1   # Number of output times
+    solver = DOP853(two_body_motion_multi(N, muearth, J2), 0, state, tf, rtol=rtol, atol=atol)
+    
+    tbuf = np.empty(chunksize)
+    sbuf = np.empty((chunksize, N, 6))
+    
+    # Initial state is the first output
+    tbuf[0] = 0
+    sbuf[0] = state.reshape(N, 6)
+    filled = 1
+    k = 1   # Index of the next output time
+    
+    while k < n_out:
+        # Take one solver step and find the output times it covers
+        solver.step()
+        if solver.status == 'failed':
+            raise RuntimeError('ODE solver failed at t = {} sec: {}'.format(solver.t, solver.message))
+        interp = solver.dense_output()
+        k_end = n_out if solver.status == 'finished' else min(n_out, int(math.floor(solver.t/dt)) + 1)
+        
+        while k < k_end:
+            # Fill the chunk buffer, yielding it whenever it is full
+            if filled == chunksize:
+                yield [tbuf.copy(), sbuf[:,:,0:3].copy(), sbuf[:,:,3:6].copy()]
+                filled = 0
+            n = min(k_end - k, chunksize - filled)
+            tk = np.arange(k, k + n)*dt
+            tbuf[filled:filled+n] = tk
+            sbuf[filled:filled+n] = interp(tk).T.reshape(n, N, 6)
+            filled += n
+            k += n
+    
+    if filled > 0:
+        yield [tbuf[:filled].copy(), sbuf[:filled,:,0:3].copy(), sbuf[:filled,:,3:6].copy()]
+
+# Runge-Kutta-Fehlberg 7(8) coefficients, 13 stages
+_RK78_C = np.array([0, 2/27, 1/9, 1/6, 5/12, 1/2, 5/6, 1/6, 2/3, 1/3, 1, 0, 1])
+_RK78_A = np.zeros((13, 13))
+_RK78_A[1,0] = 2/27
+_RK78_A[2,0:2] = [1/36, 1/12]
+_RK78_A[3,0:3] = [1/24, 0, 1/8]
+_RK78_A[4,0:4] = [5/12, 0, -25/16, 25/16]
+_RK78_A[5,0:5] = [1/20, 0, 0, 1/4, 1/5]
+_RK78_A[6,0:6] = [-25/108, 0, 0, 125/108, -65/27, 125/54]
+_RK78_A[7,0:7] = [31/300, 0, 0, 0, 61/225, -2/9, 13/900]
+_RK78_A[8,0:8] = [2, 0, 0, -53/6, 704/45, -107/9, 67/90, 3]
+_RK78_A[9,0:9] = [-91/108, 0, 0, 23/108, -976/135, 311/54, -19/60, 17/6, -1/12]
+_RK78_A[10,0:10] = [2383/4100, 0, 0, -341/164, 4496/1025, -301/82, 2133/4100, 45/82, 45/164, 18/41]
+_RK78_A[11,0:11] = [3/205, 0, 0, 0, 0, -6/41, -3/205, -3/41, 3/41, 6/41, 0]
+_RK78_A[12,0:12] = [-1777/4100, 0, 0, -341/164, 4496/1025, -289/82, 2193/4100, 51/82, 33/164, 12/41, 0, 1]
+_RK78_B = np.array([0, 0, 0, 0, 0, 34/105, 9/35, 9/35, 9/280, 9/280, 0, 41/840, 41/840])   # 8th order weights
+_RK78_E = np.array([41/840, 0, 0, 0, 0, 0, 0, 0, 0, 0, 41/840, -41/840, -41/840])       # 7th minus 8th order weights
+
+
+class RK78Integrator:
+    # Explicit Runge-Kutta-Fehlberg 7(8) integrator of the 2 body (optionally J2) equations of motion of N
+    # satellites, stepping the whole (N,6) state array at once. The 8th order solution is propagated and the
+    # embedded 7th order one only gives the error estimate. The stage, error and state arrays are allocated
+    # once in the constructor and reused by every step, and the equations of motion write into them directly.
+    # All satellites share one step size, in adaptive mode it is set by the satellite with the largest error.
+    _N = 0
+    _rhs = None
+    _k = None
+    _y = None
+    _ytmp = None
+    _ynew = None
+    _err = None
+    _scale = None
+    _steps = 0
+    _rejected = 0
+
+    # Constructor
+    def __init__(self, N, muearth=398600, J2=0, Re=6378):
+        # Inputs:
+        #       N - Number of satellites
+        #       muearth - Standard Gravitational Parameter (km^3/s^2)
+        #       J2 - Second zonal harmonic of the Earth, 0 for pure 2 body motion or 1.08263e-3 for the Earth
+        #       Re - Equatorial radius of the Earth (km)
+
+        self._N = N
+        self._rhs = two_body_motion_multi(N, muearth, J2, Re)
+        self._k = np.empty((13, 6*N))   # Stage derivatives
+        self._y = np.empty(6*N)         # Current state
+        self._ytmp = np.empty(6*N)      # State of the stage being evaluated
+        self._ynew = np.empty(6*N)      # 8th order solution of the step
+        self._err = np.empty(6*N)       # Error estimate of the step
+        self._scale = np.empty(6*N)     # Error tolerance of each state element
+        self._steps = 0
+        self._rejected = 0
+
+    # Getter functions
+    def getStepCount(self):
+        return self._steps
+
+    def getRejectedCount(self):
+        return self._rejected
+
+    def _step(self, t, h):
+        # One step of size h from self._y, the 8th order solution is written into self._ynew
+        k = self._k
+        self._rhs(t, self._y, k[0])
+        for i in range(1, 13):
+            np.dot(_RK78_A[i,0:i], k[0:i], out=self._ytmp)
+            self._ytmp *= h
+            self._ytmp += self._y
+            self._rhs(t + _RK78_C[i]*h, self._ytmp, k[i])
+        np.dot(_RK78_B, k, out=self._ynew)
+        self._ynew *= h
+        self._ynew += self._y
+
+    def _errorNorm(self, h, rtol, atol):
+        # Largest ratio of the error estimate to its tolerance over all state elements of the last step
+        np.dot(_RK78_E, self._k, out=self._err)
+        self._err *= h
+        np.abs(self._err, out=self._err)
+        np.abs(self._y, out=self._scale)
+        np.abs(self._ynew, out=self._ytmp)
+        np.maximum(self._scale, self._ytmp, out=self._scale)
+        self._scale *= rtol
+        self._scale += atol
+        self._err /= self._scale
+        return self._err.max()
+
+    # Propagation
+    def propagate(self, rvects, vvects, times, h=None, rtol=1.0e-10, atol=1.0e-8):
+        # This function propagates N sets of R and V vectors to a set of output times
+        # Steps are shortened where needed to land exactly on the output times
+        # Inputs:
+        #       rvects - (N,3) array of position vectors (km)
+        #       vvects - (N,3) array of velocity vectors (km/s)
+        #       times - (T,) increasing array of output times after the epoch (sec), all >= 0
+        #       h - Fixed step size (sec), or None for adaptive step sizes (optional)
+        #       rtol, atol - Relative and absolute tolerances of the adaptive step size control (optional)
+        # Outputs:
+        #       propstate - (T, N, 6) array of propagated R and V vectors
+        # Raises ValueError if a fixed step size h is not finite and > 0
+        # Raises RuntimeError if an adaptive step has to be shortened below the smallest step size, e.g. on NaN states
+
+        N = self._N
+        times = np.atleast_1d(np.asarray(times, dtype=float))
+        if np.any(times < 0) or np.any(np.diff(times) < 0):
+            raise ValueError('Output times must be increasing and not negative')
+        self._y.reshape(N, 6)[:,0:3] = rvects
+        self._y.reshape(N, 6)[:,3:6] = vvects
+        propstate = np.empty((len(times), N, 6))
+
+        adaptive = h is None
+        if not adaptive and not (np.isfinite(h) and h > 0):
+            raise ValueError('Fixed step size h must be finite and > 0, not {}'.format(h))
+        if adaptive:
+            # Starting step of a small fraction of the shortest r/v time scale, the step size control grows it
+            states = self._y.reshape(N, 6)
+            h = 0.01*np.min(np.linalg.norm(states[:,0:3], axis=1)/np.linalg.norm(states[:,3:6], axis=1))
+            hmin = 16*np.spacing(max(times[-1], 1.0)) if len(times) else 0.0   # Smallest step before giving up
+
+        t = 0.0
+        for i in range(len(times)):
+            while t < times[i]:
+                hstep = min(h, times[i] - t)   # Land exactly on the output time
+                self._step(t, hstep)
+                if adaptive:
+                    err = self._errorNorm(hstep, rtol, atol)
+                    if not np.isfinite(err) or err > 1:
+                        # Rejected, a non finite step (e.g. a state passing through the origin) halves the step
+                        self._rejected += 1
+                        if not hstep > hmin:   # Also catches a NaN step size
+                            raise RuntimeError('RK78 step size fell below {} sec at t = {} sec with error norm {}'.format(hmin, t, err))
+                        h = hstep*(0.5 if not np.isfinite(err) else max(0.2, 0.9*err**(-1/8)))
+                        continue
+                    factor = 5.0 if err == 0 else min(5.0, 0.9*err**(-1/8))
+                    if hstep == h or factor < 1:
+                        h = hstep*factor   # A step shortened for an output time doesn't grow h
+                t = t + hstep if hstep < times[i] - t else times[i]
+                self._y, self._ynew = self._ynew, self._y
+                self._steps += 1
+            propstate[i] = self._y.reshape(N, 6)
+
+        return propstate
+
+
+def RK78_two_body_motion_multi(rvects, vvects, times, h=None, rtol=1.0e-10, atol=1.0e-8, J2=0):
+    # This function propagates N sets of R and V vectors to a set of output times with RK78Integrator, without
+    # any Python callback per satellite or per step allocation
+    # Inputs:
+    #       rvects - (N,3) array of position vectors (km)
+    #       vvects - (N,3) array of velocity vectors (km/s)
+    #       times - (T,) increasing array of output times after the epoch (sec), all >= 0
+    #       h - Fixed step size (sec), or None for adaptive step sizes (optional)
+    #       rtol, atol - Relative and absolute tolerances of the adaptive step size control (optional)
+    #       J2 - Second zonal harmonic of the Earth, 0 for pure 2 body motion or 1.08263e-3 for the Earth (optional)
+    # Outputs:
+    #       propstate - (T, N, 6) array of propagated R and V vectors
+    
+    # constants
+    muearth = 398600 # km^3/s^2
+    
+    rvects = np.atleast_2d(np.asarray(rvects, dtype=float))
+    vvects = np.atleast_2d(np.asarray(vvects, dtype=float))
+    integrator = RK78Integrator(rvects.shape[0], muearth, J2)
+    
+    return integrator.propagate(rvects, vvects, times, h, rtol, atol)
+
+#-----------------------------------------------------------------------------
+# UNIVERSAL VARIABLE PROPOGATION
+# Stumpff Functions
+# Inside the band |Z| < _STUMPFF_SERIES_BAND the closed forms lose precision to cancellation
+# (1-cos(sqrt(Z)) for small Z), so a truncated power series is used there instead
+_STUMPFF_SERIES_BAND = 1.0
+_STUMPFF_SERIES_TERMS = 12
+_STUMPFF_C_COEFFS = [(-1)**k/math.factorial(2*k+2) for k in range(_STUMPFF_SERIES_TERMS)]
+_STUMPFF_S_COEFFS = [(-1)**k/math.factorial(2*k+3) for k in range(_STUMPFF_SERIES_TERMS)]
+
+def StumC(Z):
+    if (abs(Z) < _STUMPFF_SERIES_BAND):
+        C = 0
+        for coeff in reversed(_STUMPFF_C_COEFFS):
+            C = C*Z + coeff
+    elif (Z > 0):
+        C = (1-math.cos(math.sqrt(Z)))/Z     # cos calculated in radians
+    else:
+        C = (math.cosh(math.sqrt(-Z))-1)/(-Z)
+    return C
+
+def StumS(Z):
+    if (abs(Z) < _STUMPFF_SERIES_BAND):
+        S = 0
+        for coeff in reversed(_STUMPFF_S_COEFFS):
+            S = S*Z + coeff
+    elif (Z > 0):
+        S = (math.sqrt(Z) - math.sin(math.sqrt(Z)))/(Z**1.5)     # sin calculated in radians
+    else:
+        S = (math.sinh(math.sqrt(-Z))-math.sqrt(-Z))/((-Z)**1.5)
+    return S
+
+
+def Kepler_Initial_Guess(muearth, R, Vr, alpha, h, dt):
+    # This function gives a starting guess of the universal anomaly suited to the type of orbit (from Vallado)
+    # Inputs:
+    #       muearth - Standard Gravitational Parameter (km^3/s^2)
+    #       R - Magnitude of the position vector (km)
+    #       Vr - Radial velocity (km/s)
+    #       alpha - Reciprocal of semimajor axis (1/km)
+    #       h - Magnitude of the angular momentum (km^2/s)
+    #       dt - Time step (sec)
+    # Outputs:
+    #       x0 - Starting guess of the universal anomaly (km^0.5)
+    #       regime - 'elliptic', 'parabolic' or 'hyperbolic'
+    
+    if abs(alpha*R) < 1.0e-6:
+        # Parabolic, from Barker's equation
+        p = (h**2)/muearth
+        s = math.atan2(1, 3*math.sqrt(muearth/(p**3))*dt)/2   # arccot
+        w = math.atan(math.copysign(abs(math.tan(s))**(1/3), math.tan(s)))
+        return [math.sqrt(p)*2/math.tan(2*w), 'parabolic']
+    if alpha > 0:
+        # Elliptic, mean motion times time
+        return [math.sqrt(muearth)*alpha*dt, 'elliptic']
+    # Hyperbolic
+    a = 1/alpha
+    sign = math.copysign(1, dt)
+    arg = (-2*muearth*alpha*dt)/(R*Vr + sign*math.sqrt(-muearth*a)*(1 - R*alpha))
+    if arg > 0:
+        return [sign*math.sqrt(-a)*math.log(arg), 'hyperbolic']
+    return [math.sqrt(muearth)*abs(alpha)*dt, 'hyperbolic']
+
+
+def Universal_Variable_Kernel(muearth, rvect, vvect, initialdt, x0=None, e_tol=1.0e-8, n_max=1000, method='newton', callback=None):
+    # This is the Kepler solver shared by the Universal Variable functions, it solves for the universal anomaly
+    # and returns all 4 Lagrange coefficients together
+    # Inputs:
+    #       muearth - Standard Gravitational Parameter (km^3/s^2)
+    #       rvect - Position vector (km)
+    #       vvect - Velocity vector (km/s)
+    #       initialdt - Time step that will be used for the calculations, in units of seconds
+    #       x0 - Starting guess of the universal anomaly (km^0.5), e.g. the x returned by an earlier call for a
+    #            nearby state and time step (optional)
+    #       e_tol - Error tolerance on the iteration step (optional)
+    #       n_max - Limit on the number of iterations (optional)
+    #       method - 'newton' for Newton's method with the guess sqrt(mu)*|alpha|*dt, or 'laguerre' for
+    #                Laguerre-Conway iteration with a guess chosen by Kepler_Initial_Guess() (optional)
+    #       callback - Function called with a dictionary of solver statistics once the solve is done: 'method',
+    #                  'regime', 'iterations', 'residual' (time of flight error in sec), 'converged' and 'x' (optional)
+    # Outputs:
+    #       f, g, fdot, gdot - Lagrange coefficients
+    #       x - Universal anomaly (km^0.5), can be used as the starting guess of the next call
+    #       n - Number of iterations that were taken
+    
+    # Code for function based on code from Curtis
+    dt = initialdt   # in units of seconds
+    
+    R = np.linalg.norm(rvect)
+    V = np.linalg.norm(vvect)
+    Vr = np.dot(rvect,vvect)/R
+    alpha = (2/R) - ((V**2)/muearth)  # Reciprocal of semimajor axis (1/km) 
+    sqrtmu = math.sqrt(muearth)
+    
+    # Setup for loop 
+    n = 0       # Iteration counter
+    ratio = 1   # ratio that will represent the error
+    regime = 'elliptic' if alpha > 0 else 'hyperbolic'
+    if method == 'newton':
+        x = sqrtmu*abs(alpha)*dt # Initial Guess
+    elif method == 'laguerre':
+        h = np.linalg.norm(np.cross(rvect, vvect))
+        [x, regime] = Kepler_Initial_Guess(muearth, R, Vr, alpha, h, dt)
+    else:
+        raise ValueError("method must be 'newton' or 'laguerre', not {}".format(method))
+    if x0 is not None:
+        x = x0
+    
+    # Loop
+    while abs(ratio) > e_tol and n <= n_max:
+        z = alpha * (x**2)
+        
+        # Stumpff Functions
+        C = StumC(z)
+        S = StumS(z)
+        
+        F = R*Vr/sqrtmu*x**2*C + (1-alpha*R)*(x**3)*S + R*x - sqrtmu*dt
+        dFdx = R*Vr/sqrtmu*x*(1-alpha*(x**2)*S) + (1-alpha*R)*(x**2)*C + R
+        if method == 'newton':
+            ratio = F/dFdx
+        else:
+            # Laguerre-Conway step with n = 5
+            d2Fdx2 = R*Vr/sqrtmu*(1-alpha*(x**2)*C) + (1-alpha*R)*x*(1-alpha*(x**2)*S)
+            root = math.sqrt(abs(16*(dFdx**2) - 20*F*d2Fdx2))
+            ratio = 5*F/(dFdx + math.copysign(root, dFdx))
+        
+        x = x - ratio  # Recalculate x
+        n += 1         # Increment n to keep track of number of iterations
+    
+    # Recalculate with finalized value
+    z = alpha * (x**2)
+    C = StumC(z)
+    S = StumS(z)
+    
+    # Lagrange Coefficients
+    f = 1 - ((x**2)/R)*C
+    g = dt - (1/sqrtmu)*(x**3)*S
+    R_new = np.linalg.norm(f*np.array(rvect) + g*np.array(vvect))
+    fdot = (sqrtmu/(R_new*R))*x*(S*z-1)
+    gdot = 1 - ((x**2)/R_new)*C
+    
+    if callback is not None:
+        residual = abs(R*Vr/sqrtmu*x**2*C + (1-alpha*R)*(x**3)*S + R*x - sqrtmu*dt)/sqrtmu
+        callback({'method': method, 'regime': regime, 'iterations': n, 'residual': residual,
+                  'converged': abs(ratio) <= e_tol, 'x': x})
+    
+    return [f, g, fdot, gdot, x, n]
+
+
+def Universal_Variable_Prop(muearth, rvect, vvect, initialdt, method='newton', callback=None):
+    # This is the function for the Universal Variable Method that can be used to
+    # find R and V vectors in an orbit after a specified amount of time
+    # Inputs:
+    #       muearth - Standard Gravitational Parameter (km^3/s^2)
+    #       rvect - Position vector (km)
+    #       vvect - Velocity vector (km/s)
+    #       initialdt - Time step that will be used for the calculations, in units of seconds
+    #       method - Kepler solver, 'newton' or 'laguerre' (optional, see Universal_Variable_Kernel())
+    #       callback - Function called with the solver statistics (optional, see Universal_Variable_Kernel())
+    # Outputs:
+    #       rvect_new - New calculated position vector based on the time step (km)
+    #       vvect_new - New calculated velocity vector based on the time step (km/s)
+
+    [f, g, fdot, gdot, _, _] = Universal_Variable_Kernel(muearth, rvect, vvect, initialdt, method=method, callback=callback)
+    
+    # Converting inputted r and v vectors into numpy arrays so that they can be multiplied by float values
+    rvect_array = np.array(rvect)
+    vvect_array = np.array(vvect)
+    
+    # Solving for new r and v vectors
+    rvect_new = f*rvect_array + g*vvect_array
+    vvect_new = fdot*rvect_array +  gdot*vvect_array
+    
+    return[rvect_new, vvect_new]
+
+# Stumpff Functions for numpy arrays
+def Stumpff_Functions(Z):
+    # This function evaluates both Stumpff functions and their derivatives elementwise over an array
+    # of Z values, sharing a single sqrt/sin/cos (or sinh/cosh) evaluation between them
+    # Inputs:
+    #       Z - Universal variable argument, alpha*x^2 (scalar or numpy array)
+    # Outputs:
+    #       C - Stumpff C function
+    #       S - Stumpff S function
+    #       dCdZ - Derivative of C with respect to Z
+    #       dSdZ - Derivative of S with respect to Z
+    
+    Z = np.asarray(Z, dtype=float)
+    C = np.full(Z.shape, np.nan)      # NaN Z falls in none of the regimes below and stays NaN
+    S = np.full(Z.shape, np.nan)
+    dCdZ = np.full(Z.shape, np.nan)
+    dSdZ = np.full(Z.shape, np.nan)
+    
+    small = np.abs(Z) < _STUMPFF_SERIES_BAND
+    pos = (Z > 0) & ~small
+    neg = (Z < 0) & ~small
+    big = pos | neg
+    
+    # Power series near Z = 0, evaluated with Horner's method
+    Zs = Z[small]
+    Cs = np.zeros(Zs.shape)
+    Ss = np.zeros(Zs.shape)
+    dCs = np.zeros(Zs.shape)
+    dSs = np.zeros(Zs.shape)
+    for k in reversed(range(_STUMPFF_SERIES_TERMS)):
+        Cs = Cs*Zs + _STUMPFF_C_COEFFS[k]
+        Ss = Ss*Zs + _STUMPFF_S_COEFFS[k]
+        if k > 0:
+            dCs = dCs*Zs + k*_STUMPFF_C_COEFFS[k]
+            dSs = dSs*Zs + k*_STUMPFF_S_COEFFS[k]
+    C[small] = Cs
+    S[small] = Ss
+    dCdZ[small] = dCs
+    dSdZ[small] = dSs
+    
+    # Closed forms away from Z = 0
+    Zp = Z[pos]
+    sqrtZ = np.sqrt(Zp)
+    C[pos] = (1-np.cos(sqrtZ))/Zp                 # cos calculated in radians
+    S[pos] = (sqrtZ - np.sin(sqrtZ))/(Zp*sqrtZ)   # sin calculated in radians
+    Zn = -Z[neg]
+    sqrtZ = np.sqrt(Zn)
+    C[neg] = (np.cosh(sqrtZ)-1)/Zn
+    S[neg] = (np.sinh(sqrtZ)-sqrtZ)/(Zn*sqrtZ)
+    
+    # Derivatives from the recurrence relations with C and S
+    Zb = Z[big]
+    dCdZ[big] = (1 - Zb*S[big] - 2*C[big])/(2*Zb)
+    dSdZ[big] = (C[big] - 3*S[big])/(2*Zb)
+    
+    return [C[()], S[()], dCdZ[()], dSdZ[()]]
+
+def StumC_Array(Z):
+    # Same as StumC() but works elementwise over an array of Z values
+    return Stumpff_Functions(Z)[0]
+
+def StumS_Array(Z):
+    # Same as StumS() but works elementwise over an array of Z values
+    return Stumpff_Functions(Z)[1]
+
+
+def Universal_Anomaly_Batch(muearth, rvects, vvects, dts, e_tol=1.0e-8, n_max=1000):
+    # This function solves the universal Kepler equation for the universal anomaly of N states at once
+    # The Newton iteration is done with numpy array operations, and elements that have
+    # converged are masked off so that only the remaining ones keep being iterated
+    # Inputs:
+    #       muearth - Standard Gravitational Parameter (km^3/s^2)
+    #       rvects - (N,3) array of position vectors (km)
+    #       vvects - (N,3) array of velocity vectors (km/s)
+    #       dts - Time step in seconds, either a single value or an (N,) array
+    #       e_tol - Error tolerance on the Newton step (optional)
+    #       n_max - Limit on the number of iterations (optional)
+    # Outputs (each an (N,) array):
+    #       x - Universal anomaly (km^0.5)
+    #       R - Initial radius (km)
+    #       Vr - Initial radial velocity (km/s)
+    #       alpha - Reciprocal of the semimajor axis (1/km)
+    #       dt - Time steps (sec)
+    #       converged - True where the Newton iteration converged
+    
+    rvects = np.atleast_2d(np.asarray(rvects, dtype=float))
+    vvects = np.atleast_2d(np.asarray(vvects, dtype=float))
+    N = rvects.shape[0]
+    dt = np.broadcast_to(np.asarray(dts, dtype=float), (N,)).copy()   # in units of seconds
+    
+    R = np.linalg.norm(rvects, axis=1)
+    V = np.linalg.norm(vvects, axis=1)
+    Vr = np.einsum('ij,ij->i', rvects, vvects)/R
+    alpha = (2/R) - ((V**2)/muearth)  # Reciprocal of semimajor axis (1/km)
+    sqrtmu = math.sqrt(muearth)
+    
+    # Setup for loop
+    n = 0                               # Iteration counter
+    x = sqrtmu*np.abs(alpha)*dt         # Initial Guess
+    converged = np.zeros(N, dtype=bool)
+    active = np.arange(N)               # Indices of elements still being iterated
+    
+    # Loop (overflow in cosh/sinh for badly diverging elements just flags them as not converged)
+    with np.errstate(over='ignore', invalid='ignore'):
+        while active.size > 0 and n <= n_max:
+            xa = x[active]
+            Ra = R[active]
+            alphaa = alpha[active]
+            z = alphaa * (xa**2)
+            
+            # Stumpff Functions
+            [C, S, _, _] = Stumpff_Functions(z)
+            
+            F = Ra*Vr[active]/sqrtmu*xa**2*C + (1-alphaa*Ra)*(xa**3)*S + Ra*xa - sqrtmu*dt[active]
+            dFdx = Ra*Vr[active]/sqrtmu*xa*(1-alphaa*(xa**2)*S) + (1-alphaa*Ra)*(xa**2)*C + Ra
+            ratio = F/dFdx
+            
+            x[active] = xa - ratio  # Recalculate x
+            done = np.abs(ratio) <= e_tol
+            converged[active[done]] = True
+            active = active[~done & np.isfinite(ratio)]   # Drop converged and diverged elements
+            n += 1
+    
+    return [x, R, Vr, alpha, dt, converged]
+
+
+def Universal_Variable_Prop_Batch(muearth, rvects, vvects, dts, e_tol=1.0e-8, n_max=1000):
+    # Batch version of Universal_Variable_Prop() that propagates N states at once
+    # The universal anomaly of every state is found with Universal_Anomaly_Batch()
+    # Inputs:
+    #       muearth - Standard Gravitational Parameter (km^3/s^2)
+    #       rvects - (N,3) array of position vectors (km)
+    #       vvects - (N,3) array of velocity vectors (km/s)
+    #       dts - Time step in seconds, either a single value or an (N,) array
+    #       e_tol - Error tolerance on the Newton step (optional)
+    #       n_max - Limit on the number of iterations (optional)
+    # Outputs:
+    #       rvects_new - (N,3) array of propagated position vectors (km)
+    #       vvects_new - (N,3) array of propagated velocity vectors (km/s)
+    #       converged - (N,) boolean array, True where the Newton iteration converged
+    
+    rvects = np.atleast_2d(np.asarray(rvects, dtype=float))
+    vvects = np.atleast_2d(np.asarray(vvects, dtype=float))
+    [x, R, Vr, alpha, dt, converged] = Universal_Anomaly_Batch(muearth, rvects, vvects, dts, e_tol, n_max)
+    sqrtmu = math.sqrt(muearth)
+    
+    with np.errstate(over='ignore', invalid='ignore'):
+        # Recalculate with finalized values
+        z = alpha * (x**2)
+        [C, S, _, _] = Stumpff_Functions(z)
+        
+        # Lagrange Coefficients and solving for new r and v vectors
+        f = 1 - ((x**2)/R)*C
+        g = dt - (1/sqrtmu)*(x**3)*S
+        rvects_new = f[:,None]*rvects + g[:,None]*vvects
+        R_new = np.linalg.norm(rvects_new, axis=1)
+        fdot = (sqrtmu/(R_new*R))*x*(S*z-1)
+        gdot = 1 - ((x**2)/R_new)*C
+        vvects_new = fdot[:,None]*rvects + gdot[:,None]*vvects
+    
+    return [rvects_new, vvects_new, converged]
+
+
+def Universal_Variable_STM_Batch(muearth, rvects, vvects, dts, e_tol=1.0e-8, n_max=1000):
+    # This function propagates N states like Universal_Variable_Prop_Batch() and also returns their analytic
+    # 2 body state transition matrices. The STM is found by differentiating r = f*r0 + g*v0 and
+    # v = fdot*r0 + gdot*v0 through the scalars R0, sigma0 = r0.v0/sqrt(mu) and alpha they depend on, with
+    # the derivatives of the universal anomaly from implicit differentiation of the universal Kepler equation
+    # Inputs:
+    #       muearth - Standard Gravitational Parameter (km^3/s^2)
+    #       rvects - (N,3) array of position vectors (km)
+    #       vvects - (N,3) array of velocity vectors (km/s)
+    #       dts - Time step in seconds, either a single value or an (N,) array
+    #       e_tol - Error tolerance on the Newton step (optional)
+    #       n_max - Limit on the number of iterations (optional)
+    # Outputs:
+    #       rvects_new - (N,3) array of propagated position vectors (km)
+    #       vvects_new - (N,3) array of propagated velocity vectors (km/s)
+    #       Phi - (N,6,6) state transition matrices d[r, v]/d[r0, v0]
+    #       converged - (N,) boolean array, True where the Newton iteration converged
+    
+    rvects = np.atleast_2d(np.asarray(rvects, dtype=float))
+    vvects = np.atleast_2d(np.asarray(vvects, dtype=float))
+    N = rvects.shape[0]
+    [x, R, Vr, alpha, dt, converged] = Universal_Anomaly_Batch(muearth, rvects, vvects, dts, e_tol, n_max)
+    sqrtmu = math.sqrt(muearth)
+    sigma = R*Vr/sqrtmu
+    
+    z = alpha*(x**2)
+    [C, S, dC, dS] = Stumpff_Functions(z)
+    
+    # Lagrange coefficients and new r and v vectors
+    f = 1 - ((x**2)/R)*C
+    g = dt - (1/sqrtmu)*(x**3)*S
+    rvects_new = f[:,None]*rvects + g[:,None]*vvects
+    R_new = np.linalg.norm(rvects_new, axis=1)
+    q = x*(S*z - 1)
+    fdot = (sqrtmu/(R_new*R))*q
+    gdot = 1 - ((x**2)/R_new)*C
+    vvects_new = fdot[:,None]*rvects + gdot[:,None]*vvects
+    
+    # Gradients of R0, sigma0 and alpha with respect to [r0, v0], (N,6)
+    zeros = np.zeros((N, 3))
+    gR = np.concatenate((rvects/R[:,None], zeros), axis=1)
+    gsigma = np.concatenate((vvects, rvects), axis=1)/sqrtmu
+    galpha = np.concatenate((-2*rvects/(R**3)[:,None], -2*vvects/muearth), axis=1)
+    
+    # Gradient of the universal anomaly, the derivative of the Kepler equation with respect to x is R_new
+    K_R = x - alpha*(x**3)*S
+    K_sigma = (x**2)*C
+    K_alpha = sigma*(x**4)*dC - R*(x**3)*S + (1 - alpha*R)*(x**5)*dS
+    gx = -(K_R[:,None]*gR + K_sigma[:,None]*gsigma + K_alpha[:,None]*galpha)/R_new[:,None]
+    
+    # Gradients of f and g
+    df = (-(2*x*C + 2*alpha*(x**3)*dC)/R)[:,None]*gx + ((x**2)*C/(R**2))[:,None]*gR - ((x**4)*dC/R)[:,None]*galpha
+    dg = (-(3*(x**2)*S + 2*alpha*(x**4)*dS)/sqrtmu)[:,None]*gx - ((x**5)*dS/sqrtmu)[:,None]*galpha
+    
+    # Position rows of the STM
+    Phi = np.zeros((N, 6, 6))
+    eye = np.eye(3)
+    Phi[:,0:3,0:3] = f[:,None,None]*eye
+    Phi[:,0:3,3:6] = g[:,None,None]*eye
+    Phi[:,0:3,:] += rvects[:,:,None]*df[:,None,:] + vvects[:,:,None]*dg[:,None,:]
+    
+    # Gradients of |r|, fdot and gdot
+    dR_new = np.einsum('ni,nij->nj', rvects_new/R_new[:,None], Phi[:,0:3,:])
+    dq = ((S*z - 1) + 2*z*(S + z*dS))[:,None]*gx + ((x**3)*(S + z*dS))[:,None]*galpha
+    dfdot = (sqrtmu/(R_new*R))[:,None]*dq - fdot[:,None]*(dR_new/R_new[:,None] + gR/R[:,None])
+    dgdot = (-(2*x*C + 2*alpha*(x**3)*dC)/R_new)[:,None]*gx - ((x**4)*dC/R_new)[:,None]*galpha + \
+            ((x**2)*C/(R_new**2))[:,None]*dR_new
+    
+    # Velocity rows of the STM
+    Phi[:,3:6,0:3] = fdot[:,None,None]*eye
+    Phi[:,3:6,3:6] = gdot[:,None,None]*eye
+    Phi[:,3:6,:] += rvects[:,:,None]*dfdot[:,None,:] + vvects[:,:,None]*dgdot[:,None,:]
+    
+    return [rvects_new, vvects_new, Phi, converged]
+
+
+# J2 secular (mean element) propagation
+def J2_Secular_Prop(h, ecc, inc, RAAN, argumentofperigee, trueanomaly, dts, muearth=398600, J2=1.08263e-3, Re=6378):
+    # This function propagates elliptic orbits under J2 in closed form, with only the secular rates of the RAAN,
+    # the argument of perigee and the mean anomaly. h, ecc and inc stay constant. The given elements are used
+    # as mean elements, so the short period J2 terms (a few km in LEO) are not modeled
+    # All inputs are broadcast together, e.g. (N,1) elements with (T,) times give (N,T) outputs
+    # Inputs:
+    #       h - angular momentum [km^2/s]
+    #       ecc - eccentricity (< 1, outputs are NaN for parabolic and hyperbolic orbits)
+    #       inc - inclination [degrees]
+    #       RAAN - Right Ascension of Acending Node [degrees]
+    #       argumentofperigee - Argument of Perigee [degrees]
+    #       trueanomaly - True Anomaly [degrees]
+    #       dts - Time step in seconds
+    #       muearth - Standard Gravitational Parameter (km^3/s^2) (optional)
+    #       J2 - Second zonal harmonic of the Earth (optional)
+    #       Re - Equatorial radius of the Earth (km) (optional)
+    # Outputs (angles in [0, 360) degrees):
+    #       h, ecc, inc, RAAN, argumentofperigee, trueanomaly - Propagated COEs
+    
+    [h, ecc, inc, RAAN, argumentofperigee, trueanomaly, dt] = np.broadcast_arrays(
+        *[np.asarray(x, dtype=float) for x in (h, ecc, inc, RAAN, argumentofperigee, trueanomaly, dts)])
+    
+    with np.errstate(invalid='ignore'):
+        p = (h*h)/muearth                   # Semi-latus rectum (km)
+        a = p/(1 - ecc**2)                  # Semi-major axis (km)
+        n = np.sqrt(muearth/(a**3))         # Mean motion (rad/s)
+        ci = np.cos(np.radians(inc))
+        k = 1.5*J2*(Re/p)**2*n              # Common factor of the rates (rad/s)
+        
+        # Secular rates (deg/s)
+        RAANdot = np.degrees(-k*ci)
+        argpdot = np.degrees(k*(2.5*ci*ci - 0.5))
+        Mdot = np.degrees(n + k*np.sqrt(1 - ecc**2)*(1.5*ci*ci - 0.5))
+    
+    elliptic = ecc < 1
+    M = True_to_Mean_Anomaly_Batch(np.where(elliptic, ecc, 0), trueanomaly) + Mdot*dt
+    trueanomaly = np.where(elliptic, Mean_to_True_Anomaly_Batch(np.where(elliptic, ecc, 0), np.where(elliptic, M, 0)), np.nan)
+    RAAN = np.where(elliptic, np.mod(RAAN + RAANdot*dt, 360), np.nan)
+    argumentofperigee = np.where(elliptic, np.mod(argumentofperigee + argpdot*dt, 360), np.nan)
+    
+    return [h, ecc, inc, RAAN, argumentofperigee, trueanomaly]
+
+
+def J2_Secular_Prop_RV(rvects, vvects, dts, muearth=398600, J2=1.08263e-3, Re=6378):
+    # This function propagates N R and V vectors with J2_Secular_Prop() by converting them to COEs and back
+    # The first order short period J2 term of the semi-major axis is removed before propagating, otherwise its
+    # error in the mean motion builds up into an along track drift of tens of km per day in LEO
+    # Inputs:
+    #       rvects - (N,3) array of position vectors (km)
+    #       vvects - (N,3) array of velocity vectors (km/s)
+    #       dts - Time step in seconds, either a single value or an (N,) array
+    #       muearth, J2, Re - See J2_Secular_Prop() (optional)
+    # Outputs:
+    #       rvects_new - (N,3) array of propagated position vectors (km)
+    #       vvects_new - (N,3) array of propagated velocity vectors (km/s)
+    
+    rvects = np.atleast_2d(np.asarray(rvects, dtype=float))
+    [h, ecc, a, inc, RAAN, argumentofperigee, trueanomaly] = COEsFunction_Batch(rvects, vvects)
+    
+    # Mean semi-major axis, osculating minus the short period term
+    with np.errstate(invalid='ignore'):
+        ar3 = (a/np.linalg.norm(rvects, axis=1))**3
+        ci = np.cos(np.radians(inc))
+        u = np.radians(argumentofperigee + trueanomaly)   # Argument of latitude
+        a = a - a*(J2/2)*(Re/a)**2*((3*ci*ci - 1)*(ar3 - (1 - ecc**2)**-1.5) + 3*(1 - ci*ci)*ar3*np.cos(2*u))
+        h = np.sqrt(muearth*a*(1 - ecc**2))
+    
+    coes = J2_Secular_Prop(h, ecc, inc, RAAN, argumentofperigee, trueanomaly, dts, muearth, J2, Re)
+    
+    return COEs_to_RV_Batch(*np.broadcast_arrays(*coes))
@@ -0,0 +1,177 @@
+# Time calculations of the orbits package
+
+# Functions defined in this module:
+#       JulianDateCalc(): This function outputs the Julian Date from a given time
+#       Local_Sidereal_Time_Calc(): This function calculates the Local Sidereal time based on the given date and time
+#       JulianDateCalc_Array(): Vectorized JulianDateCalc() for numpy datetime64 arrays or Julian Date arrays
+#       Greenwich_Sidereal_Time_Array(): Greenwich Sidereal Time for arrays of times, with an optional cache of the value at 0h of each day
+#       Local_Sidereal_Time_Calc_Array(): Vectorized Local_Sidereal_Time_Calc() for arrays of times
+
+
+
+# Importing additional modules
+import numpy as np
+import math
+
+# DEALING WITH TIME CALCULATIONS
+# Julian Date Function
+def JulianDateCalc(month, day, year, hour, minute, second):
+   # This function outputs the Julian Date from a given time
+   # Inputs:
+   #       month - Month (1-12)
+   #       day - Day
+   #       year - Year
+   #       hour - Hour (24 hour clock) and in UTC
+   #       minute - Minutes and in UTC
+   #       second - Seconds and in UTC
+   # Outputs:
+   #       JD - Julian Date
+   #       UT - Universal Time (time fractions of the day)
+   
+   M = month
+   D = day
+   Y = year
+   H = hour
+   Min = minute
+   S = second
+   
+   UT = H + Min/60+ S/3600
+   
+   J0 = 367*Y - math.floor((7*(Y+math.floor((M+9)/12)))/4) + math.floor((275*M)/9) + D + 1721013.5
+   JD = J0 + (UT/24)
+   
+   return [JD, UT]
+
+# Local Sidereal Time Function
+def Local_Sidereal_Time_Calc(month, day, year, hour, minute, second, lam, direction):
+    # This function calculates the Local Sidereal time based on the given date and time
+    # Inputs:
+    #       month - Month (1-12)
+    #       day - Day
+    #       year - Year
+    #       hour - Hour (24 hour clock) and in UTC
+    #       minute - Minutes and in UTC
+    #       second - Seconds and in UTC
+    #       lam - lambda value (represents east longitude)
+    #       direction - string value of either east or west for longitude direction
+    # Outputs:
+    #       LST - Local Sidereal Time in Degrees
+    
+    M = month
+    D = day
+    Y = year
+    H = hour
+    Min = minute
+    S = second
+    
+    J2000 = 2451545.0     # The Julian Date of Jan 1 2000 at noon
+    juliancentury = 36525 # Sets the value of a Julian Century
+    
+    UT = JulianDateCalc(month, day, year, hour, minute, second)[1]  # Get just the UT at the current time
+    # Calculating Julian Date at the beginning of the given day (not at current given time) so at 00:00:00
+    JD = 367*Y - math.floor((7*(Y+math.floor((M+9)/12)))/4) + math.floor((275*M)/9) + D + 1721013.5
+    
+    T0 = (JD-J2000)/juliancentury
+    thetaG0 = 100.4606184 + 36000.77004*T0 + .000387933*((T0)**2) - (2.583*(10**-8))*((T0)**3)
+    
+    while thetaG0 > 360 or thetaG0 < 0:
+      if thetaG0 > 360:
+         thetaG0 = thetaG0 - 360
+      else:
+         thetaG0 = thetaG0 + 360
+         
+    theta = thetaG0 + 360.98564724*(UT/24) # Greenwich Sidereal Time
+    
+    # Local Sidereal Time in degrees
+    if direction == 'east':
+      # Need to add lamda value
+      LST = theta + lam
+    else:
+      # Subtract lamda value
+      LST = theta + (360-lam)
+    
+    while LST >  360 or LST < 0:
+      if LST > 360:
+         LST = LST - 360
+      else:
+         LST = LST + 360
+
+    return LST
+
+# Julian Date Function for arrays
+def JulianDateCalc_Array(times):
+    # Vectorized version of JulianDateCalc()
+    # Inputs:
+    #       times - numpy datetime64 array of UTC times, or float array of Julian Dates
+    # Outputs:
+    #       JD - Julian Date array
+    #       UT - Universal Time array (hours since 0h of the day)
+    #       J0 - Julian Date array at 0h of the day
+    
+    times = np.asarray(times)
+    if np.issubdtype(times.dtype, np.datetime64):
+        # Split into whole days and time of day so no precision is lost to the large Julian Date offset
+        days = times.astype('datetime64[D]')
+        UT = (times - days)/np.timedelta64(1, 'h')
+        J0 = 2440587.5 + (days - np.datetime64('1970-01-01', 'D'))/np.timedelta64(1, 'D')   # Unix epoch is JD 2440587.5
+    else:
+        JD = times.astype(float)
+        J0 = np.floor(JD - 0.5) + 0.5
+        UT = (JD - J0)*24
+    JD = J0 + (UT/24)
+    
+    return [JD, UT, J0]
+
+# Greenwich Sidereal Time Function for arrays
+def Greenwich_Sidereal_Time_Array(times, cache=None):
+    # This function calculates the Greenwich Sidereal Time with the same formula as Local_Sidereal_Time_Calc()
+    # The value at 0h is only computed once per distinct day in times
+    # Inputs:
+    #       times - numpy datetime64 array of UTC times, or float array of Julian Dates
+    #       cache - Optional dictionary of Julian Date at 0h -> Greenwich Sidereal Time at 0h [deg], filled in as
+    #               new days are seen, so it can be passed to later calls to skip the calculation entirely
+    # Outputs:
+    #       GST - Greenwich Sidereal Time array in degrees, [0, 360)
+    
+    J2000 = 2451545.0     # The Julian Date of Jan 1 2000 at noon
+    juliancentury = 36525 # Sets the value of a Julian Century
+    
+    [_, UT, J0] = JulianDateCalc_Array(times)
+    [days, inverse] = np.unique(J0, return_inverse=True)
+    
+    thetaG0 = np.empty(len(days))
+    if cache is None:
+        todo = np.ones(len(days), dtype=bool)
+    else:
+        todo = np.array([d not in cache for d in days.tolist()], dtype=bool)
+        thetaG0[~todo] = [cache[d] for d in days[~todo].tolist()]
+    
+    T0 = (days[todo]-J2000)/juliancentury
+    thetaG0[todo] = np.mod(100.4606184 + 36000.77004*T0 + .000387933*((T0)**2) - (2.583*(10**-8))*((T0)**3), 360)
+    if cache is not None:
+        cache.update(zip(days[todo].tolist(), thetaG0[todo].tolist()))
+    
+    theta = thetaG0[inverse].reshape(UT.shape) + 360.98564724*(UT/24) # Greenwich Sidereal Time
+    
+    return np.mod(theta, 360)
+
+# Local Sidereal Time Function for arrays
+def Local_Sidereal_Time_Calc_Array(times, lam, direction, cache=None):
+    # Vectorized version of Local_Sidereal_Time_Calc()
+    # Inputs:
+    #       times - numpy datetime64 array of UTC times, or float array of Julian Dates
+    #       lam - lambda value (longitude [deg]), scalar or array broadcastable with times
+    #       direction - string value of either east or west for longitude direction
+    #       cache - Optional dictionary passed on to Greenwich_Sidereal_Time_Array()
+    # Outputs:
+    #       LST - Local Sidereal Time array in degrees, [0, 360)
+    
+    theta = Greenwich_Sidereal_Time_Array(times, cache)
+    
+    # Local Sidereal Time in degrees
+    if direction == 'east':
+        LST = theta + lam
+    else:
+        LST = theta + (360-np.asarray(lam))
+    
+    return np.mod(LST, 360)
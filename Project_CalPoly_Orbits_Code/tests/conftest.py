@@ -0,0 +1,5 @@
+# The modules of this project are scripts next to the tests folder, not an installed package
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,40 @@
+# Tests of the helpers of the benchmark and accuracy regression suite, Benchmark_Orbits_module
+import numpy as np
+import pytest
+
+import Orbits_module as orbits
+from Benchmark_Orbits_module import REGIMES, Check_Regressions, Reference_Propagation, Regime_States, Relative_Error
+
+
+@pytest.mark.parametrize('regime', list(REGIMES))
+def test_regime_states_have_the_regime_orbit(regime):
+    [rvects, vvects, dt] = Regime_States(regime, 20)
+    [rp, ecc, tf] = REGIMES[regime]
+    [h, e, _, _, _, _, _] = orbits.COEsFunction_Batch(rvects, vvects)
+    np.testing.assert_allclose(e, ecc, atol=1e-9)
+    np.testing.assert_allclose(h**2/398600/(1 + e), rp, rtol=1e-9)
+    assert dt == tf
+    # The first states are the same for every batch size, so they can share one reference
+    np.testing.assert_array_equal(Regime_States(regime, 5)[0], rvects[0:5])
+
+
+def test_reference_matches_universal_variable():
+    [rvects, vvects, dt] = Regime_States('HEO', 3)
+    [rref, vref] = Reference_Propagation(rvects, vvects, dt)
+    [r, v, _] = orbits.Universal_Variable_Prop_Batch(398600, rvects, vvects, dt)
+    assert Relative_Error(r, v, rref, vref) < 1e-9
+
+
+def test_regressions_are_reported():
+    results = [{'function': 'f', 'regime': 'LEO', 'N': 10, 'latency': 3.0, 'error': 1.0, 'error_limit': 0.1, 'accurate': False},
+               {'function': 'g', 'regime': 'LEO', 'N': 10, 'latency': 1.5},
+               {'function': 'import orbits', 'regime': 'import', 'N': 1, 'latency': 1.0, 'import_budget': 0.5,
+                'heavy_modules': ['scipy'], 'within_budget': False}]
+    baseline = {'results': [{'function': 'f', 'regime': 'LEO', 'N': 10, 'latency': 1.0},
+                            {'function': 'g', 'regime': 'LEO', 'N': 10, 'latency': 1.0}]}
+    failures = Check_Regressions(results, baseline, 2.0)
+    assert len(failures) == 3
+    assert any('above limit' in f for f in failures)
+    assert any(f.startswith('f LEO N=10: latency') for f in failures)
+    assert any('import orbits' in f for f in failures)
+    assert Check_Regressions(results[1:2], baseline, 2.0) == []
@@ -0,0 +1,53 @@
+# Tests of the conjunction screening of Conjunction_module
+import numpy as np
+
+import Orbits_module as orbits
+from Conjunction_module import Apsis_Filter, Apsis_Radii, Conjunction_Screening
+
+
+muearth = 398600 # km^3/s^2
+
+
+def _Catalog(tca=1234.0, miss=1.0):
+    # Objects 0 and 1 cross at time tca with a miss distance of miss km, objects 2 and 3 are far from everything
+    rc = np.array([7000.0, 0, 0])
+    vc = np.sqrt(muearth/7000)
+    v0 = vc*np.array([0, np.cos(0.3), np.sin(0.3)])
+    v1 = vc*np.array([0, np.cos(1.2), -np.sin(1.2)])
+    normal = np.cross(v0, v1)/np.linalg.norm(np.cross(v0, v1))   # Perpendicular to the relative velocity
+    rvects = np.array([rc, rc + miss*normal, [0, 0, 9000.0], [-30000.0, 0, 0]])
+    vvects = np.array([v0, v1, [np.sqrt(muearth/9000), 0, 0], [0, -np.sqrt(muearth/30000), 0]])
+    # Back to the epoch
+    [r, v, _] = orbits.Universal_Variable_Prop_Batch(muearth, rvects, vvects, -tca)
+    return [r, v]
+
+
+def test_finds_a_designed_close_approach():
+    [rvects, vvects] = _Catalog()
+    [i, j, tca, miss, relspeed] = Conjunction_Screening(rvects, vvects, 3000, 60, 5.0)
+    assert list(zip(i, j)) == [(0, 1)]
+    np.testing.assert_allclose(tca, 1234.0, atol=0.05)
+    np.testing.assert_allclose(miss, 1.0, atol=1e-2)
+    np.testing.assert_allclose(relspeed, 2*np.sqrt(muearth/7000)*np.sin(0.75), rtol=1e-3)
+
+
+def test_prefilter_does_not_change_the_result():
+    [rvects, vvects] = _Catalog(tca=500.0, miss=2.0)
+    filtered = Conjunction_Screening(rvects, vvects, 1200, 30, 5.0, chunksize=7)
+    unfiltered = Conjunction_Screening(rvects, vvects, 1200, 30, 5.0, prefilter=False)
+    for [a, b] in zip(filtered, unfiltered):
+        np.testing.assert_allclose(a, b)
+
+
+def test_miss_above_the_threshold_is_not_reported():
+    [rvects, vvects] = _Catalog(miss=8.0)
+    [i, _, _, _, _] = Conjunction_Screening(rvects, vvects, 3000, 60, 5.0)
+    assert len(i) == 0
+
+
+def test_apsis_filter_removes_separated_shells():
+    [rvects, vvects] = _Catalog()
+    [rp, ra] = Apsis_Radii(rvects, vvects)
+    np.testing.assert_allclose(rp[2:], [9000, 30000], rtol=1e-9)
+    keep = Apsis_Filter(np.array([0, 0, 2]), np.array([1, 3, 3]), rp, ra, 5.0)
+    np.testing.assert_array_equal(keep, [True, False, False])
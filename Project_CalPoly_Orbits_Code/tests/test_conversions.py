@@ -0,0 +1,57 @@
+# Tests of the R and V vector and COE conversions of orbits/conversions.py
+import numpy as np
+
+import Orbits_module as orbits
+
+
+muearth = 398600 # km^3/s^2
+
+
+def test_batch_coes_match_curtis_example_4_3():
+    [h, ecc, a, inc, RAAN, argumentofperigee, trueanomaly] = orbits.COEsFunction_Batch([[-6045.0, -3490, 2500]],
+                                                                                       [[-3.457, 6.618, 2.533]])
+    np.testing.assert_allclose(h, 58310, rtol=1e-4)
+    np.testing.assert_allclose(ecc, 0.1712, atol=1e-4)
+    np.testing.assert_allclose(a, 8788, rtol=1e-3)
+    np.testing.assert_allclose([inc[0], RAAN[0], argumentofperigee[0], trueanomaly[0]], [153.2, 255.3, 20.07, 28.45], atol=0.05)
+
+
+def test_batch_coes_match_scalar_function():
+    rng = np.random.default_rng(0)
+    rvects = rng.uniform(-20000, 20000, (50, 3))
+    vvects = rng.uniform(-6, 6, (50, 3))
+    batch = np.array(orbits.COEsFunction_Batch(rvects, vvects))
+    for i in range(50):
+        scalar = np.array(orbits.COEsFunction(rvects[i], vvects[i]), dtype=float)
+        np.testing.assert_allclose(batch[:,i], scalar, rtol=1e-9)
+
+
+def test_circular_and_equatorial_orbits_have_finite_angles():
+    # Circular equatorial, circular inclined and eccentric equatorial orbits, where the scalar function divides by zero
+    rvects = np.array([[7000.0, 0, 0], [0, 7000.0, 0], [7000.0, 0, 0]])
+    vc = np.sqrt(muearth/7000)
+    vvects = np.array([[0, vc, 0], [-vc*np.cos(0.5), 0, vc*np.sin(0.5)], [0, 1.2*vc, 0]])
+    [h, ecc, a, inc, RAAN, argumentofperigee, trueanomaly] = orbits.COEsFunction_Batch(rvects, vvects)
+    for angles in (RAAN, argumentofperigee, trueanomaly):
+        assert np.all(np.isfinite(angles))
+    # The angles still place the satellites where they are
+    [r, v] = orbits.COEs_to_RV_Batch(h, ecc, inc, RAAN, argumentofperigee, trueanomaly)
+    np.testing.assert_allclose(r, rvects, atol=1e-6)
+    np.testing.assert_allclose(v, vvects, atol=1e-9)
+
+
+def test_batch_rv_matches_curtis_example_4_7():
+    [r, v] = orbits.COEs_to_RV_Batch(80000, 1.4, 30, 40, 60, 30)
+    np.testing.assert_allclose(r[0], [-4040, 4815, 3629], atol=1)
+    np.testing.assert_allclose(v[0], [-10.39, -4.772, 1.744], atol=5e-3)
+
+
+def test_batch_rv_matches_scalar_function_exactly():
+    rng = np.random.default_rng(1)
+    coes = [rng.uniform(50000, 80000, 40), rng.uniform(0, 0.9, 40), rng.uniform(0, 180, 40),
+            rng.uniform(0, 360, 40), rng.uniform(0, 360, 40), rng.uniform(0, 360, 40)]
+    [r, v] = orbits.COEs_to_RV_Batch(*coes)
+    for i in range(40):
+        [ri, vi] = orbits.COEs_to_RV(*[c[i] for c in coes])
+        np.testing.assert_array_equal(r[i], np.ravel(ri))
+        np.testing.assert_array_equal(v[i], np.ravel(vi))
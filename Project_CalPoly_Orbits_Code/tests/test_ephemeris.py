@@ -0,0 +1,86 @@
+# Tests of the Chebyshev ephemeris writer and reader of Ephemeris_module
+import numpy as np
+import pytest
+
+import Orbits_module as orbits
+from Ephemeris_module import ChebyshevEphemeris, Write_Chebyshev_Ephemeris
+
+
+muearth = 398600 # km^3/s^2
+rvects = np.array([[7000.0, 0, 0], [0, 8000.0, 1000.0]])
+vvects = np.array([[0, 7.5, 1.0], [-6.5, 0, 2.0]])
+
+
+def _Write(filename, t, segment_length, degree, chunk=7):
+    # Writes the exact 2 body states of rvects and vvects at times t in chunks of a few samples
+    T = len(t)
+    [r, v, _] = orbits.Universal_Variable_Prop_Batch(muearth, np.repeat(rvects, T, axis=0), np.repeat(vvects, T, axis=0),
+                                                     np.tile(t, len(rvects)))
+    r = r.reshape(len(rvects), T, 3).swapaxes(0, 1)
+    v = v.reshape(len(rvects), T, 3).swapaxes(0, 1)
+    chunks = [[t[i:i+chunk], r[i:i+chunk], v[i:i+chunk]] for i in range(0, T, chunk)]
+    return Write_Chebyshev_Ephemeris(filename, chunks, segment_length, degree)
+
+
+@pytest.mark.parametrize('tf', [1230, 1200 + 30*12, 2400 + 60])
+def test_span_not_a_multiple_of_segment_length(tmp_path, tf):
+    # tf = 1230 leaves 2 samples after the first segment, fewer than degree+1, so they are merged into it
+    filename = str(tmp_path/'ephemeris.bin')
+    t = np.arange(0, tf + 1, 30.0)
+    [segments, pos_residual, _] = _Write(filename, t, 1200, 12)
+    assert pos_residual < 1e-6
+
+    ephemeris = ChebyshevEphemeris(filename)
+    try:
+        assert ephemeris.getTimeSpan() == [0, tf]
+        assert ephemeris.getObjectCount() == 2
+        tq = np.linspace(0, tf, 97)
+        [rcheck, vcheck, _] = orbits.Universal_Variable_Prop_Batch(muearth, np.tile(rvects[1], (len(tq), 1)),
+                                                                   np.tile(vvects[1], (len(tq), 1)), tq)
+        [r, v] = ephemeris.getState(1, tq)
+        np.testing.assert_allclose(r, rcheck, atol=1e-5)
+        np.testing.assert_allclose(v, vcheck, atol=1e-8)
+    finally:
+        ephemeris.close()
+    assert segments == len(range(0, tf, 1200)) - (1 if tf % 1200 < 12*30 else 0)
+
+
+def test_too_few_samples_in_a_full_segment(tmp_path):
+    t = np.arange(0, 2401, 200.0)
+    with pytest.raises(ValueError):
+        _Write(str(tmp_path/'ephemeris.bin'), t, 1200, 12)
+
+
+def test_queries_at_segment_boundaries_and_scalars(tmp_path):
+    filename = str(tmp_path/'ephemeris.bin')
+    t = np.arange(0, 3601, 30.0)
+    _Write(filename, t, 1200, 12)
+
+    ephemeris = ChebyshevEphemeris(filename)
+    try:
+        # Every object, with the segment boundaries and the ends of the span among the query times
+        tq = np.array([0, 1199.9, 1200, 1200.1, 2400, 3600])
+        for obj in range(2):
+            [rcheck, vcheck, _] = orbits.Universal_Variable_Prop_Batch(muearth, np.tile(rvects[obj], (len(tq), 1)),
+                                                                       np.tile(vvects[obj], (len(tq), 1)), tq)
+            [r, v] = ephemeris.getState(obj, tq)
+            np.testing.assert_allclose(r, rcheck, atol=1e-5)
+            np.testing.assert_allclose(v, vcheck, atol=1e-8)
+
+        [r, v] = ephemeris.getState(0, 1800.0)
+        assert r.shape == v.shape == (3,)
+        np.testing.assert_array_equal(r, ephemeris.getState(0, [1800.0])[0][0])
+
+        with pytest.raises(ValueError):
+            ephemeris.getState(0, 3600.5)
+        with pytest.raises(ValueError):
+            ephemeris.getState(0, [-1.0, 10.0])
+    finally:
+        ephemeris.close()
+
+
+def test_other_files_are_rejected(tmp_path):
+    filename = tmp_path/'not_an_ephemeris.bin'
+    filename.write_bytes(b'\0'*256)
+    with pytest.raises(ValueError):
+        ChebyshevEphemeris(str(filename))
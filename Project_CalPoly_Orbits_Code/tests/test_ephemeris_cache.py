@@ -0,0 +1,49 @@
+# Tests of the Hermite interpolating ephemeris cache of Ephemeris_module
+import numpy as np
+import pytest
+
+import Orbits_module as orbits
+from Ephemeris_module import EphemerisCache
+
+
+muearth = 398600 # km^3/s^2
+rvect = np.array([7000.0, 0, 0])
+vvect = np.array([0, 7.5, 1.0])
+
+
+def test_interpolated_states_match_propagation():
+    cache = EphemerisCache(pos_tol=1e-6, vel_tol=1e-9)
+    times = np.linspace(0, 6000, 97)
+    [r, v] = cache.getStates(rvect, vvect, 0.0, times)
+    for [i, t] in enumerate(times):
+        [rt, vt] = orbits.Universal_Variable_Prop(muearth, rvect, vvect, t)
+        np.testing.assert_allclose(r[i], rt, atol=1e-5)
+        np.testing.assert_allclose(v[i], vt, atol=1e-8)
+
+    # The same times again are answered by interpolation only
+    hits = cache.getHits()
+    cache.getStates(rvect, vvect, 0.0, times)
+    assert cache.getHits() == hits + len(times)
+
+
+def test_node_cap_applies_to_a_single_object():
+    cache = EphemerisCache(max_nodes=10)
+    for t in np.arange(0, 20000, 7.0):
+        [r, v] = cache.getState(rvect, vvect, 0.0, t)
+        assert cache.getNodeCount() <= 10
+    [rt, vt] = orbits.Universal_Variable_Prop(muearth, rvect, vvect, t)
+    np.testing.assert_allclose(r, rt, atol=1e-5)
+    np.testing.assert_allclose(v, vt, atol=1e-8)
+
+
+def test_node_cap_evicts_least_recently_used_objects():
+    cache = EphemerisCache(max_nodes=40)
+    other = vvect*1.01
+    cache.getStates(rvect, vvect, 0.0, np.arange(0, 600, 10.0))
+    cache.getStates(rvect, other, 0.0, np.arange(0, 600, 10.0))
+    assert cache.getNodeCount() <= 40
+
+
+def test_cap_must_hold_one_interval():
+    with pytest.raises(ValueError, match='max_nodes'):
+        EphemerisCache(max_nodes=2)
@@ -0,0 +1,83 @@
+# Tests of the Earth fixed frame and geodetic coordinate functions of orbits/frames.py
+import numpy as np
+
+import Orbits_module as orbits
+
+
+muearth = 398600 # km^3/s^2
+Re = 6378        # km
+f = 0.003353
+
+
+def _Geodetic_to_ECEF(lat, long, alt):
+    # Standard ellipsoid formulas, independent of the functions under test
+    [phi, lam, h] = [np.radians(lat), np.radians(long), np.asarray(alt)/1000]
+    e2 = 2*f - f**2
+    N = Re/np.sqrt(1 - e2*np.sin(phi)**2)
+    return np.stack([(N + h)*np.cos(phi)*np.cos(lam), (N + h)*np.cos(phi)*np.sin(lam),
+                     (N*(1 - e2) + h)*np.sin(phi)], axis=-1)
+
+
+def test_geodetic_inversion_of_known_points():
+    lat = np.array([0.0, 35.3, -60.0, 89.9, -89.99, 45.0])
+    long = np.array([0.0, -120.66, 150.0, 10.0, -179.5, 180.0])
+    alt = np.array([0.0, 100.0, 2000.0, 500.0, 0.0, 400000.0])
+    [latc, longc, altc] = orbits.ECEF_to_Geodetic_Array(_Geodetic_to_ECEF(lat, long, alt))
+    np.testing.assert_allclose(latc, lat, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(longc, long, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(altc, alt, rtol=0, atol=1e-6)
+
+
+def test_site_vectors_invert_to_their_station():
+    # R_site_calc_Array() places stations in ECI; rotating them to ECEF must give back the station coordinates
+    lat = np.array([40.0, -33.9, 64.8])
+    long = np.array([110.0, 18.4, 147.7])
+    alt = np.array([2000.0, 10.0, 150.0])
+    times = np.datetime64('2010-08-20T11:50:00') + np.arange(0, 86400, 3600).astype('timedelta64[s]')
+    Rsite = orbits.R_site_calc_Array(lat, long, 'east', alt, times)
+    [latc, longc, altc] = orbits.ECEF_to_Geodetic_Array(orbits.ECI_to_ECEF_Array(Rsite, times))
+    np.testing.assert_allclose(latc, np.broadcast_to(lat[:,None], latc.shape), rtol=0, atol=1e-9)
+    np.testing.assert_allclose(longc, np.broadcast_to(long[:,None], longc.shape), rtol=0, atol=1e-9)
+    np.testing.assert_allclose(altc, np.broadcast_to(alt[:,None], altc.shape), rtol=0, atol=1e-5)
+
+
+def test_ecef_rotation_preserves_length_and_z():
+    rng = np.random.default_rng(0)
+    r = rng.normal(size=(4, 5, 3))*7000
+    times = 2455000.5 + np.linspace(0, 1, 5)
+    recef = orbits.ECI_to_ECEF_Array(r, times)
+    np.testing.assert_allclose(np.linalg.norm(recef, axis=-1), np.linalg.norm(r, axis=-1))
+    np.testing.assert_array_equal(recef[...,2], r[...,2])
+
+
+def test_ground_track_shapes_and_values():
+    epoch = np.datetime64('2020-01-01T00:00:00')
+    R = Re + 500
+    V = np.sqrt(muearth/R)
+    inc = np.radians(51.6)
+    rvects = np.array([[R, 0, 0], [R, 0, 0]])
+    vvects = np.array([[0, V, 0], [0, V*np.cos(inc), V*np.sin(inc)]])
+    t = np.linspace(0, 2*np.pi*np.sqrt(R**3/muearth), 400)
+    [lat, long, alt] = orbits.Ground_Track(rvects, vvects, epoch, t)
+    assert lat.shape == long.shape == alt.shape == (2, 400)
+
+    # The equatorial orbit stays on the equator at 500 km, the inclined one peaks at the geodetic latitude of a
+    # point at 51.6 deg geocentric latitude, slightly poleward of the inclination
+    np.testing.assert_allclose(lat[0], 0, atol=1e-9)
+    np.testing.assert_allclose(alt[0], 500000, rtol=1e-9)
+    apex = orbits.ECEF_to_Geodetic_Array([R*np.cos(inc), 0, R*np.sin(inc)])[0]
+    assert 51.6 < apex < 51.8
+    assert abs(lat[1].max() - apex) < 1e-3 and abs(lat[1].min() + apex) < 1e-3
+    assert np.all((long > -180) & (long <= 180))
+
+    # Same result from propagating and converting by hand, and from a Julian Date epoch
+    times = epoch + np.round(t*1e6).astype('timedelta64[us]')
+    [r, _, _] = orbits.Universal_Variable_Prop_Batch(muearth, np.repeat(rvects, 400, axis=0),
+                                                     np.repeat(vvects, 400, axis=0), np.tile(t, 2))
+    ref = orbits.ECEF_to_Geodetic_Array(orbits.ECI_to_ECEF_Array(r.reshape(2, 400, 3), times))
+    for a, b in zip(ref, (lat, long, alt)):
+        np.testing.assert_allclose(b, a, rtol=0, atol=1e-9)
+
+    jd = orbits.JulianDateCalc_Array(np.atleast_1d(epoch))[0]
+    for a, b in zip(orbits.Ground_Track(rvects, vvects, jd, t), (lat, long, alt)):
+        np.testing.assert_allclose(a, b, rtol=0, atol=1e-5)
@@ -0,0 +1,63 @@
+# Tests of the batch Gauss initial orbit determination of orbits/iod.py
+import numpy as np
+
+import Orbits_module as orbits
+
+
+muearth = 398600 # km^3/s^2
+
+
+def _Triplets(K, spacing=60.0, seed=0):
+    # K triplets of exact angles of LEO to GEO orbits seen from one station, spacing seconds apart
+    u = np.random.default_rng(seed).uniform(size=(K, 5))
+    rp = 6778 + 30000*u[:,0]
+    ecc = 0.2*u[:,1]
+    [r2, v2] = orbits.COEs_to_RV_Batch(np.sqrt(muearth*rp*(1 + ecc)), ecc, 20 + 60*u[:,2], 360*u[:,3], 0, 360*u[:,4])
+    dts = np.array([-spacing, 0, spacing])
+    times = np.tile(dts, (K, 1))
+    utc = np.datetime64('2010-08-20T11:50:00') + np.round(dts).astype('timedelta64[s]')
+    Rsites = np.broadcast_to(orbits.R_site_calc_Array(40, 110, 'west', 2000, utc)[0], (K, 3, 3)).copy()
+
+    # Angles from the station to each satellite, also below the horizon since the method does not depend on it
+    [r, _, _] = orbits.Universal_Variable_Prop_Batch(muearth, np.repeat(r2, 3, axis=0), np.repeat(v2, 3, axis=0), times.ravel())
+    r = r.reshape(K, 3, 3)
+    rho = r - Rsites
+    RA = np.degrees(np.arctan2(rho[:,:,1], rho[:,:,0]))
+    DEC = np.degrees(np.arcsin(rho[:,:,2]/np.linalg.norm(rho, axis=2)))
+    return [RA, DEC, times, Rsites, r2, v2]
+
+
+def test_recovers_the_middle_state():
+    [RA, DEC, times, Rsites, r2, v2] = _Triplets(50)
+    [rvect2, vvect2, coes, status, roots] = orbits.Gauss_IOD_Batch(RA, DEC, times, Rsites)
+    ok = status <= orbits.GAUSS_AMBIGUOUS
+    assert ok.mean() > 0.9
+    assert roots.shape == (50, 8)
+    np.testing.assert_allclose(np.linalg.norm(rvect2[ok] - r2[ok], axis=1)/np.linalg.norm(r2[ok], axis=1), 0, atol=1e-3)
+    np.testing.assert_allclose(np.linalg.norm(vvect2[ok] - v2[ok], axis=1)/np.linalg.norm(v2[ok], axis=1), 0, atol=1e-2)
+    np.testing.assert_allclose(coes[3][ok], orbits.COEsFunction_Batch(r2, v2)[3][ok], atol=0.5)
+
+
+def test_coplanar_lines_of_sight_are_singular():
+    [RA, DEC, times, Rsites, _, _] = _Triplets(2)
+    RA[0] = RA[0,1]
+    DEC[0] = DEC[0,1]
+    [rvect2, vvect2, _, status, _] = orbits.Gauss_IOD_Batch(RA, DEC, times, Rsites)
+    assert status[0] == orbits.GAUSS_SINGULAR
+    assert np.isnan(rvect2[0]).all() and np.isnan(vvect2[0]).all()
+    assert status[1] != orbits.GAUSS_SINGULAR
+
+
+def test_workers_and_chunks_give_the_same_results():
+    [RA, DEC, times, Rsites, _, _] = _Triplets(30, seed=1)
+    single = orbits.Gauss_IOD_Batch(RA, DEC, times, Rsites)
+    pooled = orbits.Gauss_IOD_Batch(RA, DEC, times, Rsites, workers=2, chunksize=7)
+    np.testing.assert_array_equal(single[0], pooled[0])
+    np.testing.assert_array_equal(single[3], pooled[3])
+
+
+def test_polynomial_roots_match_numpy():
+    coeffs = np.random.default_rng(2).normal(size=(20, 9))
+    roots = orbits.Polynomial_Roots_Batch(coeffs)
+    for i in range(20):
+        np.testing.assert_allclose(np.sort_complex(roots[i]), np.sort_complex(np.roots(coeffs[i])), rtol=1e-8, atol=1e-10)
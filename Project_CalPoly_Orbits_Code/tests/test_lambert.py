@@ -0,0 +1,89 @@
+# Tests of the batch Lambert solver and porkchop grids of orbits/lambert.py
+import numpy as np
+import pytest
+
+import Orbits_module as orbits
+
+
+muearth = 398600 # km^3/s^2
+
+
+def test_lambert_matches_curtis_example_5_2():
+    r1 = np.array([[5000.0, 10000, 2100]])
+    r2 = np.array([[-14600.0, 2500, 7000]])
+    [v1, v2, converged] = orbits.Lambert_Batch(r1, r2, 3600)
+    assert converged.all()
+    np.testing.assert_allclose(v1[0], [-5.9925, 1.9254, 3.2456], atol=1e-3)
+    np.testing.assert_allclose(v2[0], [-3.3125, -4.1966, -0.38529], atol=1e-3)
+
+
+def test_lambert_transfers_reach_the_final_position():
+    # Propagating each solved departure state over the time of flight must arrive at r2 with v2
+    rng = np.random.default_rng(1)
+    r1s = rng.normal(size=(50, 3))*8000
+    r2s = rng.normal(size=(50, 3))*12000
+    tofs = rng.uniform(1800, 20000, 50)
+    [v1s, v2s, converged] = orbits.Lambert_Batch(r1s, r2s, tofs)
+    assert converged.all()
+    [r, v, ok] = orbits.Universal_Variable_Prop_Batch(muearth, r1s, v1s, tofs)
+    assert ok.all()
+    np.testing.assert_allclose(r, r2s, rtol=0, atol=1e-4)
+    np.testing.assert_allclose(v, v2s, rtol=0, atol=1e-7)
+
+
+def test_multi_revolution_branches_reach_the_final_position():
+    r1s = np.array([[7000.0, 0, 0]])
+    r2s = np.array([[0.0, 9000, 0]])
+    tof = 30000
+    for branch in ('left', 'right'):
+        [v1s, _, converged] = orbits.Lambert_Batch(r1s, r2s, tof, nrev=1, branch=branch)
+        assert converged.all()
+        [r, _, _] = orbits.Universal_Variable_Prop_Batch(muearth, r1s, v1s, tof)
+        np.testing.assert_allclose(r, r2s, rtol=0, atol=1e-3)
+
+
+def test_unreachable_transfers_are_flagged():
+    # A one revolution transfer shorter than the minimum time of flight has no solution
+    [v1s, v2s, converged] = orbits.Lambert_Batch([[7000.0, 0, 0]], [[0.0, 7000, 0]], 600, nrev=1)
+    assert not converged.any()
+    assert np.isnan(v1s).all() and np.isnan(v2s).all()
+
+
+def test_unknown_branch_raises():
+    with pytest.raises(ValueError):
+        orbits.Lambert_Batch([[7000.0, 0, 0]], [[0.0, 7000, 0]], 3600, branch='middle')
+
+
+def test_porkchop_grid_matches_lambert_batch():
+    rdep = np.array([6678.0, 0, 0])
+    vdep = np.array([0, np.sqrt(muearth/6678), 0])
+    rarr = np.array([42164.0, 0, 0])
+    varr = np.array([0, np.sqrt(muearth/42164), 0])
+    tdep = np.array([0.0, 1800, 3600])
+    tof = np.array([15000.0, 19000])
+    [dv1, dv2, C3, v1s, v2s] = orbits.Porkchop_Grid(rdep, vdep, rarr, varr, tdep, tof)
+    assert dv1.shape == dv2.shape == C3.shape == (3, 2)
+    assert v1s.shape == v2s.shape == (3, 2, 3)
+    np.testing.assert_allclose(C3, dv1**2)
+
+    # Element (1, 0) solved directly from the propagated body states
+    [r1, vb1, _] = orbits.Universal_Variable_Prop_Batch(muearth, rdep[None], vdep[None], tdep[1])
+    [r2, vb2, _] = orbits.Universal_Variable_Prop_Batch(muearth, rarr[None], varr[None], tdep[1] + tof[0])
+    [v1, v2, converged] = orbits.Lambert_Batch(r1, r2, tof[0])
+    assert converged.all()
+    np.testing.assert_allclose(v1s[1, 0], v1[0])
+    np.testing.assert_allclose(dv1[1, 0], np.linalg.norm(v1[0] - vb1[0]))
+    np.testing.assert_allclose(dv2[1, 0], np.linalg.norm(vb2[0] - v2[0]))
+
+
+def test_porkchop_grid_chunks_and_workers_agree():
+    rdep = np.array([6678.0, 0, 0])
+    vdep = np.array([0, np.sqrt(muearth/6678), 0])
+    rarr = np.array([0.0, 20000, 0])
+    varr = np.array([-np.sqrt(muearth/20000), 0, 0])
+    tdep = np.linspace(0, 7200, 4)
+    tof = np.linspace(5000, 12000, 5)
+    ref = orbits.Porkchop_Grid(rdep, vdep, rarr, varr, tdep, tof)
+    out = orbits.Porkchop_Grid(rdep, vdep, rarr, varr, tdep, tof, workers=2, chunksize=7)
+    for a, b in zip(ref, out):
+        np.testing.assert_array_equal(a, b)
@@ -0,0 +1,80 @@
+# Tests of the batch least squares orbit determination of orbits/iod.py
+import numpy as np
+import pytest
+
+import Orbits_module as orbits
+
+
+muearth = 398600 # km^3/s^2
+rvect = np.array([6000.0, 5500.0, 6500.0])
+vvect = np.array([-4.3, 4.6, 1.5])
+
+
+def _Observations(times):
+    Rsites = orbits.R_site_calc_Array(40, 110, 'west', 2000, np.datetime64('2010-08-20T11:50:00') +
+                                      times.astype('timedelta64[s]'))[0]
+    [r, _, _] = orbits.Universal_Variable_Prop_Batch(muearth, np.tile(rvect, (len(times), 1)), np.tile(vvect, (len(times), 1)), times)
+    rho = r - Rsites
+    RA = np.degrees(np.arctan2(rho[:,1], rho[:,0]))
+    DEC = np.degrees(np.arcsin(rho[:,2]/np.linalg.norm(rho, axis=1)))
+    return [times, RA, DEC, Rsites]
+
+
+def test_recovers_state_from_streamed_chunks():
+    [times, RA, DEC, Rsites] = _Observations(np.arange(-1200, 601, 10.0))
+
+    def chunks():
+        for i in range(0, len(times), 50):
+            yield [times[i:i+50], RA[i:i+50], DEC[i:i+50], Rsites[i:i+50]]
+
+    [r, v, P, rms, _, converged] = orbits.Batch_Least_Squares_OD(rvect + [20, -10, 5], vvect + [0.01, 0, -0.01], chunks)
+    assert converged
+    assert rms < 1e-6
+    np.testing.assert_allclose(r, rvect, atol=1e-4)
+    np.testing.assert_allclose(v, vvect, atol=1e-7)
+    assert np.all(np.linalg.eigvalsh(P) > 0)
+
+
+def test_no_observations_raises():
+    empty = [np.empty(0), np.empty(0), np.empty(0), np.empty((0, 3))]
+    with pytest.raises(ValueError, match='No observations'):
+        orbits.Batch_Least_Squares_OD(rvect, vvect, empty)
+    with pytest.raises(ValueError, match='No observations'):
+        orbits.Batch_Least_Squares_OD(rvect, vvect, lambda: [])
+
+
+def test_too_few_observations_raises():
+    [times, RA, DEC, Rsites] = _Observations(np.array([0, 60.0]))
+    with pytest.raises(ValueError, match='at least 3'):
+        orbits.Batch_Least_Squares_OD(rvect, vvect, [times, RA, DEC, Rsites])
+
+
+def test_singular_normal_matrix_raises():
+    # The same observation repeated gives 2 independent equations however many times it is used
+    [times, RA, DEC, Rsites] = _Observations(np.zeros(5))
+    with pytest.raises(ValueError, match='rank'):
+        orbits.Batch_Least_Squares_OD(rvect, vvect, [times, RA, DEC, Rsites])
+
+
+def test_per_observation_sigmas_weight_the_fit():
+    # A bias on the last third of the pass pulls an equally weighted fit off the true state, while down weighting
+    # those observations with their own sigmas recovers it
+    [times, RA, DEC, Rsites] = _Observations(np.arange(-1200, 601, 10.0))
+    biased = times > 0
+    RA = RA + np.where(biased, 20/3600, 0)
+    sigmas = np.where(biased, 1000/3600, 1/3600)
+
+    [r_equal, v_equal, P_equal, _, _, _] = orbits.Batch_Least_Squares_OD(rvect, vvect, [times, RA, DEC, Rsites])
+    [r_weighted, v_weighted, P_weighted, _, _, converged] = orbits.Batch_Least_Squares_OD(rvect, vvect, [times, RA, DEC, Rsites], sigma=sigmas)
+    assert converged
+    assert np.linalg.norm(r_weighted - rvect) < 0.1*np.linalg.norm(r_equal - rvect)
+    assert np.trace(P_weighted) > np.trace(P_equal)
+
+    # The same sigmas streamed as a fifth array of each chunk give the same solution
+    def chunks():
+        for i in range(0, len(times), 50):
+            yield [times[i:i+50], RA[i:i+50], DEC[i:i+50], Rsites[i:i+50], sigmas[i:i+50]]
+
+    [r_streamed, v_streamed, _, _, _, _] = orbits.Batch_Least_Squares_OD(rvect, vvect, chunks)
+    np.testing.assert_allclose(r_streamed, r_weighted, atol=1e-8)
+    np.testing.assert_allclose(v_streamed, v_weighted, atol=1e-11)
@@ -0,0 +1,51 @@
+# Tests of the Monte Carlo dispersion driver of MonteCarlo_module
+import numpy as np
+import pytest
+
+from MonteCarlo_module import Monte_Carlo_Chunk, Monte_Carlo_Dispersion, Merge_Chunk_Statistics
+
+
+rvect = [20000, -105000, -19000]  # (km)
+vvect = [.9000, -3.4000, -1.5000] # (km/s)
+covariance = np.diag([1, 1, 1, 1e-6, 1e-6, 1e-6])
+times = np.array([0, 3600, 7200.0])
+
+
+def test_initial_statistics_match_the_covariance():
+    [mean, cov, envelopes] = Monte_Carlo_Dispersion(rvect, vvect, covariance, 20000, times, workers=1)
+    np.testing.assert_allclose(mean[0], np.concatenate((rvect, vvect)), atol=0.05)
+    np.testing.assert_allclose(cov[0], covariance, atol=0.05)
+    # 2.5% and 97.5% of a normal distribution are 1.96 standard deviations from the mean
+    np.testing.assert_allclose(envelopes[[0, 2],0,0] - rvect[0], [-1.96, 1.96], atol=0.1)
+    assert np.all(np.diag(cov[2])[0:3] > np.diag(cov[0])[0:3])
+
+
+def test_merged_chunks_match_one_chunk():
+    state = np.concatenate((rvect, vvect))
+    L = np.sqrt(covariance)
+    seed = np.random.SeedSequence(5)
+    whole = Monte_Carlo_Chunk(seed, 3000, state, L, times, 'uv')
+
+    # The same 3000 samples split into three chunks: draw them once and merge chunk statistics of slices
+    samples = state + np.random.default_rng(seed).standard_normal((3000, 6)) @ L.T
+    chunks = []
+    for i in range(0, 3000, 1000):
+        chunk = samples[i:i+1000]
+        mean = chunk.mean(axis=0)
+        M2 = (chunk - mean).T @ (chunk - mean)
+        chunks.append([1000, mean[None,:], M2[None,:,:], np.percentile(chunk, np.linspace(0, 100, 201), axis=0)[:,None,:]])
+    [mean, cov, _] = Merge_Chunk_Statistics(chunks, np.array([50.0]))
+    np.testing.assert_allclose(mean[0], whole[1][0], rtol=1e-12)
+    np.testing.assert_allclose(cov[0], whole[2][0]/2999, rtol=1e-9, atol=1e-15)
+
+
+def test_results_do_not_depend_on_workers():
+    single = Monte_Carlo_Dispersion(rvect, vvect, covariance, 2500, times, workers=1, chunksize=1000)
+    pooled = Monte_Carlo_Dispersion(rvect, vvect, covariance, 2500, times, workers=2, chunksize=1000)
+    for [a, b] in zip(single, pooled):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_unknown_method_raises():
+    with pytest.raises(ValueError, match='method'):
+        Monte_Carlo_Dispersion(rvect, vvect, covariance, 10, times, workers=1, method='rk4')
@@ -0,0 +1,84 @@
+# Tests of the streaming Gauss IOD pipeline of Observation_Stream_module
+import numpy as np
+
+import Orbits_module as orbits
+from Observation_Stream_module import (_OBS_DTYPE, Observation_Site_Vectors, Read_IOD_Results, Stream_Gauss_IOD,
+                                       Write_Observation_File)
+
+
+def _Continuous_Observations(N=3, hours=6, dt=10.0):
+    # N objects tracked from one station every dt seconds without any gaps, in time order
+    muearth = 398600 # km^3/s^2
+    [rvects, vvects] = orbits.COEs_to_RV_Batch(np.sqrt(muearth*42164)*np.ones(N), np.zeros(N), [0.1, 5, 10][:N],
+                                               [0, 30, 60][:N], np.zeros(N), [250, 255, 260][:N])
+    t = np.arange(0, hours*3600, dt)
+    sat = np.tile(np.arange(N), len(t))
+    t = np.repeat(t, N)
+    obs = np.empty(len(t), dtype=_OBS_DTYPE)
+    obs['object'] = sat
+    obs['jd'] = 2455428.5 + t/86400
+    obs['lat'] = 35.3
+    obs['lon'] = 239.3
+    obs['alt'] = 100
+    [r, _, _] = orbits.Universal_Variable_Prop_Batch(muearth, rvects[sat], vvects[sat], t)
+    rho = r - Observation_Site_Vectors(obs)
+    obs['ra'] = np.degrees(np.arctan2(rho[:,1], rho[:,0]))
+    obs['dec'] = np.degrees(np.arcsin(rho[:,2]/np.linalg.norm(rho, axis=1)))
+    return obs
+
+
+def test_pending_stays_bounded_without_gaps(tmp_path):
+    obs = _Continuous_Observations()
+    infile = str(tmp_path/'observations.bin')
+    Write_Observation_File(infile, [obs])
+
+    [count, triplets, _, _, max_pending] = Stream_Gauss_IOD(infile, str(tmp_path/'chunked.iod'), chunksize=500, spacing=60.0)
+    assert count == len(obs)
+    # Each open tracklet only keeps the observations since the start of its next triplet, 2*spacing/dt + 1 of them
+    # plus what arrived in the last chunk
+    assert max_pending <= 3*(2*60/10 + 1) + 500
+
+    # Whole file in one chunk gives the same triplets
+    [_, triplets_whole, _, _, _] = Stream_Gauss_IOD(infile, str(tmp_path/'whole.iod'), chunksize=len(obs), spacing=60.0)
+    assert triplets == triplets_whole == 3*((len(obs)//3 - 1)//12)
+    chunked = Read_IOD_Results(str(tmp_path/'chunked.iod'))
+    whole = Read_IOD_Results(str(tmp_path/'whole.iod'))
+    order_chunked = np.lexsort((chunked['jd'], chunked['object']))
+    order_whole = np.lexsort((whole['jd'], whole['object']))
+    for name in ['object', 'jd', 'rx', 'status']:
+        np.testing.assert_array_equal(chunked[name][order_chunked], whole[name][order_whole])
+
+
+def test_csv_and_binary_give_the_same_triplets(tmp_path):
+    obs = _Continuous_Observations(hours=1)
+    counts = []
+    for name in ['observations.csv', 'observations.bin']:
+        infile = str(tmp_path/name)
+        Write_Observation_File(infile, [obs[i:i+100] for i in range(0, len(obs), 100)])
+        counts.append(Stream_Gauss_IOD(infile, infile + '.iod', chunksize=77)[0:2])
+    assert counts[0] == counts[1] == [len(obs), counts[0][1]]
+
+
+def test_streamed_iod_recovers_the_true_orbits(tmp_path):
+    # Noise free observations of 3 GEO objects, the Gauss estimates must land on the propagated truth
+    muearth = 398600 # km^3/s^2
+    obs = _Continuous_Observations(hours=1)
+    infile = str(tmp_path/'observations.bin')
+    Write_Observation_File(infile, [obs])
+    [count, triplets, _, _, _] = Stream_Gauss_IOD(infile, str(tmp_path/'results.iod'), chunksize=100, spacing=300.0)
+    assert count == len(obs) and triplets > 0
+
+    results = Read_IOD_Results(str(tmp_path/'results.iod'))
+    assert np.all(results['status'] == orbits.GAUSS_OK)
+    [rvects, vvects] = orbits.COEs_to_RV_Batch(np.sqrt(muearth*42164)*np.ones(3), np.zeros(3), [0.1, 5, 10], [0, 30, 60],
+                                               np.zeros(3), [250, 255, 260])
+    t = (results['jd'] - 2455428.5)*86400
+    [r, v, _] = orbits.Universal_Variable_Prop_Batch(muearth, rvects[results['object']], vvects[results['object']], t)
+    np.testing.assert_allclose(np.stack([results['rx'], results['ry'], results['rz']], axis=1), r, rtol=0, atol=10)
+    np.testing.assert_allclose(np.stack([results['vx'], results['vy'], results['vz']], axis=1), v, rtol=0, atol=1e-3)
+    np.testing.assert_allclose(results['inc'], np.array([0.1, 5, 10])[results['object']], rtol=0, atol=0.01)
+
+    # Reading a subset of the columns gives the same values
+    subset = Read_IOD_Results(str(tmp_path/'results.iod'), columns=['object', 'rx'])
+    assert sorted(subset) == ['object', 'rx']
+    np.testing.assert_array_equal(subset['rx'], results['rx'])
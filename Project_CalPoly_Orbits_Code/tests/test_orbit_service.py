@@ -0,0 +1,107 @@
+# Tests of the request parsing and batching of Orbit_Service_module with scalar and array inputs mixed
+import asyncio
+import json
+
+import numpy as np
+
+import Orbits_module as orbits
+from Orbit_Service_module import OrbitService, Service_Request
+
+
+def _Run(requests):
+    # Sends (method, target, body) requests to a fresh service concurrently and returns their [status, response]
+    async def run():
+        service = OrbitService()
+        await service.start(port=0)
+        try:
+            return await asyncio.gather(*[service._Dispatch(m, t, json.dumps(b).encode()) for [m, t, b] in requests])
+        finally:
+            await service.close()
+    return asyncio.run(run())
+
+
+COES = {'h': [60000, 55000, 70000], 'ecc': [0.1, 0.2, 0.3], 'inc': [30, 40, 50], 'RAAN': [40, 50, 60],
+        'argumentofperigee': [60, 70, 80], 'trueanomaly': [0, 90, 180]}
+
+
+def test_convert_scalar_trueanomaly_with_array_coes():
+    body = dict(COES, trueanomaly=45)
+    [[status, response]] = _Run([('POST', '/convert', body)])
+    assert status == 200
+    assert len(response['r']) == 3
+    [r, v] = orbits.COEs_to_RV_Batch(COES['h'], COES['ecc'], COES['inc'], COES['RAAN'], COES['argumentofperigee'], [45]*3)
+    np.testing.assert_allclose(response['r'], r)
+    np.testing.assert_allclose(response['v'], v)
+
+
+def test_convert_scalar_h_with_array_coes():
+    body = dict(COES, h=60000)
+    [[status, response]] = _Run([('POST', '/convert', body)])
+    assert status == 200
+    assert len(response['r']) == 3
+
+
+def test_convert_all_scalar_is_unwrapped():
+    body = {name: value[0] for [name, value] in COES.items()}
+    [[status, response]] = _Run([('POST', '/convert', body)])
+    assert status == 200
+    assert np.shape(response['r']) == (3,)
+
+
+def test_convert_mismatched_lengths_is_400():
+    body = dict(COES, ecc=[0.1, 0.2])
+    [[status, response]] = _Run([('POST', '/convert', body)])
+    assert status == 400
+    assert 'ecc has 2' in response['error']
+
+
+def test_propagate_single_state_with_array_dt():
+    r = [7000.0, 0, 0]
+    v = [0, 7.5, 1.0]
+    dts = [0, 600, 1200, 1800]
+    [[status, response]] = _Run([('POST', '/propagate', {'r': r, 'v': v, 'dt': dts})])
+    assert status == 200
+    assert len(response['r']) == 4
+    for [rnew, dt] in zip(response['r'], dts):
+        [rcheck, _] = orbits.Universal_Variable_Prop(398600, np.array(r), np.array(v), dt)
+        np.testing.assert_allclose(rnew, rcheck, rtol=1e-9)
+
+
+def test_propagate_bad_shapes_are_clean_400():
+    replies = _Run([('POST', '/propagate', {'r': [7000, 0], 'v': [0, 7.5, 0], 'dt': 60}),
+                    ('POST', '/propagate', {'r': [[7000, 0, 0]]*3, 'v': [[0, 7.5, 0]]*2, 'dt': 60}),
+                    ('POST', '/propagate', {'r': [7000, 0, 0], 'v': [0, 7.5, 0]})])
+    assert [status for [status, _] in replies] == [400, 400, 400]
+    assert 'r must be a (3) array' in replies[0][1]['error']
+    assert 'v has 2' in replies[1][1]['error']
+    assert replies[2][1]['error'] == 'missing dt'
+
+
+def test_mixed_requests_in_one_batch():
+    # Single and array requests coalesced into one batch still get their own rows back
+    r = [7000.0, 0, 0]
+    v = [0, 7.5, 1.0]
+    replies = _Run([('POST', '/propagate', {'r': r, 'v': v, 'dt': 600}),
+                    ('POST', '/propagate', {'r': [r, r], 'v': v, 'dt': [600, 1200]}),
+                    ('POST', '/propagate', {'r': r, 'v': v, 'dt': [1200]})])
+    assert [status for [status, _] in replies] == [200, 200, 200]
+    assert np.shape(replies[0][1]['r']) == (3,)
+    assert np.shape(replies[1][1]['r']) == (2, 3)
+    assert np.shape(replies[2][1]['r']) == (1, 3)
+    np.testing.assert_allclose(replies[0][1]['r'], replies[1][1]['r'][0])
+    np.testing.assert_allclose(replies[2][1]['r'][0], replies[1][1]['r'][1])
+
+
+def test_http_round_trip():
+    async def run():
+        service = OrbitService()
+        await service.start(port=0)
+        [_, port] = service.getAddress()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, Service_Request, '/convert', dict(COES, inc=30), '127.0.0.1', port)
+        finally:
+            await service.close()
+    [status, response] = asyncio.run(run())
+    assert status == 200
+    assert len(response['v']) == 3
@@ -0,0 +1,39 @@
+# Tests of the lazily loaded orbits package and the Orbits_module re-exports
+import os
+import subprocess
+import sys
+
+import pytest
+
+import orbits
+import Orbits_module
+
+
+def _Run(code):
+    # Runs code in a fresh interpreter in the project folder and returns its printed lines
+    folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.run([sys.executable, '-c', code], cwd=folder, capture_output=True, text=True,
+                          check=True).stdout.split()
+
+
+def test_submodules_load_on_first_use():
+    out = _Run("import sys, orbits; print('orbits.propagation' in sys.modules); orbits.StumC(0.5); "
+               "print('orbits.propagation' in sys.modules); print('orbits.lambert' in sys.modules)")
+    assert out == ['False', 'True', 'False']
+
+
+def test_scipy_is_only_imported_by_ode_propagation():
+    out = _Run("import sys, Orbits_module as orbits; print('scipy' in sys.modules); "
+               "orbits.Universal_Variable_Prop_Batch(398600, [[7000.0, 0, 0]], [[0, 7.5, 0]], 600); print('scipy' in sys.modules); "
+               "orbits.ODE_two_body_motion_multi([[7000.0, 0, 0]], [[0, 7.5, 0]], 600, 2); print('scipy' in sys.modules)")
+    assert out == ['False', 'False', 'True']
+
+
+def test_module_and_package_give_the_same_functions():
+    for name in ('COEsFunction_Batch', 'Universal_Variable_Prop_Batch', 'Gauss_IOD_Batch', 'Lambert_Batch', 'Ground_Track'):
+        assert getattr(orbits, name) is getattr(Orbits_module, name)
+
+
+def test_unknown_name_raises_attribute_error():
+    with pytest.raises(AttributeError, match='no attribute'):
+        orbits.Not_A_Function
@@ -0,0 +1,47 @@
+# Tests of the ground station pass predictor of Pass_Prediction_module
+import numpy as np
+
+import Orbits_module as orbits
+from Pass_Prediction_module import Pass_Prediction, Topocentric_Elevation
+
+
+muearth = 398600 # km^3/s^2
+epoch = np.datetime64('2010-08-20T00:00:00')
+lat = np.array([35.3, 78.2])
+long = np.array([120.7, 15.4])
+direction = ['west', 'east']
+alt = np.array([100, 500.0])
+r = 6378 + 700.0
+[rvects, vvects] = orbits.COEs_to_RV_Batch(np.sqrt(muearth*r)*np.ones(3), [0, 0, 0.01], [98, 51.6, 70], [40, 200, 10],
+                                           [0, 0, 30], [0, 90, 180])
+
+
+def test_elevation_rate_matches_finite_difference():
+    [Rxy, Rz, lam] = orbits.Site_Constants(lat, long, direction, alt)
+    [s, n, t] = np.meshgrid(np.arange(2), np.arange(3), np.linspace(0, 86400, 50), indexing='ij')
+    [_, rate] = Topocentric_Elevation(rvects, vvects, n, Rxy, Rz, lam, lat, s, epoch, t)
+    [elp, _] = Topocentric_Elevation(rvects, vvects, n, Rxy, Rz, lam, lat, s, epoch, t + 0.1)
+    [elm, _] = Topocentric_Elevation(rvects, vvects, n, Rxy, Rz, lam, lat, s, epoch, t - 0.1)
+    np.testing.assert_allclose(rate, (elp - elm)/0.2, atol=1e-6)
+
+
+def test_passes_cross_the_minimum_elevation():
+    [station, sat, AOS, TCA, LOS, max_el] = Pass_Prediction(rvects, vvects, lat, long, direction, alt, epoch, 86400)
+    assert len(station) > 10
+    assert np.all(np.diff(AOS) >= 0)
+    assert np.all((AOS <= TCA) & (TCA <= LOS))
+    [Rxy, Rz, lam] = orbits.Site_Constants(lat, long, direction, alt)
+    [el_aos, rate_aos] = Topocentric_Elevation(rvects, vvects, sat, Rxy, Rz, lam, lat, station, epoch, AOS)
+    [el_tca, rate_tca] = Topocentric_Elevation(rvects, vvects, sat, Rxy, Rz, lam, lat, station, epoch, TCA)
+    inside = (AOS > 0) & (LOS < 86400)
+    np.testing.assert_allclose(el_aos[AOS > 0], 10.0, atol=1e-3)
+    assert np.all(rate_aos[AOS > 0] > 0)
+    np.testing.assert_allclose(el_tca, max_el)
+    np.testing.assert_allclose(rate_tca[inside], 0, atol=1e-4)
+
+
+def test_satellite_chunks_give_the_same_passes():
+    whole = Pass_Prediction(rvects, vvects, lat, long, direction, alt, epoch, 86400)
+    chunked = Pass_Prediction(rvects, vvects, lat, long, direction, alt, epoch, 86400, chunksize=1)
+    for [a, b] in zip(whole, chunked):
+        np.testing.assert_allclose(a, b)
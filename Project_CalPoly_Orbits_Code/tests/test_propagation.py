@@ -0,0 +1,200 @@
+# Tests of the propagation functions of orbits/propagation.py
+import numpy as np
+import pytest
+
+import Orbits_module as orbits
+
+
+muearth = 398600 # km^3/s^2
+
+
+def _States(N, seed=0):
+    # N elliptic and hyperbolic states with random orientation and true anomaly
+    u = np.random.default_rng(seed).uniform(size=(N, 6))
+    rp = 6678 + 30000*u[:,0]
+    ecc = np.where(u[:,1] < 0.8, 0.9*u[:,1], 1.1 + u[:,1])
+    trueanomaly = np.where(ecc < 1, 360*u[:,5], 100*u[:,5] - 50)
+    return orbits.COEs_to_RV_Batch(np.sqrt(muearth*rp*(1 + ecc)), ecc, 180*u[:,2], 360*u[:,3], 360*u[:,4], trueanomaly)
+
+
+def test_batch_matches_curtis_example_3_7():
+    rvects = np.array([[7000.0, -12124, 0]])
+    vvects = np.array([[2.6679, 4.6210, 0]])
+    [r, v, converged] = orbits.Universal_Variable_Prop_Batch(muearth, rvects, vvects, 3600)
+    assert converged.all()
+    np.testing.assert_allclose(r[0], [-3297.8, 7413.4, 0], atol=0.5)
+    np.testing.assert_allclose(v[0], [-8.2977, -0.96309, 0], atol=1e-3)
+
+
+def test_batch_matches_scalar_propagation():
+    [rvects, vvects] = _States(200)
+    dts = np.linspace(-20000, 20000, 200)
+    [r, v, converged] = orbits.Universal_Variable_Prop_Batch(muearth, rvects, vvects, dts)
+    assert converged.all()
+    for i in range(0, 200, 7):
+        [ri, vi] = orbits.Universal_Variable_Prop(muearth, rvects[i], vvects[i], dts[i])
+        np.testing.assert_allclose(r[i], ri, rtol=1e-9, atol=1e-6)
+        np.testing.assert_allclose(v[i], vi, rtol=1e-9, atol=1e-9)
+
+
+def test_batch_conserves_energy_and_angular_momentum():
+    [rvects, vvects] = _States(500, seed=1)
+    [r, v, _] = orbits.Universal_Variable_Prop_Batch(muearth, rvects, vvects, 5000.0)
+    energy = lambda r, v: np.sum(v**2, axis=1)/2 - muearth/np.linalg.norm(r, axis=1)
+    np.testing.assert_allclose(energy(r, v), energy(rvects, vvects), rtol=1e-9)
+    np.testing.assert_allclose(np.cross(r, v), np.cross(rvects, vvects), rtol=1e-9, atol=1e-3)
+
+
+def test_ode_multi_matches_universal_variable():
+    [rvects, vvects] = _States(20, seed=2)
+    [propstate, dense] = orbits.ODE_two_body_motion_multi(rvects, vvects, 3000, 4)
+    assert propstate.shape == (4, 20, 6)
+    np.testing.assert_array_equal(propstate[0,:,0:3], rvects)
+    for [i, t] in enumerate([1000, 2000, 3000]):
+        [r, v, _] = orbits.Universal_Variable_Prop_Batch(muearth, rvects, vvects, t)
+        np.testing.assert_allclose(propstate[i + 1,:,0:3], r, rtol=1e-7, atol=1e-4)
+        np.testing.assert_allclose(propstate[i + 1,:,3:6], v, rtol=1e-7, atol=1e-7)
+
+    # Dense output between the output times, for one time and for an array of times
+    [r, v, _] = orbits.Universal_Variable_Prop_Batch(muearth, rvects, vvects, 1500)
+    np.testing.assert_allclose(dense(1500)[:,0:3], r, rtol=1e-7, atol=1e-4)
+    np.testing.assert_allclose(dense(np.array([1500, 2500]))[0,:,3:6], v, rtol=1e-7, atol=1e-7)
+
+
+def test_stream_chunks_cover_the_output_grid():
+    [rvects, vvects] = _States(5, seed=3)
+    chunks = list(orbits.ODE_two_body_motion_stream(rvects, vvects, 6000, 60, chunksize=7))
+    assert all(len(c[0]) == 7 for c in chunks[:-1])
+    t = np.concatenate([c[0] for c in chunks])
+    r = np.concatenate([c[1] for c in chunks])
+    v = np.concatenate([c[2] for c in chunks])
+    np.testing.assert_allclose(t, np.arange(0, 6001, 60.0))
+
+    T = len(t)
+    [rt, vt, _] = orbits.Universal_Variable_Prop_Batch(muearth, np.tile(rvects, (T, 1)), np.tile(vvects, (T, 1)), np.repeat(t, 5))
+    np.testing.assert_allclose(r, rt.reshape(T, 5, 3), rtol=1e-7, atol=1e-4)
+    np.testing.assert_allclose(v, vt.reshape(T, 5, 3), rtol=1e-7, atol=1e-7)
+
+
+def test_stream_does_not_depend_on_chunksize():
+    [rvects, vvects] = _States(3, seed=4)
+    small = list(orbits.ODE_two_body_motion_stream(rvects, vvects, 3000, 30, chunksize=4))
+    [[t, r, v]] = list(orbits.ODE_two_body_motion_stream(rvects, vvects, 3000, 30, chunksize=1000))
+    np.testing.assert_array_equal(np.concatenate([c[1] for c in small]), r)
+    np.testing.assert_array_equal(np.concatenate([c[2] for c in small]), v)
+
+
+def test_kernel_lagrange_coefficients():
+    rvect = np.array([7000.0, -12124, 0])
+    vvect = np.array([2.6679, 4.6210, 0])
+    [f, g, fdot, gdot, x, n] = orbits.Universal_Variable_Kernel(muearth, rvect, vvect, 3600)
+    np.testing.assert_allclose(f*gdot - fdot*g, 1, atol=1e-10)
+    [r, v] = orbits.Universal_Variable_Prop(muearth, rvect, vvect, 3600)
+    np.testing.assert_allclose(f*rvect + g*vvect, r, rtol=1e-12)
+    np.testing.assert_allclose(fdot*rvect + gdot*vvect, v, rtol=1e-12)
+
+
+def test_kernel_warm_start():
+    rvect = np.array([7000.0, -12124, 0])
+    vvect = np.array([2.6679, 4.6210, 0])
+    [f, g, fdot, gdot, x, n] = orbits.Universal_Variable_Kernel(muearth, rvect, vvect, 3600)
+
+    # Starting from the solution converges at once to the same coefficients
+    warm = orbits.Universal_Variable_Kernel(muearth, rvect, vvect, 3600, x0=x)
+    assert warm[5] <= 1
+    np.testing.assert_allclose(warm[0:4], [f, g, fdot, gdot], rtol=1e-12)
+
+    # Starting from the solution of a nearby time step takes fewer iterations than the cold guess
+    cold = orbits.Universal_Variable_Kernel(muearth, rvect, vvect, 3610)
+    nearby = orbits.Universal_Variable_Kernel(muearth, rvect, vvect, 3610, x0=x)
+    assert nearby[5] < cold[5]
+    np.testing.assert_allclose(nearby[0:4], cold[0:4], rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize('ecc', [0.0, 0.7, 0.97, 1.0, 3.0])
+def test_laguerre_conway_matches_newton(ecc):
+    # Circular, eccentric, nearly parabolic, parabolic and hyperbolic orbits with perigee at 7000 km
+    rp = 7000.0
+    [rvect, vvect] = orbits.COEs_to_RV(np.sqrt(muearth*rp*(1 + ecc)), ecc, 30, 40, 60, 20)
+    rvect = np.ravel(rvect)
+    vvect = np.ravel(vvect)
+    stats = {}
+    [r_newton, v_newton] = orbits.Universal_Variable_Prop(muearth, rvect, vvect, 20000, method='newton',
+                                                          callback=lambda s: stats.update(newton=s))
+    [r_laguerre, v_laguerre] = orbits.Universal_Variable_Prop(muearth, rvect, vvect, 20000, method='laguerre',
+                                                              callback=lambda s: stats.update(laguerre=s))
+    np.testing.assert_allclose(r_laguerre, r_newton, rtol=1e-8)
+    np.testing.assert_allclose(v_laguerre, v_newton, rtol=1e-8)
+    assert stats['laguerre']['converged']
+    assert stats['laguerre']['residual'] < 1e-6
+    assert stats['laguerre']['regime'] == ('elliptic' if ecc < 1 else 'parabolic' if ecc == 1 else 'hyperbolic')
+    assert stats['laguerre']['iterations'] <= stats['newton']['iterations']
+
+
+def test_unknown_kepler_method_raises():
+    with pytest.raises(ValueError, match='method'):
+        orbits.Universal_Variable_Kernel(muearth, [7000.0, 0, 0], [0, 7.5, 0], 600, method='halley')
+
+
+def test_j2_acceleration_is_the_gradient_of_the_j2_potential():
+    J2 = 1.08263e-3
+    Re = 6378
+    def potential(r):
+        # J2 part of the potential energy per unit mass, the acceleration is minus its gradient
+        R = np.linalg.norm(r)
+        return muearth*J2*Re**2*(3*r[2]**2/R**2 - 1)/(2*R**3)
+    for r in ([7000.0, 0, 0], [3000.0, -4000, 5000], [0, 0, 8000.0]):
+        r = np.array(r)
+        gradient = [(potential(r + e) - potential(r - e))/2e-3 for e in np.eye(3)*1e-3]
+        np.testing.assert_allclose(orbits.J2_Acceleration(r[None,:])[0], -np.array(gradient), rtol=1e-6, atol=1e-16)
+
+
+def test_cowell_j2_agrees_between_integrators():
+    [rvects, vvects] = orbits.COEs_to_RV_Batch(np.sqrt(muearth*7078*(1 - 0.01**2)), [0.01, 0.01], [51.6, 98.2], [40, 200], [30, 0], [10, 90])
+    [propstate, _] = orbits.ODE_two_body_motion_multi(rvects, vvects, 86400, 2, J2=1.08263e-3)
+    rk78 = orbits.RK78_two_body_motion_multi(rvects, vvects, [86400.0], J2=1.08263e-3)
+    np.testing.assert_allclose(rk78[-1,:,0:3], propstate[-1,:,0:3], atol=1e-3)
+
+
+def test_j2_secular_follows_cowell():
+    # Over a day the secular propagation stays within the short period J2 terms (tens of km) of Cowell's method,
+    # where 2 body propagation drifts by hundreds of km
+    [rvects, vvects] = orbits.COEs_to_RV_Batch(np.sqrt(muearth*7078*(1 - np.array([0.001, 0.01, 0.3])**2)), [0.001, 0.01, 0.3],
+                                               [98.19, 51.6, 63.4], 40, 30, 10)
+    cowell = orbits.RK78_two_body_motion_multi(rvects, vvects, [86400.0], J2=1.08263e-3)[-1]
+    [r, v] = orbits.J2_Secular_Prop_RV(rvects, vvects, 86400)
+    [r2, _, _] = orbits.Universal_Variable_Prop_Batch(muearth, rvects, vvects, 86400)
+    assert np.all(np.linalg.norm(r - cowell[:,0:3], axis=1) < 25)
+    assert np.all(np.linalg.norm(r2 - cowell[:,0:3], axis=1) > 250)
+    np.testing.assert_allclose(orbits.COEsFunction_Batch(r, v)[4], orbits.COEsFunction_Batch(cowell[:,0:3], cowell[:,3:6])[4], atol=0.02)
+
+
+def test_j2_secular_nodal_regression():
+    # A 400 km, 51.6 deg circular orbit (like the ISS) regresses its node by about 5 deg per day,
+    # and a hyperbolic orbit gives NaN
+    [_, _, _, RAAN, _, _] = orbits.J2_Secular_Prop(np.sqrt(muearth*6778), [0, 1.5], 51.6, 100, 0, 0, 86400)
+    np.testing.assert_allclose(RAAN[0], 95.0, atol=0.05)
+    assert np.isnan(RAAN[1])
+
+
+def test_stm_matches_finite_differences():
+    [rvects, vvects] = _States(20, seed=3)
+    dts = np.random.default_rng(3).uniform(600, 6000, 20)
+    [r, v, Phi, converged] = orbits.Universal_Variable_STM_Batch(muearth, rvects, vvects, dts)
+    assert converged.all()
+    [rref, vref, _] = orbits.Universal_Variable_Prop_Batch(muearth, rvects, vvects, dts)
+    np.testing.assert_allclose(r, rref, rtol=1e-12, atol=1e-8)
+    np.testing.assert_allclose(v, vref, rtol=1e-12, atol=1e-11)
+
+    # Central differences of the propagated state, column by column
+    y0 = np.hstack([rvects, vvects])
+    steps = np.array([1e-2]*3 + [1e-5]*3)
+    Phifd = np.empty_like(Phi)
+    for j in range(6):
+        dy = np.zeros(6)
+        dy[j] = steps[j]
+        [rp, vp, _] = orbits.Universal_Variable_Prop_Batch(muearth, (y0 + dy)[:,:3], (y0 + dy)[:,3:], dts, e_tol=1e-14)
+        [rm, vm, _] = orbits.Universal_Variable_Prop_Batch(muearth, (y0 - dy)[:,:3], (y0 - dy)[:,3:], dts, e_tol=1e-14)
+        Phifd[:,:,j] = (np.hstack([rp, vp]) - np.hstack([rm, vm]))/(2*steps[j])
+    scale = np.max(np.abs(Phi), axis=(1, 2), keepdims=True)
+    assert np.max(np.abs(Phi - Phifd)/scale) < 1e-6
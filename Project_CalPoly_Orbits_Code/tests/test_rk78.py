@@ -0,0 +1,43 @@
+# Tests of the RK7(8) integrator of orbits/propagation.py
+import numpy as np
+import pytest
+
+import Orbits_module as orbits
+
+
+muearth = 398600 # km^3/s^2
+rvects = np.array([[7000.0, 0, 0], [0, 8000.0, 1000.0]])
+vvects = np.array([[0, 7.5, 1.0], [-6.5, 0, 2.0]])
+
+
+def test_adaptive_matches_universal_variable():
+    times = np.array([0, 600, 3600, 7200.0])
+    propstate = orbits.RK78_two_body_motion_multi(rvects, vvects, times)
+    for [i, t] in enumerate(times):
+        [r, v, _] = orbits.Universal_Variable_Prop_Batch(muearth, rvects, vvects, t)
+        np.testing.assert_allclose(propstate[i,:,0:3], r, atol=1e-5)
+        np.testing.assert_allclose(propstate[i,:,3:6], v, atol=1e-8)
+
+
+def test_non_finite_steps_are_rejected():
+    bad = rvects.copy()
+    bad[1,0] = np.nan
+    integrator = orbits.RK78Integrator(2)
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        with pytest.raises(RuntimeError, match='step size'):
+            integrator.propagate(bad, vvects, [600.0])
+    assert integrator.getStepCount() == 0
+    assert integrator.getRejectedCount() > 0
+
+
+@pytest.mark.parametrize('h', [0.0, -10.0, np.nan, np.inf])
+def test_fixed_step_size_must_be_positive(h):
+    with pytest.raises(ValueError, match='step size'):
+        orbits.RK78_two_body_motion_multi(rvects, vvects, [600.0], h=h)
+
+
+def test_fixed_step_matches_adaptive():
+    times = np.array([600, 3600.0])
+    fixed = orbits.RK78_two_body_motion_multi(rvects, vvects, times, h=30.0)
+    adaptive = orbits.RK78_two_body_motion_multi(rvects, vvects, times)
+    np.testing.assert_allclose(fixed, adaptive, atol=1e-6)
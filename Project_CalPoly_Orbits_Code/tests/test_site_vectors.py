@@ -0,0 +1,35 @@
+# Tests of the batched site vector calculation of orbits/iod.py
+import numpy as np
+
+import Orbits_module as orbits
+
+
+lat = np.array([40.0, -33.9, 78.2])
+long = np.array([110.0, 18.4, 15.4])
+direction = ['west', 'east', 'east']
+alt = np.array([2000.0, 10.0, 500.0])
+times = np.datetime64('2010-08-20T11:30:00') + np.arange(0, 2*86400, 3607).astype('timedelta64[s]')
+
+
+def test_array_matches_scalar_site_vectors():
+    Rsite = orbits.R_site_calc_Array(lat, long, direction, alt, times)
+    assert Rsite.shape == (3, len(times), 3)
+    for s in range(3):
+        for [t, d] in enumerate(times.astype(object)):
+            expected = orbits.R_site_calc(lat[s], long[s], direction[s], alt[s], d.month, d.day, d.year, d.hour, d.minute, d.second)
+            np.testing.assert_allclose(Rsite[s,t], expected, rtol=0, atol=1e-8)
+
+
+def test_site_vectors_lie_on_the_ellipsoid():
+    # Zero altitude sites satisfy (x^2 + y^2)/Re^2 + z^2/(Re(1-f))^2 = 1
+    Rsite = orbits.R_site_calc_Array(lat, long, direction, np.zeros(3), times)
+    [Re, f] = [6378, 0.003353]
+    np.testing.assert_allclose((Rsite[:,:,0]**2 + Rsite[:,:,1]**2)/Re**2 + Rsite[:,:,2]**2/(Re*(1 - f))**2, 1, rtol=1e-12)
+
+
+def test_caches_do_not_change_the_result():
+    cache = {}
+    gst_cache = {}
+    first = orbits.R_site_calc_Array(lat, long, direction, alt, times, cache, gst_cache)
+    assert len(cache) == 3
+    np.testing.assert_array_equal(orbits.R_site_calc_Array(lat, long, direction, alt, times, cache, gst_cache), first)
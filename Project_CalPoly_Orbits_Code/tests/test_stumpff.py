@@ -0,0 +1,46 @@
+# Tests of the array Stumpff functions of orbits/propagation.py
+import numpy as np
+
+import Orbits_module as orbits
+
+
+def test_nan_and_inf_give_nan():
+    # Fill the memory numpy is likely to hand out next with finite values, so uninitialized outputs would show up
+    for _ in range(5):
+        np.ones(4)*3.0
+    with np.errstate(invalid='ignore'):
+        outputs = orbits.Stumpff_Functions(np.array([np.nan, 1.0, np.inf, -np.inf]))
+    for value in outputs:
+        assert np.isnan(value[0])
+        assert np.isfinite(value[1])
+        assert np.isnan(value[2])
+        assert np.isnan(value[3])
+
+
+def test_matches_scalar_functions():
+    Z = np.array([-50.0, -1.0, -1e-3, 0.0, 1e-3, 1.0, 50.0])
+    [C, S, _, _] = orbits.Stumpff_Functions(Z)
+    np.testing.assert_allclose(C, [orbits.StumC(z) for z in Z], rtol=1e-12)
+    np.testing.assert_allclose(S, [orbits.StumS(z) for z in Z], rtol=1e-12)
+
+
+def test_curtis_example_matches_batch_propagator():
+    # The Curtis example uses orbits.StumC/StumS, so it agrees with the batch propagator also for a short step,
+    # where z = alpha*x^2 is inside the series band
+    import Universal_Variable_Prop
+    rvect = np.array([7000.0, -12124, 0])
+    vvect = np.array([2.6679, 4.6210, 0])
+    [r, v] = Universal_Variable_Prop.Universal_Variable_Prop(398600, rvect, vvect, 1.0)
+    [rb, vb, _] = orbits.Universal_Variable_Prop_Batch(398600, rvect[None,:], vvect[None,:], 1.0)
+    np.testing.assert_allclose(r, rb[0], rtol=1e-12)
+    np.testing.assert_allclose(v, vb[0], rtol=1e-12)
+
+
+def test_series_is_accurate_near_zero():
+    # The closed forms lose about half their digits to cancellation here, the series keeps them all
+    Z = np.array([-1e-8, -1e-5, 1e-5, 1e-8])
+    [C, S, _, _] = orbits.Stumpff_Functions(Z)
+    np.testing.assert_allclose(C, 1/2 - Z/24 + Z**2/720, rtol=1e-15)
+    np.testing.assert_allclose(S, 1/6 - Z/120 + Z**2/5040, rtol=1e-15)
+    np.testing.assert_allclose([orbits.StumC(z) for z in Z], C, rtol=1e-15)
+    np.testing.assert_allclose([orbits.StumS(z) for z in Z], S, rtol=1e-15)
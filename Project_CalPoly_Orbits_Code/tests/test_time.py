@@ -0,0 +1,41 @@
+# Tests of the time functions of orbits/time.py
+import numpy as np
+
+import Orbits_module as orbits
+
+
+def test_julian_date_matches_curtis_example_5_4():
+    [JD, UT, J0] = orbits.JulianDateCalc_Array(np.array(['2004-05-12T14:45:30'], dtype='datetime64[s]'))
+    np.testing.assert_allclose(JD, 2453138.115, atol=1e-3)
+    np.testing.assert_allclose(J0, 2453137.5)
+    np.testing.assert_allclose(UT, 14.758333333333, rtol=1e-12)
+
+
+def test_sidereal_time_at_j2000():
+    # Greenwich Mean Sidereal Time of the J2000.0 epoch (2000-01-01 12:00 UT) is 280.46061837 deg
+    J2000 = np.array(['2000-01-01T12:00:00'], dtype='datetime64[s]')
+    np.testing.assert_allclose(orbits.Greenwich_Sidereal_Time_Array(J2000), 280.46061837, atol=1e-6)
+    np.testing.assert_allclose(orbits.Local_Sidereal_Time_Calc_Array(J2000, 100, 'west'), 180.46061837, atol=1e-6)
+
+
+def test_arrays_match_scalar_functions():
+    rng = np.random.default_rng(0)
+    times = np.datetime64('1990-01-01T00:00:00') + rng.integers(0, 40*365*86400, 200).astype('timedelta64[s]')
+    [JD, UT, _] = orbits.JulianDateCalc_Array(times)
+    LST = orbits.Local_Sidereal_Time_Calc_Array(times, 110, 'west')
+    for [i, d] in enumerate(times.astype(object)):
+        [JDi, UTi] = orbits.JulianDateCalc(d.month, d.day, d.year, d.hour, d.minute, d.second)
+        LSTi = orbits.Local_Sidereal_Time_Calc(d.month, d.day, d.year, d.hour, d.minute, d.second, 110, 'west')
+        np.testing.assert_allclose(JD[i], JDi, rtol=0, atol=1e-8)
+        np.testing.assert_allclose(UT[i], UTi, rtol=1e-12)
+        np.testing.assert_allclose(np.mod(LST[i] - LSTi + 180, 360) - 180, 0, atol=1e-8)
+
+
+def test_julian_date_input_and_cache_give_the_same_sidereal_time():
+    times = np.datetime64('2010-08-20T11:30:00') + np.arange(0, 3*86400, 977).astype('timedelta64[s]')
+    [JD, _, _] = orbits.JulianDateCalc_Array(times)
+    cache = {}
+    GST = orbits.Greenwich_Sidereal_Time_Array(times, cache)
+    assert len(cache) == 4   # One entry per day, 20 Aug 11:30 to 23 Aug 11:25
+    np.testing.assert_allclose(orbits.Greenwich_Sidereal_Time_Array(JD, cache), GST, atol=1e-6)
+    np.testing.assert_array_equal(orbits.Greenwich_Sidereal_Time_Array(times, cache), GST)